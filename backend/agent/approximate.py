@@ -0,0 +1,161 @@
+"""
+Rewrites aggregate queries over `data_table` into weighted estimates over the sample.
+
+    COUNT(*)  → SUM(w)                 SUM(x) → SUM(x * w)
+    COUNT(x)  → SUM(w) for non-null x  AVG(x) → SUM(x * w) / SUM(w) for non-null x
+
+where w is the per-row `_sample_weight`. An aggregate's FILTER (WHERE ...) is
+moved onto every SUM of its estimate. For each scaled aggregate a hidden
+standard-error column (Horvitz-Thompson variance under Bernoulli sampling) is
+added; the executor turns those into the error bounds shown in the warning
+and drops them. MIN/MAX, DISTINCT counts and other aggregates run unweighted on
+the sample and are flagged as sample values. Anything but a single aggregate
+SELECT over data_table is left alone and runs exactly.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from db.sampling import SAMPLE_WEIGHT
+
+SAMPLE_VIEW = "data_sample"
+SE_PREFIX   = "__se_"
+
+_SCALED = (exp.Count, exp.Sum, exp.Avg)
+
+
+def _w() -> exp.Expression:
+    return exp.column(SAMPLE_WEIGHT)
+
+
+def _when_not_null(x: exp.Expression, value: exp.Expression) -> exp.Expression:
+    return exp.Case(ifs=[exp.If(this=exp.Not(this=exp.Is(this=x.copy(), expression=exp.Null())), true=value)])
+
+
+def _estimate(node: exp.Expression) -> Tuple[exp.Expression, Optional[exp.Expression]]:
+    """(weighted estimate, standard error) for COUNT / SUM / AVG nodes."""
+    w = _w()
+    w2 = exp.Paren(this=exp.Sub(this=exp.Mul(this=w.copy(), expression=w.copy()), expression=w.copy()))   # (w² - w)
+
+    if isinstance(node, exp.Count):
+        arg = node.this
+        if arg is None or isinstance(arg, exp.Star):
+            count, var = exp.Sum(this=w), exp.Sum(this=w2)
+        else:
+            count, var = exp.Sum(this=_when_not_null(arg, w)), exp.Sum(this=_when_not_null(arg, w2))
+        # Estimated counts stay whole numbers, like the exact ones.
+        return exp.cast(exp.Round(this=count), "BIGINT"), exp.Sqrt(this=var)
+
+    x = node.this
+    if isinstance(node, exp.Sum):
+        est = exp.Sum(this=exp.Mul(this=exp.Paren(this=x.copy()), expression=w))
+        var = exp.Sum(this=exp.Mul(this=w2, expression=exp.Pow(this=exp.Paren(this=x.copy()), expression=exp.Literal.number(2))))
+        return est, exp.Sqrt(this=var)
+
+    # AVG: ratio estimator; variance linearized around the weighted mean.
+    sw   = exp.Sum(this=_when_not_null(x, w.copy()))
+    swx  = exp.Sum(this=exp.Mul(this=exp.Paren(this=x.copy()), expression=w.copy()))
+    swx2 = exp.Sum(this=exp.Mul(this=exp.Pow(this=exp.Paren(this=x.copy()), expression=exp.Literal.number(2)), expression=w.copy()))
+    sw2  = exp.Sum(this=_when_not_null(x, w2))
+    mean = exp.Div(this=swx, expression=exp.Paren(this=sw))
+    variance = exp.Sub(
+        this=exp.Div(this=swx2, expression=exp.Paren(this=sw.copy())),
+        expression=exp.Pow(this=exp.Paren(this=mean.copy()), expression=exp.Literal.number(2)),
+    )
+    se = exp.Div(
+        # GREATEST(.., 0): rounding can push a near-zero variance below zero.
+        this=exp.Sqrt(this=exp.Anonymous(this="GREATEST", expressions=[
+            exp.Mul(this=sw2, expression=exp.Paren(this=variance)), exp.Literal.number(0),
+        ])),
+        expression=exp.Paren(this=sw.copy()),
+    )
+    return mean, se
+
+
+def _is_distinct(node: exp.Expression) -> bool:
+    return isinstance(node.this, exp.Distinct)
+
+
+def _scalable(node: exp.Expression) -> bool:
+    """COUNT / SUM / AVG without DISTINCT, bare or under a FILTER clause."""
+    agg = node.this if isinstance(node, exp.Filter) else node
+    return isinstance(agg, _SCALED) and not _is_distinct(agg)
+
+
+def _estimate_any(node: exp.Expression) -> Tuple[exp.Expression, Optional[exp.Expression]]:
+    """_estimate, with an aggregate's FILTER (WHERE ...) applied to each SUM it is rewritten into."""
+    if not isinstance(node, exp.Filter):
+        return _estimate(node)
+    where = node.expression
+
+    def filtered(e: exp.Expression) -> exp.Expression:
+        return e.transform(lambda n: exp.Filter(this=n.copy(), expression=where.copy()) if isinstance(n, exp.Sum) else n)
+
+    estimate, se = _estimate(node.this)
+    return filtered(estimate), filtered(se)
+
+
+def rewrite_for_sample(sql: str, column_names: Optional[List[str]] = None) -> Optional[Tuple[str, Dict[str, str], List[str]]]:
+    """
+    Returns (sample_sql, {column: se_column}, unscaled_aggregate_names), or None when
+    the query should run exactly. `column_names` (the exact query's output names)
+    keeps the approximate result's columns named like the exact one.
+    """
+    try:
+        tree = sqlglot.parse_one(sql, read="duckdb")
+    except sqlglot.errors.ParseError:
+        return None
+
+    if not isinstance(tree, exp.Select) or tree.args.get("distinct") or tree.args.get("with"):
+        return None
+    if any(s is not tree for s in tree.find_all(exp.Select)):
+        return None     # subqueries: the weights would not compose
+    tables = list(tree.find_all(exp.Table))
+    if len(tables) != 1 or tables[0].name != "data_table":
+        return None
+    if not tree.find(exp.AggFunc) or tree.find(exp.Window):
+        return None
+
+    projections = tree.expressions
+    if column_names is None or len(column_names) != len(projections) or any(isinstance(p, exp.Star) for p in projections):
+        column_names = [p.alias_or_name for p in projections]
+
+    def scale_nested(node: exp.Expression) -> None:
+        # Filtered aggregates first, as a whole, so their FILTER moves onto the estimate's SUMs.
+        for agg in [*node.find_all(exp.Filter), *node.find_all(*_SCALED)]:
+            if agg.parent is not None and not isinstance(agg.parent, exp.Filter) and _scalable(agg):
+                agg.replace(_estimate_any(agg)[0])
+
+    se_columns: Dict[str, str] = {}
+    unscaled: List[str] = []
+    new_projections = []
+    for position, (projection, name) in enumerate(zip(projections, column_names)):
+        inner = projection.this if isinstance(projection, exp.Alias) else projection
+        if isinstance(inner, exp.AggFunc) or (isinstance(inner, exp.Filter) and isinstance(inner.this, exp.AggFunc)):
+            if _scalable(inner):
+                estimate, se = _estimate_any(inner)
+                new_projections.append(exp.alias_(estimate, name, quoted=True))
+                se_name = f"{SE_PREFIX}{position}"
+                se_columns[name] = se_name
+                new_projections.append(exp.alias_(se, se_name, quoted=True))
+                continue
+            unscaled.append(name)
+        elif inner.find(exp.AggFunc):
+            # Expression over aggregates, e.g. SUM(a) / COUNT(*): estimated, but without an error bound.
+            scale_nested(inner)
+            unscaled.append(name)
+        new_projections.append(projection if isinstance(projection, exp.Alias) or inner.find(exp.AggFunc) is None
+                               else exp.alias_(projection, name, quoted=True))
+    # Hidden SE columns go last so positional GROUP BY / ORDER BY references stay valid.
+    visible = [p for p in new_projections if not p.alias.startswith(SE_PREFIX)]
+    hidden = [p for p in new_projections if p.alias.startswith(SE_PREFIX)]
+    tree.set("expressions", visible + hidden)
+
+    # Aggregates in HAVING / ORDER BY are scaled too (no error columns needed there).
+    for clause in ("having", "order"):
+        if tree.args.get(clause) is not None:
+            scale_nested(tree.args[clause])
+
+    tables[0].set("this", exp.to_identifier(SAMPLE_VIEW))
+    return tree.sql(dialect="duckdb"), se_columns, unscaled
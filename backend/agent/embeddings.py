@@ -0,0 +1,42 @@
+import threading
+from typing import List, Optional
+
+# Small local model (ONNX via fastembed, no torch) — 384-dim, fast on CPU.
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+EMBEDDING_DIM   = 384
+
+_model = None
+_model_lock = threading.Lock()
+_model_failed = False
+
+
+def _get_model():
+    """Loads the embedding model once per process. Returns None if unavailable."""
+    global _model, _model_failed
+    if _model is not None or _model_failed:
+        return _model
+
+    with _model_lock:
+        if _model is None and not _model_failed:
+            try:
+                from fastembed import TextEmbedding
+                _model = TextEmbedding(model_name=EMBEDDING_MODEL)
+                print(f"🧬 [Embeddings] Loaded {EMBEDDING_MODEL}")
+            except Exception as e:
+                # Embeddings are an accuracy boost, never a hard requirement.
+                print(f"🧬 [Embeddings] Model unavailable, falling back to lexical only: {e}")
+                _model_failed = True
+    return _model
+
+
+def embed_texts(texts: List[str]) -> Optional[List[List[float]]]:
+    """Embeds a batch of texts. Returns None when no embedding model is available."""
+    model = _get_model()
+    if model is None or not texts:
+        return None
+    return [vec.tolist() for vec in model.embed(texts)]
+
+
+def embed_text(text: str) -> Optional[List[float]]:
+    vectors = embed_texts([text])
+    return vectors[0] if vectors else None
@@ -0,0 +1,180 @@
+import asyncio
+import collections
+import os
+import re
+import threading
+import time
+from typing import Any, List, Optional, Type
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, PrivateAttr
+
+from agent.token_usage import estimate_tokens
+
+# "- price (BIGINT)..." in the SQL prompt, "  - price (int64): e.g. [...]" in the visualizer prompt.
+_SCHEMA_LINE = re.compile(r"^\s*- (\S+) \(([^)]+)\)", re.MULTILINE)
+_NUMERIC = ("INT", "DOUBLE", "FLOAT", "DECIMAL", "REAL", "NUMERIC", "HUGEINT")
+_GREETINGS = ("hello", "hi", "hey", "what can you do")
+_PYTHON_WORDS = ("python", "pandas", "correlation", "regression")
+
+
+def _prompt_text(messages: Any) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(getattr(m, "content", m)) for m in messages)
+
+
+def _last_user_text(messages: Any) -> str:
+    if isinstance(messages, str):
+        # The router sends one string prompt ending in "User Query: ...".
+        return messages.rsplit("User Query:", 1)[-1]
+    for m in reversed(messages):
+        if getattr(m, "type", "") == "human":
+            return str(m.content)
+    return ""
+
+
+def _schema_columns(text: str) -> List[tuple]:
+    return [(name, ctype.upper()) for name, ctype in _SCHEMA_LINE.findall(text)]
+
+
+class FakeRateLimitError(Exception):
+    """Shaped like the provider SDK's 429 error (status_code, retry-after)."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit reached; retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the Groq model, used by benchmarks and load tests.
+
+    Structured-output calls are answered from the schema they ask for
+    (routing, SQL, Vega-Lite, insights) using only the prompt text, so the
+    whole graph runs end-to-end without network access. `latency_ms` simulates
+    provider latency on every call; `rate_limit_rpm` makes it reject calls beyond
+    that many per rolling minute with a 429, like the real provider.
+    """
+
+    latency_ms: float = 0.0
+    rate_limit_rpm: int = 0
+
+    _calls: collections.deque = PrivateAttr(default_factory=collections.deque)
+    _calls_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _check_rate_limit(self) -> None:
+        if not self.rate_limit_rpm:
+            return
+        now = time.monotonic()
+        with self._calls_lock:
+            while self._calls and now - self._calls[0] >= 60:
+                self._calls.popleft()
+            if len(self._calls) >= self.rate_limit_rpm:
+                raise FakeRateLimitError(retry_after=60 - (now - self._calls[0]))
+            self._calls.append(now)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _result(self, messages: List[BaseMessage], content: str) -> ChatResult:
+        usage = {"prompt_tokens": estimate_tokens(messages), "completion_tokens": estimate_tokens(content)}
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content))],
+            llm_output={"token_usage": usage},
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        self._check_rate_limit()
+        time.sleep(self.latency_ms / 1000)
+        return self._result(messages, "I can answer questions about this dataset with SQL and charts.")
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        self._check_rate_limit()
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._result(messages, "I can answer questions about this dataset with SQL and charts.")
+
+    # ── Structured output ────────────────────────────────────────────────────
+    def _structured(self, schema: Type[BaseModel], messages: Any) -> BaseModel:
+        text = _prompt_text(messages)
+        name = schema.__name__
+
+        if name == "RoutingIntent":
+            question = _last_user_text(messages) or text
+            is_greeting = any(re.search(rf"\b{g}\b", question.lower()) for g in _GREETINGS)
+            is_python = any(re.search(rf"\b{w}\b", question.lower()) for w in _PYTHON_WORDS)
+            return schema(intent="chat" if is_greeting else "python" if is_python else "sql")
+
+        if name == "SQLGeneration":
+            columns = _schema_columns(text)
+            numeric = [c for c, t in columns if any(k in t for k in _NUMERIC)]
+            other   = [c for c, t in columns if not any(k in t for k in _NUMERIC)]
+            if numeric and other:
+                query = (
+                    f'SELECT "{other[0]}", AVG("{numeric[0]}") AS avg_{numeric[0]}, COUNT(*) AS n '
+                    f'FROM data_table GROUP BY 1 ORDER BY 2 DESC LIMIT 20'
+                )
+            elif numeric:
+                query = f'SELECT MIN("{numeric[0]}"), MAX("{numeric[0]}"), AVG("{numeric[0]}") FROM data_table'
+            else:
+                query = "SELECT * FROM data_table LIMIT 100"
+            return schema(query=query)
+
+        if name == "PythonGeneration":
+            numeric = [c for c, t in _schema_columns(text) if any(k in t for k in _NUMERIC)][:4]
+            select = ", ".join(f'"{c}"' for c in numeric) or "*"
+            return schema(
+                sql=f"SELECT {select} FROM data_table",
+                code="result = df.describe().T.reset_index().rename(columns={'index': 'column'})",
+            )
+
+        if name == "VegaLiteSpec":
+            columns = _schema_columns(text)
+            if len(columns) < 2:
+                return schema(spec={}, skip=True, reason="Not enough columns to chart.")
+            x, y = columns[0][0], columns[1][0]
+            return schema(spec={
+                "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+                "data": {"name": "table"},
+                "mark": "bar",
+                "encoding": {
+                    "x": {"field": x, "type": "nominal"},
+                    "y": {"field": y, "type": "quantitative"},
+                },
+                "width": "container",
+                "height": 280,
+            })
+
+        if name == "InsightGeneration":
+            return schema(
+                summary="The result groups the data and compares the averages across groups.",
+                insights=["The top group leads by a clear margin.", "Group sizes vary considerably."],
+            )
+
+        raise ValueError(f"FakeChatModel has no canned answer for {name}")
+
+    def with_structured_output(self, schema: Type[BaseModel], **kwargs) -> RunnableLambda:
+        # Route through invoke/ainvoke so latency and tracing callbacks still apply.
+        def _invoke(messages):
+            self.invoke(messages)
+            return self._structured(schema, messages)
+
+        async def _ainvoke(messages):
+            await self.ainvoke(messages)
+            return self._structured(schema, messages)
+
+        return RunnableLambda(_invoke, afunc=_ainvoke)
+
+
+def fake_llm_from_env(**kwargs) -> FakeChatModel:
+    return FakeChatModel(
+        latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")),
+        rate_limit_rpm=int(os.getenv("FAKE_LLM_RATE_LIMIT_RPM", "0")),
+        **kwargs,
+    )
@@ -10,6 +10,7 @@ from agent.nodes.sql_executor_node import execute_sql_node
 from agent.nodes.synthesizer import synthesize_node
 from agent.nodes.visualizer_node import generate_visuals
 from agent.state import AgentState
+from observability.tracing import traced_node
 
 
 def check_execution(state: AgentState)->str:
@@ -30,14 +31,14 @@ def check_sql_execution(state: AgentState) -> str:
 
 workflow = StateGraph(AgentState)
 
-workflow.add_node("router", router_node)
-workflow.add_node("chat", chat_node)
-workflow.add_node("sql", query_node)
-workflow.add_node("sql_executor", execute_sql_node)
-workflow.add_node("visualizer", generate_visuals)
-workflow.add_node("generator", generate_code_node)
-workflow.add_node("executor", execute_sandbox_node)
-workflow.add_node("synthesizer", synthesize_node)
+workflow.add_node("router", traced_node("router")(router_node))
+workflow.add_node("chat", traced_node("chat")(chat_node))
+workflow.add_node("sql", traced_node("sql")(query_node))
+workflow.add_node("sql_executor", traced_node("sql_executor")(execute_sql_node))
+workflow.add_node("visualizer", traced_node("visualizer")(generate_visuals))
+workflow.add_node("generator", traced_node("generator")(generate_code_node))
+workflow.add_node("executor", traced_node("executor")(execute_sandbox_node))
+workflow.add_node("synthesizer", traced_node("synthesizer")(synthesize_node))
 
 workflow.set_entry_point("router")
 workflow.add_edge("chat", "synthesizer")
@@ -59,7 +60,7 @@ workflow.add_conditional_edges(
     check_execution,
     {
         "rewrite_code": "generator",
-        "success": "synthesizer",
+        "success": "visualizer",
         "end": "synthesizer"
     }
 )
@@ -1,15 +1,36 @@
 import os
 from langchain_groq import ChatGroq
 
+from agent.fake_llm import fake_llm_from_env
+from agent.llm_gateway import LLMScheduler, ScheduledLLM
+from observability.tracing import LLMTracingCallback
+
 # For testing today, you can set it inline.
 # (Make sure to move this to a .env file before putting this on GitHub!)
 os.environ["GROQ_API_KEY"] = ""
 
-# Use Gemini 2.5 Flash: It's extremely fast and handles JSON perfectly
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2,
-)
\ No newline at end of file
+# "groq" in normal use; "fake" gives a deterministic offline model for benchmarks.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")
+
+# Budgets shared by every call in this process (0 = unlimited). Defaults match Groq's
+# free tier for the model below; the fake provider is unlimited unless told otherwise.
+_is_fake = LLM_PROVIDER == "fake"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_RPM             = int(os.getenv("LLM_RPM", "0" if _is_fake else "30"))
+LLM_TPM             = int(os.getenv("LLM_TPM", "0" if _is_fake else "12000"))
+
+if _is_fake:
+    model = fake_llm_from_env(callbacks=[LLMTracingCallback()])
+else:
+    # Use Gemini 2.5 Flash: It's extremely fast and handles JSON perfectly
+    model = ChatGroq(
+        model="llama-3.3-70b-versatile",
+        temperature=0,
+        max_tokens=None,
+        timeout=None,
+        max_retries=0,   # The scheduler retries (through its queue and rate budget)
+        callbacks=[LLMTracingCallback()],
+    )
+
+llm_scheduler = LLMScheduler(LLM_MAX_CONCURRENCY, LLM_RPM, LLM_TPM)
+llm = ScheduledLLM(model, llm_scheduler)
@@ -0,0 +1,315 @@
+"""
+Process-wide scheduler for LLM calls.
+
+Every node's calls (and every concurrent chat's) go through one queue that:
+
+    - caps concurrent provider calls (LLM_MAX_CONCURRENCY)
+    - spends a requests-per-minute and a tokens-per-minute budget (token buckets),
+      so bursts queue here instead of bouncing off the provider's rate limit
+    - admits by priority: routing / SQL / code generation first, chat next,
+      charts and insight synthesis last (they only decorate an answer)
+    - coalesces identical in-flight calls: the same prompt to the same schema
+      runs once and every waiter gets (a copy of) the result
+    - on a 429, pauses the whole queue for the provider's retry-after and
+      retries the call through the queue; provider SDK retries are off so
+      they cannot pile up underneath
+
+Sync nodes (run in LangGraph's worker threads) and async nodes share the queue.
+"""
+import asyncio
+import concurrent.futures
+import copy
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from agent.token_usage import estimate_tokens
+from observability.metrics import LLM_COALESCED, LLM_INFLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT, LLM_RETRIES
+from observability.tracing import current_node
+
+# Lower runs first. Nodes not listed get DEFAULT_PRIORITY.
+LLM_PRIORITIES = {"router": 0, "sql": 0, "generator": 0, "chat": 1, "visualizer": 2, "synthesizer": 3}
+DEFAULT_PRIORITY           = 2
+COMPLETION_TOKENS_ESTIMATE = 400     # Charged up front with the prompt; structured answers are short
+MAX_RETRIES                = 4
+RETRY_BACKOFF_S            = 1.0     # Doubled per attempt when the provider gives no retry-after
+
+
+def _is_rate_limit(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429 or "RateLimit" in type(error).__name__
+
+
+def _is_retryable(error: BaseException) -> bool:
+    status = getattr(error, "status_code", None)
+    name = type(error).__name__
+    return (
+        _is_rate_limit(error)
+        or (isinstance(status, int) and status >= 500)
+        or name in ("APIConnectionError", "APITimeoutError", "InternalServerError")
+    )
+
+
+def _retry_after(error: BaseException, attempt: int) -> float:
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        value = headers.get("retry-after")
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return RETRY_BACKOFF_S * 2 ** attempt
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (a call larger than the bucket waits for a full one)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Ticket:
+    """A queued call; granted through an Event (sync caller) or a Future on the caller's loop."""
+
+    def __init__(self, priority: int, seq: int, cost: int, node: str, loop=None):
+        self.priority = priority
+        self.seq = seq
+        self.cost = cost
+        self.node = node
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.max_concurrency = max_concurrency
+        self._requests = _TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._paused_until = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+
+    # ── Admission ────────────────────────────────────────────────────────────
+    def _dispatch(self) -> None:
+        """Grants queued tickets while slots and budget allow. Caller holds the lock."""
+        while self._queue and self._active < self.max_concurrency:
+            head = self._queue[0]
+            if head.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self._requests.wait_time(1, now) if self._requests else 0.0,
+                self._tokens.wait_time(head.cost, now) if self._tokens else 0.0,
+            )
+            if wait > 0:
+                self._wake_in(wait)
+                break
+            heapq.heappop(self._queue)
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(head.cost)
+            self._active += 1
+            LLM_QUEUE_WAIT.labels(head.node).observe(now - head.enqueued)
+            head.grant()
+        LLM_QUEUE_DEPTH.set(len(self._queue))
+        LLM_INFLIGHT.set(self._active)
+
+    def _wake_in(self, delay: float) -> None:
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _enqueue(self, cost: int, node: str, loop=None) -> _Ticket:
+        ticket = _Ticket(LLM_PRIORITIES.get(node, DEFAULT_PRIORITY), next(self._seq), cost, node, loop)
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+            self._dispatch()
+        return ticket
+
+    def _release(self) -> None:
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    def _pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _abandon(self, ticket: _Ticket) -> None:
+        """An async waiter was cancelled: drop its ticket, or give back the slot it was just granted."""
+        with self._lock:
+            granted = ticket.granted
+            ticket.cancelled = True
+        if granted:
+            self._release()
+
+    # ── Calls ────────────────────────────────────────────────────────────────
+    def _on_error(self, error: BaseException, attempt: int, node: str) -> float:
+        """Backoff before retrying `error`; raises it when it is final."""
+        if attempt >= MAX_RETRIES or not _is_retryable(error):
+            raise error
+        delay = _retry_after(error, attempt)
+        LLM_RETRIES.labels("rate_limit" if _is_rate_limit(error) else "error").inc()
+        if _is_rate_limit(error):
+            # Everyone would hit the same limit: hold the whole queue, not just this call.
+            self._pause(delay)
+            delay = 0.0
+        print(f"🚥 [LLM Gateway] {node}: {type(error).__name__}, retry {attempt + 1}/{MAX_RETRIES}")
+        return delay
+
+    def _join(self, key: str):
+        """(leader future, None) when an identical call is in flight, else (None, own future)."""
+        with self._lock:
+            leader = self._inflight.get(key)
+            if leader is not None:
+                return leader, None
+            future = concurrent.futures.Future()
+            self._inflight[key] = future
+            return None, future
+
+    def _settle(self, key: str, future: concurrent.futures.Future, result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            # A snapshot: the leader's node may modify its own result while followers copy theirs.
+            future.set_result(copy.deepcopy(result))
+
+    def run(self, call: Callable[[], Any], key: str, cost: int) -> Any:
+        node = current_node.get() or "unknown"
+        leader, future = self._join(key)
+        if leader is not None:
+            LLM_COALESCED.labels(node).inc()
+            return copy.deepcopy(leader.result())
+
+        try:
+            for attempt in itertools.count():
+                ticket = self._enqueue(cost, node)
+                ticket.event.wait()
+                try:
+                    result = call()
+                    break
+                except Exception as e:
+                    delay = self._on_error(e, attempt, node)
+                finally:
+                    self._release()
+                time.sleep(delay)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def arun(self, call: Callable[[], Any], key: str, cost: int) -> Any:
+        node = current_node.get() or "unknown"
+        leader, future = self._join(key)
+        if leader is not None:
+            LLM_COALESCED.labels(node).inc()
+            return copy.deepcopy(await asyncio.wrap_future(leader))
+
+        loop = asyncio.get_running_loop()
+        try:
+            for attempt in itertools.count():
+                ticket = self._enqueue(cost, node, loop)
+                try:
+                    await ticket.future
+                except asyncio.CancelledError:
+                    self._abandon(ticket)
+                    raise
+                try:
+                    result = await call()
+                    break
+                except Exception as e:
+                    delay = self._on_error(e, attempt, node)
+                finally:
+                    self._release()
+                await asyncio.sleep(delay)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+
+def _call_key(kind: str, prompt: Any) -> str:
+    if isinstance(prompt, str):
+        text = prompt
+    else:
+        text = json.dumps([[getattr(m, "type", ""), str(getattr(m, "content", m))] for m in prompt])
+    return hashlib.sha256(f"{kind}\x00{text}".encode()).hexdigest()
+
+
+class ScheduledLLM:
+    """
+    Drop-in wrapper for a chat model (or its structured-output runnable): invoke /
+    ainvoke go through the scheduler; everything else is passed to the model.
+    """
+
+    def __init__(self, runnable: Any, scheduler: LLMScheduler, kind: str = "text"):
+        self._runnable = runnable
+        self._scheduler = scheduler
+        self._kind = kind
+
+    def invoke(self, prompt: Any, *args, **kwargs) -> Any:
+        return self._scheduler.run(
+            lambda: self._runnable.invoke(prompt, *args, **kwargs),
+            _call_key(self._kind, prompt), estimate_tokens(prompt) + COMPLETION_TOKENS_ESTIMATE,
+        )
+
+    async def ainvoke(self, prompt: Any, *args, **kwargs) -> Any:
+        return await self._scheduler.arun(
+            lambda: self._runnable.ainvoke(prompt, *args, **kwargs),
+            _call_key(self._kind, prompt), estimate_tokens(prompt) + COMPLETION_TOKENS_ESTIMATE,
+        )
+
+    def with_structured_output(self, schema, **kwargs) -> "ScheduledLLM":
+        return ScheduledLLM(self._runnable.with_structured_output(schema, **kwargs), self._scheduler, schema.__name__)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._runnable, name)
@@ -2,6 +2,7 @@ from langchain_core.messages import SystemMessage
 
 from agent.llm_client import llm
 from agent.state import AgentState
+from agent.token_usage import prompt_usage
 
 
 
@@ -17,6 +18,7 @@ def chat_node(state: AgentState):
         """)
 
     full_conversation = [system_prompt] + messages
+    usage = prompt_usage("Chat Node", full_conversation)
 
     response = llm.invoke(full_conversation)
 
@@ -25,4 +27,4 @@ def chat_node(state: AgentState):
         "content": response.content
     }
 
-    return {"ui_blocks": [ui_block]}
+    return {"ui_blocks": [ui_block], "token_usage": usage}
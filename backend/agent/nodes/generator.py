@@ -1,5 +1,62 @@
+import asyncio
+
+from pydantic import BaseModel, Field
+from langchain_core.messages import SystemMessage
 from agent.state import AgentState
+from agent.nodes.query_node import fetch_schema
+from agent.nodes.router import llm
+from agent.token_usage import prompt_usage
+from agent.tools.schema_tool import select_schema_context
+
+
+class PythonGeneration(BaseModel):
+    sql: str = Field(..., description="DuckDB SQL against data_table that loads only the rows/columns the analysis needs.")
+    code: str = Field(..., description="Python (pandas) code that analyses `df` and assigns the final answer to `result`.")
+
+
+async def generate_code_node(state: AgentState):
+    """Generates a data-loading SQL query plus the pandas analysis the sandbox runs on its result."""
+    print("🐍 [Generator] Fetching schema and generating analysis code...")
+
+    messages = state.get("messages", [])
+    error_trace = state.get("error_trace")
+    question = messages[-1].content if messages else ""
+
+    try:
+        schema_text = await select_schema_context(state, question)
+    except Exception as e:
+        print(f"🐍 [Generator] Schema selector failed, using full schema: {e}")
+        schema_text = await asyncio.to_thread(fetch_schema, state)
+
+    system_prompt = f"""
+    You are an expert data analyst writing Python.
+
+    CRITICAL RULES:
+    1. First write a DuckDB SQL query against the table named exactly: data_table.
+       Select only the columns you need and filter/aggregate in SQL where you can.
+    2. The query result is available to your code as a pandas DataFrame named `df`
+       (`pd`, `np` and `duckdb` are already imported).
+    3. Assign the final answer to a variable named `result` (a DataFrame, Series or scalar).
+    4. No network or file access. Do not use Markdown backticks.
+
+    DATASET SCHEMA:
+    {schema_text}
+    """
+
+    if error_trace:
+        system_prompt += f"\n\n🚨 PREVIOUS ERROR TO FIX:\nYour last attempt failed with this error: {error_trace}\nRewrite the SQL and/or code to fix this."
+
+    prompt = [SystemMessage(content=system_prompt)] + messages
+    usage = prompt_usage("Generator", prompt)
+
+    structured_llm = llm.with_structured_output(PythonGeneration)
+    result = await structured_llm.ainvoke(prompt)
 
+    print(f"🐍 [Generator] SQL: {result.sql}")
 
-def generate_code_node(state: AgentState):
-    pass
\ No newline at end of file
+    return {
+        "current_sql": result.sql,
+        "current_code": result.code,
+        "error_trace": None,
+        "token_usage": usage,
+    }
@@ -1,34 +1,44 @@
+import asyncio
+
 from pydantic import BaseModel, Field
 from langchain_core.messages import SystemMessage
 from agent.state import AgentState
 from agent.nodes.router import llm
-from db.duck_db import get_duckdb_connection
+from agent.token_usage import prompt_usage
+from agent.tools.schema_tool import select_schema_context
+from db.data_table import open_data_table
 
 class SQLGeneration(BaseModel):
     query: str = Field(..., description="A valid DuckDB SQL query.")
 
-def fetch_schema(artifact_url: str) -> str:
-    """Uses DuckDB to instantly read the schema metadata from MinIO."""
-    con = get_duckdb_connection()
-    s3_path = f"s3://raw-data/{artifact_url}"
+def fetch_schema(state: AgentState) -> str:
+    """Uses DuckDB to instantly read the schema metadata (parquet footer or remote catalog)."""
+    con = None
     try:
-        df = con.execute(f"DESCRIBE SELECT * FROM read_parquet('{s3_path}')").df()
+        con = open_data_table(state)
+        df = con.execute("DESCRIBE data_table").df()
         schema_text = "\n".join([f"- {row['column_name']} ({row['column_type']})" for _, row in df.iterrows()])
         return schema_text
     except Exception as e:
         return f"Error fetching schema: {str(e)}"
     finally:
-        con.close()
+        if con is not None:
+            con.close()
 
-def query_node(state: AgentState):
-    """Fetches schema and generates standard SQL."""
+async def query_node(state: AgentState):
+    """Fetches a relevance-ranked schema and generates standard SQL."""
     print("📝 [SQL Node] Fetching schema and generating query...")
 
     messages = state.get("messages", [])
-    artifact_url = state.get("artifact_url")
     error_trace = state.get("error_trace")
+    question = messages[-1].content if messages else ""
 
-    schema_text = fetch_schema(artifact_url)
+    try:
+        schema_text = await select_schema_context(state, question)
+    except Exception as e:
+        # Catalog (Postgres) unavailable — fall back to the full DESCRIBE.
+        print(f"📝 [SQL Node] Schema selector failed, using full schema: {e}")
+        schema_text = await asyncio.to_thread(fetch_schema, state)
 
     # --- THE CLEAN ABSTRACTION PROMPT ---
     system_prompt = f"""
@@ -46,12 +56,16 @@ def query_node(state: AgentState):
     if error_trace:
         system_prompt += f"\n\n🚨 PREVIOUS ERROR TO FIX:\nYour last query failed with this error: {error_trace}\nRewrite the query to fix this."
 
+    prompt = [SystemMessage(content=system_prompt)] + messages
+    usage = prompt_usage("SQL Node", prompt)
+
     structured_llm = llm.with_structured_output(SQLGeneration)
-    result = structured_llm.invoke([SystemMessage(content=system_prompt)] + messages)
+    result = await structured_llm.ainvoke(prompt)
 
     print(f"📝 [SQL Node] Generated Query: {result.query}")
 
     return {
         "current_code": result.query,
-        "error_trace": None
+        "error_trace": None,
+        "token_usage": usage,
     }
\ No newline at end of file
@@ -1,7 +1,9 @@
 from typing import Literal
 from pydantic import BaseModel
 from agent.llm_client import llm
+from agent.sandbox_pool import sandbox_available
 from agent.state import AgentState
+from agent.token_usage import prompt_usage
 
 
 class RoutingIntent(BaseModel):
@@ -31,11 +33,18 @@ def router_node(state: AgentState):
     User Query: {last_message}
     """
 
+    usage = prompt_usage("Router", prompt)
+
     router_llm = llm.with_structured_output(RoutingIntent)
     decision = router_llm.invoke(prompt)
 
-    print(f"🚦 [Router] Decided path: {decision.intent}")
-    return {"intent": decision.intent}
+    intent = decision.intent
+    if intent == "python" and not sandbox_available():
+        # No isolated sandbox on this host: charts still come from the SQL path's visualizer.
+        print("🚦 [Router] Python sandbox unavailable, answering with SQL instead")
+        intent = "sql"
+    print(f"🚦 [Router] Decided path: {intent}")
+    return {"intent": intent, "token_usage": usage}
 
 
 def route_to_specialist(state: AgentState):
@@ -45,6 +54,6 @@ def route_to_specialist(state: AgentState):
     elif intent == "sql":
         return "sql"
     elif intent == "python":
-        return "generator"
+        return "python"
     else:
         return "chat"
\ No newline at end of file
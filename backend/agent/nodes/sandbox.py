@@ -1,5 +1,81 @@
+from agent.sandbox_pool import get_sandbox_pool
+from agent.sql_repair import prepare_query
 from agent.state import AgentState
+from db.data_table import open_data_table
+from db.scheduler import Saturated, duckdb_scheduler
+from observability.tracing import record_duckdb_stats, span
 
 
 def execute_sandbox_node(state: AgentState):
-    pass
\ No newline at end of file
+    """
+    Runs the generator's SQL in DuckDB, then its pandas code in a warm sandbox
+    worker with the result handed over as Arrow in shared memory.
+
+    Produces:
+    - ui_blocks: [sql block, python block, table block and/or printed output]
+    - df_json:   the code's `result` (capped) for the visualizer and synthesizer
+    """
+    query = state.get("current_sql")
+    code = state.get("current_code")
+
+    print("🧪 [Sandbox] Loading data and running analysis code...")
+
+    con = None
+    try:
+        with duckdb_scheduler.slot(state.get("client_id") or "anonymous", state.get("source_id")):
+            con = open_data_table(state)
+            con.execute("PRAGMA enable_profiling='no_output'")
+            query, _ = prepare_query(con, query, state)
+            with span("duckdb.execute", stage="duckdb", **{"db.statement": query}) as s:
+                table = con.execute(query).arrow()
+                if hasattr(table, "read_all"):   # Newer DuckDB returns a RecordBatchReader
+                    table = table.read_all()
+                record_duckdb_stats(con, s)
+    except Saturated:
+        raise
+    except Exception as e:
+        print(f"❌ [Sandbox] Data query failed: {str(e)}")
+        return {
+            "ui_blocks":     [],
+            "df_json":       None,
+            "error_trace":   f"SQL error: {e}",
+            "attempt_count": state.get("attempt_count", 0) + 1,
+        }
+    finally:
+        if con is not None:
+            con.close()
+
+    with span("sandbox.run", stage="sandbox", **{"sandbox.input_rows": table.num_rows}):
+        outcome = get_sandbox_pool().run(code, table)
+
+    if not outcome["ok"]:
+        print(f"❌ [Sandbox] Code failed: {outcome['error']}")
+        return {
+            "ui_blocks":     [],
+            "df_json":       None,
+            "error_trace":   f"Python error: {outcome['error']}",
+            "attempt_count": state.get("attempt_count", 0) + 1,
+        }
+
+    ui_blocks = [
+        {"type": "code", "language": "sql",    "content": query},
+        {"type": "code", "language": "python", "content": code},
+    ]
+    frame = outcome.get("frame")
+    if frame:
+        warning = None
+        if frame["total_rows"] > len(frame["records"]):
+            warning = f"Showing {len(frame['records'])} of {frame['total_rows']:,} rows."
+        ui_blocks.append({"type": "table", "columns": frame["columns"], "data": frame["records"], "warning": warning})
+    output = "\n".join(x for x in (outcome.get("stdout"), outcome.get("value")) if x)
+    if output:
+        ui_blocks.append({"type": "code", "language": "text", "content": output})
+
+    print(f"✅ [Sandbox] Done ({table.num_rows} input rows).")
+    return {
+        "ui_blocks":     ui_blocks,
+        "current_sql":   query,
+        "df_json":       frame["df_json"] if frame else None,
+        "error_trace":   None,
+        "attempt_count": 0,
+    }
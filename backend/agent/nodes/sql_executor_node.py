@@ -1,38 +1,105 @@
+from typing import Optional, Tuple
+
+import duckdb
 import pandas as pd
+from agent.approximate import rewrite_for_sample
+from agent.result_profile import profile_result
+from agent.sql_repair import prepare_query
 from agent.state import AgentState
-from db.duck_db import get_duckdb_connection
+from db.browse import remember_result
+from db.data_table import attach_sample_view, open_data_table
+from db.scheduler import Saturated, duckdb_scheduler
+from observability.tracing import record_duckdb_stats, span
 
 MAX_TABLE_ROWS  = 100   # Rows shown in the frontend table block
 MAX_VIZ_ROWS    = 500   # Rows passed to the visualizer node
+CI_Z            = 1.96  # 95% confidence intervals for approximate answers
+
+
+def run_approximate(con, query: str, state: AgentState) -> Optional[Tuple[pd.DataFrame, str]]:
+    """
+    Answers an aggregate query from the dataset's sample. Returns the estimated
+    result plus a warning with its error bounds, or None to run the query exactly.
+    """
+    sample = attach_sample_view(con, state)
+    if sample is None:
+        return None
+    names = [row[0] for row in con.execute(f"DESCRIBE {query}").fetchall()]
+    plan = rewrite_for_sample(query, names)
+    if plan is None:
+        return None
+    sample_query, se_columns, unscaled = plan
+
+    with span("duckdb.execute", stage="duckdb", **{"db.statement": sample_query, "approximate": True}) as s:
+        try:
+            df = con.execute(sample_query).df()
+        except duckdb.Error as e:
+            # A rewrite DuckDB rejects is our bug, not the query's: answer exactly instead of costing a retry.
+            print(f"🎯 [Approximate] Sample query failed, running exactly: {e}")
+            return None
+        record_duckdb_stats(con, s)
+
+    bounds = []
+    for column, se_column in se_columns.items():
+        # Worst relative half-width over the result rows.
+        relative = (CI_Z * df[se_column] / df[column].abs()).replace([float("inf")], float("nan")).max()
+        if pd.notna(relative):
+            bounds.append(f"{column} ±{relative:.1%}")
+    df = df.drop(columns=list(se_columns.values()))
+
+    warning = (
+        f"≈ Approximate: estimated from a {sample['method']} sample of "
+        f"{sample['rows']:,} of {sample['base_rows']:,} rows."
+    )
+    if bounds:
+        warning += f" 95% error bounds (worst row): {', '.join(bounds)}."
+    if unscaled:
+        warning += f" Computed on the sample without error bounds: {', '.join(unscaled)}."
+    return df, warning
 
 
 def execute_sql_node(state: AgentState):
     """
-    Executes the LLM-generated SQL query against the S3 parquet view.
+    Executes the LLM-generated SQL query against data_table — the S3 parquet
+    view, or the live table of an attached Postgres/MySQL source.
 
     Produces:
     - ui_blocks: [sql code block, table block (capped)]
     - df_json:   compact JSON of the result (capped for viz) passed to generate_visuals
+    - result_profile: SUMMARIZE of the full result for the synthesizer
     """
-    query        = state.get("current_code")
-    artifact_url = state.get("artifact_url")
-    s3_path      = f"s3://raw-data/{artifact_url}"
+    query = state.get("current_code")
 
     print(f"⚙️ [SQL Executor] Running query...")
 
-    con = get_duckdb_connection()
+    con = None
 
     try:
-        con.execute(f"CREATE OR REPLACE VIEW data_table AS SELECT * FROM read_parquet('{s3_path}')")
-        df = con.execute(query).df()
+        # Waits for an execution slot (or raises Saturated, answered with a 429).
+        with duckdb_scheduler.slot(state.get("client_id") or "anonymous", state.get("source_id")):
+            con = open_data_table(state)
+            con.execute("PRAGMA enable_profiling='no_output'")
+            # Schema mistakes are fixed here when possible instead of costing an LLM retry.
+            query, _ = prepare_query(con, query, state)
+            approximate = run_approximate(con, query, state) if state.get("approximate") else None
+            if approximate is not None:
+                df, approx_warning = approximate
+            else:
+                approx_warning = None
+                with span("duckdb.execute", stage="duckdb", **{"db.statement": query}) as s:
+                    df = con.execute(query).df()
+                    record_duckdb_stats(con, s)
+            # Profiled before the None-fill below turns typed columns into objects.
+            result_profile = profile_result(con, df)
         df = df.where(df.notnull(), None)
 
         total_rows = len(df)
 
         # ── Table block (capped for client safety) ────────────────────────────
-        df_display = df.head(MAX_TABLE_ROWS)
-        records    = df_display.to_dict(orient="records")
-        columns    = df.columns.tolist()
+        with span("serialize.table", stage="serialization"):
+            df_display = df.head(MAX_TABLE_ROWS)
+            records    = df_display.to_dict(orient="records")
+            columns    = df.columns.tolist()
 
         warning = None
         if total_rows > MAX_TABLE_ROWS:
@@ -41,30 +108,45 @@ def execute_sql_node(state: AgentState):
                 f"Ask for an aggregated view to see full trends."
             )
 
+        table_block = {"type": "table", "columns": columns, "data": records, "warning": warning, "total_rows": total_rows}
+        if approx_warning:
+            table_block["warning"] = " ".join(w for w in (approx_warning, warning) if w)
+            table_block["approximate"] = True
+        else:
+            # Re-queried on demand: paged (GET /dataset/{source_id}/results/{result_id}/rows)
+            # or exported in full (.../results/{result_id}/export)
+            table_block["result_id"] = remember_result(state, query, total_rows)
         ui_blocks = [
             {"type": "code",  "language": "sql", "content": query},
-            {"type": "table", "columns": columns, "data": records, "warning": warning},
+            table_block,
         ]
 
         # ── Pass a larger (but still capped) df to the visualizer ─────────────
-        df_viz   = df.head(MAX_VIZ_ROWS)
-        df_json  = df_viz.to_json(orient="split", date_format="iso")
+        with span("serialize.df_json", stage="serialization"):
+            df_viz   = df.head(MAX_VIZ_ROWS)
+            df_json  = df_viz.to_json(orient="split", date_format="iso")
 
         print(f"✅ [SQL Executor] {total_rows} rows returned.")
         return {
             "ui_blocks":   ui_blocks,
+            "current_code": query,
             "df_json":     df_json,
+            "result_profile": result_profile,
             "error_trace": None,
             "attempt_count": 0,
         }
 
+    except Saturated:
+        raise   # Not the query's fault: no retry, the client gets a 429
     except Exception as e:
         print(f"❌ [SQL Executor] Crashed: {str(e)}")
         return {
             "ui_blocks":     [],
             "df_json":       None,
+            "result_profile": None,
             "error_trace":   str(e),
             "attempt_count": state.get("attempt_count", 0) + 1,
         }
     finally:
-        con.close()
\ No newline at end of file
+        if con is not None:
+            con.close()
\ No newline at end of file
@@ -5,6 +5,11 @@ from pydantic import BaseModel, Field
 from langchain_core.messages import SystemMessage, HumanMessage
 from agent.state import AgentState
 from agent.nodes.router import llm
+from agent.result_profile import templated_insight
+from agent.token_usage import prompt_usage
+from observability.metrics import LLM_CALLS_SAVED
+
+STATS_MAX_NUMERIC = 4   # Numeric columns described in the prompt
 
 
 class InsightGeneration(BaseModel):
@@ -23,6 +28,42 @@ class InsightGeneration(BaseModel):
     )
 
 
+def _table_block(ui_blocks: list):
+    return next((b for b in ui_blocks if b.get("type") == "table"), None)
+
+
+def _num(value) -> str:
+    try:
+        return f"{float(value):.3g}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _profile_stats(profile: dict, ui_blocks: list) -> str:
+    """Prompt stats from the executor's DuckDB profile (full result) and the table block's rows."""
+    columns = profile["columns"]
+    lines = [
+        f"Shape: {profile['rows']} rows x {profile['column_count']} columns",
+        f"Columns: {', '.join(c['name'] for c in columns)}",
+    ]
+    for c in [c for c in columns if c["numeric"]][:STATS_MAX_NUMERIC]:
+        if c["min"] is not None:
+            lines.append(
+                f"{c['name']}: min={_num(c['min'])}, max={_num(c['max'])}, "
+                f"mean={_num(c['mean'])}, median={_num(c['median'])}"
+            )
+    for c in columns:
+        if c["numeric"] or c["min"] is None:
+            continue
+        span_text = f", from {c['min']} to {c['max']}" if c["type"].startswith(("DATE", "TIME")) else ""
+        lines.append(f"{c['name']}: ~{c['distinct']} distinct{span_text}")
+    table = _table_block(ui_blocks)
+    if table and table.get("data"):
+        sample = pd.DataFrame(table["data"][:5], columns=table.get("columns"))
+        lines.append(f"\nSample (top 5 rows):\n{sample.to_string(index=False)}")
+    return "\n".join(lines)
+
+
 def _compact_stats(df_json: str, ui_blocks: list) -> str:
     lines = []
     try:
@@ -30,7 +71,7 @@ def _compact_stats(df_json: str, ui_blocks: list) -> str:
         lines.append(f"Shape: {len(df)} rows x {len(df.columns)} columns")
         lines.append(f"Columns: {', '.join(df.columns.tolist())}")
         numeric_cols = df.select_dtypes(include="number").columns.tolist()
-        for col in numeric_cols[:4]:
+        for col in numeric_cols[:STATS_MAX_NUMERIC]:
             s = df[col].dropna()
             if len(s):
                 lines.append(
@@ -54,8 +95,6 @@ def synthesize_node(state: AgentState):
     Final order in ui_blocks will be: [sql, table, chart, insight].
     The API layer should reverse or the frontend should render insight first.
     """
-    print("🧠 [Synthesizer] Generating explanation and insights...")
-
     if state.get("attempt_count", 0) >= 3:
         return {
             "ui_blocks": [{
@@ -75,13 +114,31 @@ def synthesize_node(state: AgentState):
     if not ui_blocks:
         return {}
 
+    # A count or a three-row breakdown is restated from its rows; no LLM needed.
+    # Approximate tables are not: their insight has to present the numbers as estimates.
+    profile = state.get("result_profile")
+    table = _table_block(ui_blocks)
+    if profile and table is not None and not table.get("approximate"):
+        content = templated_insight(profile, table.get("data") or [])
+        if content:
+            LLM_CALLS_SAVED.labels("insight_template").inc()
+            print("🧠 [Synthesizer] Templated insight for a small result.")
+            return {"ui_blocks": [{"type": "markdown", "content": content}]}
+
+    print("🧠 [Synthesizer] Generating explanation and insights...")
+
     user_question = ""
     for msg in reversed(messages):
         if hasattr(msg, "type") and msg.type == "human":
             user_question = msg.content
             break
 
-    stats_text = _compact_stats(df_json, ui_blocks) if df_json else "(no data summary available)"
+    if profile:
+        stats_text = _profile_stats(profile, ui_blocks)
+    elif df_json:
+        stats_text = _compact_stats(df_json, ui_blocks)   # Python route: its result never went through DuckDB
+    else:
+        stats_text = "(no data summary available)"
 
     system_prompt = (
         "You are a senior data analyst explaining results to a business stakeholder.\n"
@@ -99,12 +156,12 @@ def synthesize_node(state: AgentState):
         f"Generate the summary and key insights."
     )
 
+    prompt = [SystemMessage(content=system_prompt), HumanMessage(content=human_prompt)]
+    usage = prompt_usage("Synthesizer", prompt)
+
     try:
         structured_llm = llm.with_structured_output(InsightGeneration)
-        result: InsightGeneration = structured_llm.invoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=human_prompt),
-        ])
+        result: InsightGeneration = structured_llm.invoke(prompt)
 
         bullets = "\n".join(f"- {i}" for i in result.insights)
         insight_block = {
@@ -118,8 +175,8 @@ def synthesize_node(state: AgentState):
         # Return ONLY the insight block — append_block reducer handles accumulation.
         # Do NOT re-emit ui_blocks from state here or they will be duplicated.
         print(f"🧠 [Synthesizer] Done. Emitting insight block.")
-        return {"ui_blocks": [insight_block]}
+        return {"ui_blocks": [insight_block], "token_usage": usage}
 
     except Exception as e:
         print(f"🧠 [Synthesizer] Insight generation failed (non-fatal): {e}")
-        return {}
\ No newline at end of file
+        return {"token_usage": usage}
\ No newline at end of file
@@ -1,3 +1,4 @@
+import copy
 import io
 import json
 import pandas as pd
@@ -5,8 +6,13 @@ from pydantic import BaseModel, Field
 from langchain_core.messages import SystemMessage, HumanMessage
 from agent.state import AgentState
 from agent.nodes.router import llm
+from agent.token_usage import prompt_usage
+from agent.tools.chart_tool import DARK_THEME_CONFIG, is_chart_request, recommend_chart
+from observability.metrics import LLM_CALLS_SAVED
 
-MAX_CHART_ROWS = 500
+MAX_CHART_ROWS     = 500
+PROMPT_SAMPLE_ROWS = 5    # Rows shown to the LLM; the spec only needs shape, not data
+PROMPT_MAX_COLUMNS = 30   # Wide results: describe only the first N columns
 
 
 # ── The model sometimes puts the Vega-Lite keys flat at the tool-call level
@@ -69,18 +75,7 @@ SPEC RULES:
 5. For time columns use timeUnit (year, month, yearmonth, date, etc)
 
 ALWAYS include this config inside spec:
-"config": {
-  "background": "#111111",
-  "view": {"stroke": "transparent"},
-  "axis": {"gridColor": "#2a2a2a", "tickColor": "#3a3a3a", "labelColor": "#9ca3af",
-           "titleColor": "#6b7280", "domainColor": "#2a2a2a", "labelFont": "monospace",
-           "titleFont": "monospace", "labelFontSize": 11, "titleFontSize": 11},
-  "legend": {"labelColor": "#9ca3af", "titleColor": "#6b7280",
-             "labelFont": "monospace", "titleFont": "monospace", "labelFontSize": 11},
-  "title": {"color": "#d1d5db", "font": "monospace", "fontSize": 12},
-  "arc": {"stroke": "#111111", "strokeWidth": 1.5},
-  "bar": {"cornerRadiusTopLeft": 3, "cornerRadiusTopRight": 3}
-}
+"config": """ + json.dumps(DARK_THEME_CONFIG, indent=2) + """
 
 Colors: single-series → use {"value": "#60a5fa"} in color encoding.
 Multi-series → "scheme": "category10".
@@ -105,11 +100,10 @@ def _rescue_bare_spec(raw: dict) -> dict | None:
 
 def generate_visuals(state: AgentState):
     """
-    Calls the LLM to generate a Vega-Lite v5 spec from the SQL result.
+    Builds a Vega-Lite v5 spec for the SQL result: by rule for the common result
+    shapes, by the LLM for ambiguous ones or when the user asked for a specific chart.
     Appends { type: "chart", spec: {...}, data: [...] } to ui_blocks.
     """
-    print("📊 [Visualizer] Generating Vega-Lite spec via LLM...")
-
     df_json  = state.get("df_json")
     messages = state.get("messages", [])
 
@@ -127,16 +121,6 @@ def generate_visuals(state: AgentState):
         print("📊 [Visualizer] Empty DataFrame — skipping.")
         return {}
 
-    # Build schema description for the prompt
-    schema_lines = []
-    for col in df.columns:
-        dtype = str(df[col].dtype)
-        samples = df[col].dropna().head(3).tolist()
-        schema_lines.append(f"  - {col} ({dtype}): e.g. {samples}")
-    schema_text = "\n".join(schema_lines)
-
-    sample_text = json.dumps(df.head(10).to_dict(orient="records"), default=str, indent=2)
-
     user_question = ""
     for msg in reversed(messages):
         if hasattr(msg, "type") and msg.type == "human":
@@ -145,19 +129,48 @@ def generate_visuals(state: AgentState):
 
     total_rows = len(df)
 
+    # Common shapes (a trend, a ranking, a breakdown) are charted from column kinds alone.
+    if not is_chart_request(user_question):
+        decision = recommend_chart(df)
+        if decision is not None:
+            LLM_CALLS_SAVED.labels("chart_rules").inc()
+            if decision.spec is None:
+                print(f"📊 [Visualizer] Skipping chart: {decision.reason}")
+                return {}
+            print(f"📊 [Visualizer] Rule-based chart ({decision.reason}).")
+            return {"ui_blocks": [_chart_block(decision.spec, df)]}
+
+    print("📊 [Visualizer] Generating Vega-Lite spec via LLM...")
+
+    # Build schema description for the prompt
+    prompt_cols  = df.columns[:PROMPT_MAX_COLUMNS]
+    schema_lines = []
+    for col in prompt_cols:
+        dtype = str(df[col].dtype)
+        samples = df[col].dropna().head(3).tolist()
+        schema_lines.append(f"  - {col} ({dtype}): e.g. {samples}")
+    if len(df.columns) > PROMPT_MAX_COLUMNS:
+        schema_lines.append(f"  ... and {len(df.columns) - PROMPT_MAX_COLUMNS} more columns")
+    schema_text = "\n".join(schema_lines)
+
+    # Compact JSON (no indentation) keeps the sample small in tokens.
+    sample_text = json.dumps(
+        df[prompt_cols].head(PROMPT_SAMPLE_ROWS).to_dict(orient="records"), default=str, separators=(",", ":")
+    )
+
     human_prompt = (
         f'User question: "{user_question}"\n\n'
         f"Dataset schema ({total_rows} rows):\n{schema_text}\n\n"
-        f"Sample (first 10 rows):\n{sample_text}\n\n"
+        f"Sample (first {PROMPT_SAMPLE_ROWS} rows):\n{sample_text}\n\n"
         'Return the Vega-Lite spec nested under the "spec" key in the tool call.'
     )
 
+    prompt = [SystemMessage(content=VEGA_SYSTEM_PROMPT), HumanMessage(content=human_prompt)]
+    usage = prompt_usage("Visualizer", prompt)
+
     try:
         structured_llm = llm.with_structured_output(VegaLiteSpec)
-        result: VegaLiteSpec = structured_llm.invoke([
-            SystemMessage(content=VEGA_SYSTEM_PROMPT),
-            HumanMessage(content=human_prompt),
-        ])
+        result: VegaLiteSpec = structured_llm.invoke(prompt)
 
         if result.skip:
             print(f"📊 [Visualizer] Skipping chart: {result.reason}")
@@ -193,19 +206,22 @@ def generate_visuals(state: AgentState):
             print(f"📊 [Visualizer] Rescue attempt threw: {rescue_err}")
             return {}
 
-    # Ensure data source is always the named dataset, not inline
-    spec["data"] = {"name": "table"}
-
-    chart_data = df.head(MAX_CHART_ROWS).to_dict(orient="records")
-    chart_block = {
-        "type": "chart",
-        "spec": spec,
-        "data": chart_data,
-        "row_count": total_rows,
-    }
+    # The theme is not left to the model: a spec without it would render light.
+    spec.setdefault("config", copy.deepcopy(DARK_THEME_CONFIG))
 
     mark = spec.get("mark", "")
     mark_type = mark.get("type", mark) if isinstance(mark, dict) else mark
     print(f"📊 [Visualizer] Done. Mark type: {mark_type}")
 
-    return {"ui_blocks": [chart_block]}
\ No newline at end of file
+    return {"ui_blocks": [_chart_block(spec, df)], "token_usage": usage}
+
+
+def _chart_block(spec: dict, df: pd.DataFrame) -> dict:
+    # Ensure data source is always the named dataset, not inline
+    spec["data"] = {"name": "table"}
+    return {
+        "type": "chart",
+        "spec": spec,
+        "data": df.head(MAX_CHART_ROWS).to_dict(orient="records"),
+        "row_count": len(df),
+    }
\ No newline at end of file
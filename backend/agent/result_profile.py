@@ -0,0 +1,120 @@
+"""
+Profile of a query result, computed by DuckDB next to the query that produced it.
+
+One SUMMARIZE over the full result (not the visualizer's capped rows) gives the
+synthesizer per-column type, range, mean, median, distinct and null counts, so
+it no longer re-parses df_json in pandas. Small results also get a templated
+insight here instead of a synthesizer LLM call: restating a count or a three-row
+breakdown needs no model.
+"""
+from typing import Any, Dict, List, Optional
+
+import duckdb
+import pandas as pd
+
+from observability.tracing import span
+
+PROFILE_MAX_COLUMNS  = 20   # Columns described to the synthesizer
+TEMPLATE_MAX_ROWS    = 5    # Results this small get a templated insight
+TEMPLATE_MAX_COLUMNS = 6
+
+_NUMERIC_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                  "UINTEGER", "UBIGINT", "UHUGEINT", "FLOAT", "REAL", "DOUBLE", "DECIMAL")
+_TEMPORAL_TYPES = ("DATE", "TIME", "INTERVAL")   # TIMESTAMP* and TIME WITH TIME ZONE included
+
+
+def _text(value: Any) -> Optional[str]:
+    return None if value is None or (isinstance(value, float) and pd.isna(value)) else str(value)
+
+
+def profile_result(con: duckdb.DuckDBPyConnection, df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    """SUMMARIZE of `df` on the executor's connection; None when DuckDB cannot profile it."""
+    with span("result.profile", stage="profile", **{"result.rows": len(df)}):
+        try:
+            con.register("query_result", df)
+            cursor = con.execute("SUMMARIZE query_result")
+            names = [d[0] for d in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        except duckdb.Error as e:
+            print(f"⚠️ [Profile] SUMMARIZE failed (non-fatal): {e}")
+            return None
+        finally:
+            try:
+                con.unregister("query_result")
+            except duckdb.Error:
+                pass
+
+    columns = [{
+        "name":     row["column_name"],
+        "type":     row["column_type"],
+        "numeric":  row["column_type"].split("(")[0] in _NUMERIC_TYPES,
+        "min":      _text(row["min"]),
+        "max":      _text(row["max"]),
+        "mean":     _text(row["avg"]),
+        "median":   _text(row["q50"]),
+        "distinct": row["approx_unique"],
+        "null_pct": float(row["null_percentage"] or 0),
+    } for row in rows[:PROFILE_MAX_COLUMNS]]
+    return {"rows": len(df), "column_count": len(df.columns), "columns": columns}
+
+
+def _fmt(value: Any) -> str:
+    if value is None:
+        return "—"
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, float) and not value.is_integer():
+        return f"{value:,.4g}" if abs(value) < 1000 else f"{value:,.2f}"
+    return f"{int(value):,}"
+
+
+def _is_temporal(column_type: str) -> bool:
+    return column_type.split("(")[0].startswith(_TEMPORAL_TYPES)
+
+
+def _label(name: str) -> str:
+    return name.replace("_", " ")
+
+
+def templated_insight(profile: Dict[str, Any], records: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Markdown insight for an empty, single-row or tiny result, built from its rows;
+    None when the result needs real analysis. `records` are the table block's rows.
+    """
+    rows, width = profile["rows"], profile["column_count"]
+    if rows == 0:
+        return "**Analysis**\n\nNo rows match this question. Try widening the filters or time range."
+    if rows > TEMPLATE_MAX_ROWS or width > TEMPLATE_MAX_COLUMNS or len(records) < rows:
+        return None
+
+    columns = profile["columns"]
+    if rows == 1:
+        row = records[0]
+        if width == 1:
+            name = columns[0]["name"]
+            return f"**Analysis**\n\nThe {_label(name)} is **{_fmt(row[name])}**."
+        facts = "\n".join(f"- {_label(c['name'])}: **{_fmt(row[c['name']])}**" for c in columns)
+        return f"**Analysis**\n\nThe result is a single row:\n\n{facts}"
+
+    # A small breakdown: one label column and one measure, ranked.
+    numeric = [c["name"] for c in columns if c["numeric"]]
+    labels = [c["name"] for c in columns if not c["numeric"]]
+    if len(numeric) != 1 or len(labels) != 1:
+        return None
+    measure, label = numeric[0], labels[0]
+    if _is_temporal(next(c["type"] for c in columns if c["name"] == label)):
+        return None     # A short time series is a trend, not a ranking: left to the LLM
+    ranked = sorted((r for r in records if r[measure] is not None), key=lambda r: r[measure], reverse=True)
+    if len(ranked) < 2:
+        return None
+    top, bottom = ranked[0], ranked[-1]
+    lines = [
+        f"- Highest {_label(measure)}: **{_fmt(top[label])}** ({_fmt(top[measure])})",
+        f"- Lowest {_label(measure)}: **{_fmt(bottom[label])}** ({_fmt(bottom[measure])})",
+    ]
+    if bottom[measure] > 0:
+        lines.append(f"- {_fmt(top[label])} is {top[measure] / bottom[measure]:.1f}× {_fmt(bottom[label])}")
+    return (
+        f"**Analysis**\n\n{_label(measure).capitalize()} across {len(ranked)} values of {_label(label)}."
+        f"\n\n**Key Insights**\n\n" + "\n".join(lines)
+    )
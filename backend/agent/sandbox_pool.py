@@ -0,0 +1,478 @@
+"""
+Pool of warm worker processes that run generated pandas code.
+
+Workers are forked from a forkserver that has already imported pandas, numpy,
+pyarrow and duckdb, so both the initial pool and any replacement (after a
+timeout or crash) start in milliseconds. The query result travels as an Arrow
+IPC stream in a shared-memory segment the worker maps read-only; `df` is built
+from those buffers instead of being pickled through a pipe.
+
+Limits per job: wall-clock timeout (worker killed and replaced), CPU seconds
+(RLIMIT_CPU) and address space (RLIMIT_AS). Before it takes a job, each worker
+shuts itself in, with kernel mechanisms that hold against C extensions and
+ctypes as well as Python:
+
+    - user, network and mount namespaces: no network interface but a downed
+      loopback
+    - chroot into its empty temp dir, with only the Python installation
+      (stdlib, site-packages) bind-mounted read-only for imports
+    - all capabilities dropped, so the chroot cannot be undone
+    - a seccomp filter: no fork, exec, ptrace, or signals to other processes
+      (threads are still allowed)
+
+The query result comes in as a file descriptor, not a path. IP sockets are
+also refused in Python, and DuckDB external access is off and locked on every
+connection. A kernel without unprivileged user namespaces or seccomp cannot
+provide this. The pool then refuses to start, and chats fall back from the
+python intent to SQL (`sandbox_available`).
+"""
+import contextlib
+import ctypes
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import site
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from multiprocessing import reduction, shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+
+SANDBOX_WORKERS     = int(os.getenv("SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT_S   = float(os.getenv("SANDBOX_TIMEOUT_S", "10"))
+SANDBOX_CPU_S       = int(os.getenv("SANDBOX_CPU_S", "10"))
+SANDBOX_MEMORY_MB   = int(os.getenv("SANDBOX_MEMORY_MB", "1024"))   # On top of the worker's own footprint
+SANDBOX_MAX_STDOUT  = 10_000    # Characters of print() output kept
+SANDBOX_TABLE_ROWS  = 100       # Rows of `result` returned for the table block
+SANDBOX_VIZ_ROWS    = 500       # Rows of `result` returned as df_json
+REPLACE_ATTEMPTS    = 5         # Tries to start a replacement worker before giving the slot up
+
+_PRELOAD = ["numpy", "pandas", "pyarrow", "duckdb", "agent.sandbox_pool"]
+
+
+class SandboxUnavailable(RuntimeError):
+    """The kernel cannot isolate sandbox workers, so generated code is not run at all."""
+
+
+# ── Worker side ───────────────────────────────────────────────────────────────
+_CLONE_NEWNS   = 0x00020000
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET  = 0x40000000
+_CLONE_THREAD  = 0x00010000
+_MS_RDONLY, _MS_REMOUNT, _MS_BIND, _MS_REC, _MS_PRIVATE = 0x1, 0x20, 0x1000, 0x4000, 0x40000
+# statvfs flag → mount flag: a read-only remount must keep the flags locked on the original mount.
+_KEPT_MOUNT_FLAGS = {0x2: 0x2, 0x4: 0x4, 0x8: 0x8, 0x400: 0x400, 0x800: 0x800, 0x1000: 0x200000}
+_PR_SET_NO_NEW_PRIVS, _PR_SET_SECCOMP, _SECCOMP_MODE_FILTER = 38, 22, 2
+_LINUX_CAPABILITY_VERSION_3 = 0x20080522
+_LOCKED_DUCKDB = {"enable_external_access": False, "lock_configuration": True}
+
+# Per architecture: (audit arch, denied syscalls, clone, clone3). Denied: fork, vfork, execve,
+# execveat, ptrace, process_vm_readv/writev, kill, tkill, tgkill, rt_(tg)sigqueueinfo, pidfd_*.
+_SECCOMP_ARCHES = {
+    "x86_64":  (0xC000003E, (57, 58, 59, 322, 101, 310, 311, 62, 200, 234, 129, 297, 434, 424, 438), 56, 435),
+    "aarch64": (0xC00000B7, (221, 281, 117, 270, 271, 129, 130, 131, 138, 240, 434, 424, 438), 220, 435),
+}
+_X32_SYSCALL_BIT = 0x40000000
+
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [("code", ctypes.c_uint16), ("jt", ctypes.c_uint8), ("jf", ctypes.c_uint8), ("k", ctypes.c_uint32)]
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_uint16), ("filter", ctypes.POINTER(_SockFilter))]
+
+
+class _CapHeader(ctypes.Structure):
+    _fields_ = [("version", ctypes.c_uint32), ("pid", ctypes.c_int)]
+
+
+class _CapData(ctypes.Structure):
+    _fields_ = [("effective", ctypes.c_uint32), ("permitted", ctypes.c_uint32), ("inheritable", ctypes.c_uint32)]
+
+
+def _seccomp_filter(machine: str) -> List[Tuple[int, int, int, int]]:
+    """
+    BPF: the denied syscalls (and any foreign ABI) fail with EPERM; clone only
+    for threads; clone3, whose flags BPF cannot read, fails with ENOSYS so libc
+    falls back to clone.
+    """
+    if machine not in _SECCOMP_ARCHES:
+        raise OSError(f"no seccomp filter for {machine}")
+    arch, denied, clone, clone3 = _SECCOMP_ARCHES[machine]
+    ld, jeq, jge, jset, ret = 0x20, 0x15, 0x35, 0x45, 0x06
+    # (code, label if true, label if false, k): seccomp_data has nr at offset 0, arch at 4, args from 16.
+    program = [(ld, None, None, 4), (jeq, None, "eperm", arch), (ld, None, None, 0)]
+    if machine == "x86_64":
+        program.append((jge, "eperm", None, _X32_SYSCALL_BIT))
+    program += [(jeq, "eperm", None, nr) for nr in denied]
+    program += [(jeq, "enosys", None, clone3), (jeq, "clone", "allow", clone)]
+    labels = {}
+    for label, block in (
+        ("clone",  [(ld, None, None, 16), (jset, "allow", "eperm", _CLONE_THREAD)]),
+        ("allow",  [(ret, None, None, 0x7FFF0000)]),
+        ("eperm",  [(ret, None, None, 0x00050000 | 1)]),
+        ("enosys", [(ret, None, None, 0x00050000 | 38)]),
+    ):
+        labels[label] = len(program)
+        program += block
+    # Jumps are relative to the next instruction.
+    return [(code, labels[jt] - i - 1 if jt else 0, labels[jf] - i - 1 if jf else 0, k)
+            for i, (code, jt, jf, k) in enumerate(program)]
+
+
+def _check(result: int, what: str) -> None:
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def _read_only_roots() -> List[str]:
+    """The Python installation the worker may import from: prefixes and site-packages, nothing else."""
+    candidates = [sys.prefix, sys.base_prefix, sys.exec_prefix, *site.getsitepackages(), site.getusersitepackages()]
+    roots = []
+    for path in sorted({os.path.realpath(p) for p in candidates if os.path.isdir(p)}):
+        if not any(path.startswith(root + os.sep) for root in roots):
+            roots.append(path)
+    return roots
+
+
+def _isolate(root: str) -> None:
+    """
+    Shuts this (still single-threaded) worker into `root` with no network, no
+    capabilities and the seccomp filter. Raises OSError where the kernel does
+    not allow any step. Pipes to the pool were opened before, so they keep working.
+    """
+    libc = ctypes.CDLL(None, use_errno=True)
+    _check(libc.unshare(_CLONE_NEWUSER | _CLONE_NEWNET | _CLONE_NEWNS), "unshare")
+    _check(libc.mount(b"none", b"/", None, _MS_REC | _MS_PRIVATE, None), "mount private")
+    for source in _read_only_roots():
+        target = (root + source).encode()
+        os.makedirs(target, exist_ok=True)
+        _check(libc.mount(source.encode(), target, None, _MS_BIND | _MS_REC, None), f"bind {source}")
+        kept = os.statvfs(source).f_flag
+        flags = sum(mount for statvfs, mount in _KEPT_MOUNT_FLAGS.items() if kept & statvfs)
+        _check(libc.mount(None, target, None, _MS_REMOUNT | _MS_BIND | _MS_RDONLY | flags, None), f"remount {source}")
+    os.chroot(root)
+    os.chdir("/")
+
+    no_caps = (_CapData * 2)()
+    _check(libc.capset(ctypes.byref(_CapHeader(_LINUX_CAPABILITY_VERSION_3, 0)), no_caps), "capset")
+    instructions = _seccomp_filter(platform.machine())
+    program = _SockFprog(len(instructions), (_SockFilter * len(instructions))(*instructions))
+    _check(libc.prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "no_new_privs")
+    _check(libc.prctl(_PR_SET_SECCOMP, _SECCOMP_MODE_FILTER, ctypes.byref(program), 0, 0), "seccomp")
+
+
+def _block_network() -> None:
+    import _socket
+    import socket
+
+    import duckdb
+
+    def _denied(*args, **kwargs):
+        raise PermissionError("Network access is disabled in the sandbox")
+
+    def _no_ip_socket(base):
+        class _NoSocket(base):
+            def __init__(self, family=-1, *args, **kwargs):
+                # AF_UNIX stays usable (multiprocessing internals); IP sockets do not.
+                if family in (socket.AF_INET, socket.AF_INET6, -1):
+                    _denied()
+                super().__init__(family, *args, **kwargs)
+        return _NoSocket
+
+    # The C module too: `import _socket` would otherwise hand out raw sockets.
+    _socket.socket = _no_ip_socket(_socket.socket)
+    socket.socket = _no_ip_socket(socket.socket)
+    for module in (socket, _socket):
+        module.getaddrinfo = _denied
+    socket.create_connection = _denied
+
+    # duckdb.sql / execute / query / read_* run on the module's default connection:
+    # locked, so generated code cannot turn external access back on.
+    default = duckdb.default_connection()
+    for setting, value in _LOCKED_DUCKDB.items():
+        default.execute(f"SET {setting} = {str(value).lower()}")
+
+    _connect = duckdb.connect
+
+    def _local_connect(database=":memory:", read_only=False, config=None):
+        return _connect(database, read_only=read_only, config={**(config or {}), **_LOCKED_DUCKDB})
+
+    duckdb.connect = _local_connect
+
+
+def _apply_memory_limit(statm, memory_mb: int) -> None:
+    # /proc/self/statm, opened before the chroot hid /proc.
+    with statm:
+        current = int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    limit = current + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _frame_payload(result: Any) -> Optional[Dict[str, Any]]:
+    """`result` from user code → columns / records / df_json, or None if it is not tabular."""
+    import pandas as pd
+
+    if isinstance(result, pd.Series):
+        result = result.to_frame().reset_index()
+    if not isinstance(result, pd.DataFrame):
+        return None
+    if not isinstance(result.index, pd.RangeIndex):
+        result = result.reset_index()
+    result.columns = [str(c) for c in result.columns]
+    return {
+        "columns":    result.columns.tolist(),
+        "records":    json.loads(result.head(SANDBOX_TABLE_ROWS).to_json(orient="records", date_format="iso")),
+        "total_rows": len(result),
+        "df_json":    result.head(SANDBOX_VIZ_ROWS).to_json(orient="split", date_format="iso"),
+    }
+
+
+def _run_job(job: Dict[str, Any], fd: int) -> Dict[str, Any]:
+    import numpy as np
+    import pandas as pd
+
+    import duckdb
+
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_limit = int(used.ru_utime + used.ru_stime) + job["cpu_seconds"]
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+
+    # Zero-copy: the Arrow buffers point straight into the shared segment (unmapped once they are freed).
+    segment = mmap.mmap(fd, 0, prot=mmap.PROT_READ)
+    os.close(fd)
+    stdout = io.StringIO()
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(segment)).read_all()
+        namespace = {"pd": pd, "np": np, "duckdb": duckdb, "table": table, "df": table.to_pandas(), "result": None}
+        # Without external access DuckDB no longer scans Python variables by name; register them instead.
+        default = duckdb.default_connection()
+        default.register("df", namespace["df"])
+        default.register("table", table)
+        with contextlib.redirect_stdout(stdout):
+            exec(compile(job["code"], "<sandbox>", "exec"), namespace)
+        result = namespace.get("result")
+        payload = _frame_payload(result)
+        return {
+            "ok":     True,
+            "stdout": stdout.getvalue()[:SANDBOX_MAX_STDOUT],
+            "frame":  payload,
+            "value":  None if payload is not None or result is None else repr(result)[:SANDBOX_MAX_STDOUT],
+        }
+    except MemoryError:
+        return {"ok": False, "error": f"MemoryError: the code exceeded the sandbox memory limit ({job['memory_mb']} MB)"}
+    except BaseException:
+        # Only the frames from the generated code are useful to the model.
+        lines = traceback.format_exc().splitlines()
+        return {"ok": False, "error": "\n".join(lines[-6:]), "stdout": stdout.getvalue()[:SANDBOX_MAX_STDOUT]}
+    finally:
+        for name in ("df", "table"):
+            try:
+                duckdb.default_connection().unregister(name)
+            except duckdb.Error:
+                pass
+        namespace = table = segment = None
+
+
+def _worker_main(conn, memory_mb: int) -> None:
+    statm = open("/proc/self/statm")
+    try:
+        _isolate(tempfile.mkdtemp(prefix="sandbox_"))
+    except OSError as e:
+        # Fail closed: a worker that cannot shut itself in never runs code.
+        conn.send(("unisolated", str(e)))
+        return
+    # Made before _block_network, which leaves the socket module unusable: receives each job's segment.
+    channel = socket.socket(fileno=os.dup(conn.fileno()))
+    _block_network()
+    _apply_memory_limit(statm, memory_mb)
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+            _, (fd,), _, _ = socket.recv_fds(channel, 1, 1)
+        except (EOFError, ValueError):
+            return
+        conn.send(_run_job(job, fd))
+
+
+# ── Pool side ─────────────────────────────────────────────────────────────────
+def _ipc_size(table: pa.Table) -> int:
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.size()
+
+
+def _write_ipc(shm: shared_memory.SharedMemory, table: pa.Table) -> None:
+    # Own function so the Arrow views of shm.buf are gone before shm.close().
+    sink = pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf))
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    sink.close()
+
+
+class _Worker:
+    def __init__(self, ctx, memory_mb: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self, timeout: float) -> Optional[Tuple[str, Any]]:
+        """("ready", pid), ("unisolated", reason), or None when the worker died or hung."""
+        try:
+            return self.conn.recv() if self.conn.poll(timeout) else None
+        except EOFError:
+            return None
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class SandboxPool:
+    """Fixed-size pool; `run` blocks until a worker is free (threads may call it concurrently)."""
+
+    def __init__(self, size: int = SANDBOX_WORKERS, timeout_s: float = SANDBOX_TIMEOUT_S,
+                 cpu_s: int = SANDBOX_CPU_S, memory_mb: int = SANDBOX_MEMORY_MB):
+        self.size = size
+        self.timeout_s = timeout_s
+        self.cpu_s = cpu_s
+        self.memory_mb = memory_mb
+        self._ctx = multiprocessing.get_context("forkserver")
+        self._ctx.set_forkserver_preload(_PRELOAD)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+
+    def start(self) -> None:
+        started = time.perf_counter()
+        workers = [_Worker(self._ctx, self.memory_mb) for _ in range(self.size)]
+        states = [worker.wait_ready(timeout=60) for worker in workers]
+        unisolated = [state[1] for state in states if state and state[0] == "unisolated"]
+        if unisolated or not all(states):
+            for worker in workers:
+                worker.kill()
+            if unisolated:
+                raise SandboxUnavailable(f"Sandbox workers cannot be isolated ({unisolated[0]}); python analysis is off")
+            raise RuntimeError("Sandbox worker failed to start")
+        for worker in workers:
+            self._idle.put(worker)
+        print(f"🧪 [Sandbox] {self.size} workers ready in {time.perf_counter() - started:.2f}s")
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.kill()
+        for attempt in range(1, REPLACE_ATTEMPTS + 1):
+            fresh = _Worker(self._ctx, self.memory_mb)
+            state = fresh.wait_ready(timeout=60)
+            if state and state[0] == "ready":
+                self._idle.put(fresh)
+                return
+            fresh.kill()
+            print(f"🧪 [Sandbox] Replacement worker failed to start (attempt {attempt}/{REPLACE_ATTEMPTS})")
+            time.sleep(min(2 ** attempt, 30))
+        print("🧪 [Sandbox] Giving up on a replacement worker; the pool is one worker smaller")
+
+    def run(self, code: str, table: pa.Table) -> Dict[str, Any]:
+        """
+        Executes `code` with `df` (pandas) and `table` (Arrow) bound to the query result.
+        Returns {"ok", "stdout", "frame", "value"} or {"ok": False, "error"}.
+        """
+        shm = shared_memory.SharedMemory(name=f"sbx_{uuid.uuid4().hex[:16]}", create=True, size=max(_ipc_size(table), 1))
+        try:
+            # Bounded: if replacements keep failing the pool drains, and a caller must not hang on it.
+            worker = self._idle.get(timeout=self.timeout_s)
+        except queue.Empty:
+            shm.close()
+            shm.unlink()
+            return {"ok": False, "error": f"No sandbox worker became free within {self.timeout_s:g}s"}
+        healthy = False
+        fd = None
+        try:
+            _write_ipc(shm, table)
+            # The chrooted worker cannot open /dev/shm: it gets a read-only descriptor of this segment only.
+            fd = os.open(f"/dev/shm/{shm.name}", os.O_RDONLY)
+            worker.conn.send({"code": code, "cpu_seconds": self.cpu_s, "memory_mb": self.memory_mb})
+            reduction.send_handle(worker.conn, fd, worker.process.pid)
+            if not worker.conn.poll(self.timeout_s):
+                return {"ok": False, "error": f"TimeoutError: the code ran longer than {self.timeout_s:g}s"}
+            try:
+                response = worker.conn.recv()
+            except EOFError:
+                return {"ok": False, "error": "The sandbox process died (CPU or memory limit exceeded)"}
+            healthy = True
+            return response
+        finally:
+            if fd is not None:
+                os.close(fd)
+            shm.close()
+            shm.unlink()
+            if healthy:
+                self._idle.put(worker)
+            else:
+                # Off the request path: a replacement forks from the warm server in milliseconds anyway.
+                threading.Thread(target=self._replace, args=(worker,), daemon=True).start()
+
+    def shutdown(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                return
+
+
+_pool: Optional[SandboxPool] = None
+_unavailable: Optional[SandboxUnavailable] = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """
+    The process-wide pool, started on first use (or at app startup via prewarm).
+    Raises SandboxUnavailable, every time, once workers turned out not to be isolatable.
+    """
+    global _pool, _unavailable
+    with _pool_lock:
+        if _unavailable is not None:
+            raise _unavailable
+        if _pool is None:
+            pool = SandboxPool()
+            try:
+                pool.start()
+            except SandboxUnavailable as e:
+                print(f"🧪 [Sandbox] {e}")
+                _unavailable = e
+                raise
+            _pool = pool
+        return _pool
+
+
+def sandbox_available() -> bool:
+    """Whether generated python may run here; the router sends python intents to SQL when it may not."""
+    try:
+        get_sandbox_pool()
+        return True
+    except RuntimeError:   # SandboxUnavailable, or workers that would not start
+        return False
+
+
+def shutdown_sandbox_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,102 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, update
+from sqlmodel import select
+
+from agent.embeddings import embed_text
+from cluster import state as cluster_state
+from db.db import AsyncSessionLocal
+from db.models.question_cache import QuestionCacheEntry
+
+# Cosine similarity needed to reuse an answer. High on purpose: "average price"
+# and "median price" are close in embedding space but are different questions.
+SIMILARITY_THRESHOLD = 0.95
+
+
+def _normalize(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+async def lookup(artifact_url: str, question: str) -> Optional[QuestionCacheEntry]:
+    """
+    Returns the nearest cached answer for this artifact if it is similar enough.
+    Entries are keyed by the artifact's content hash, so a changed dataset never
+    matches answers computed on an older version of it.
+    """
+    if not artifact_url:
+        return None
+
+    # Exact repeats are answered from Redis (multi-worker mode) without embedding the question.
+    exact = await cluster_state.get_answer(artifact_url, question)
+    if exact:
+        print(f"🗄️ [Semantic Cache] Exact hit: {exact['question']!r}")
+        return QuestionCacheEntry(artifact_url=artifact_url, question=exact["question"],
+                                  sql=exact["sql"], blocks=exact["blocks"])
+
+    vector = await asyncio.to_thread(embed_text, _normalize(question))
+    if vector is None:
+        return None
+
+    distance = QuestionCacheEntry.embedding.cosine_distance(vector)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(QuestionCacheEntry, distance.label("distance"))
+            .where(QuestionCacheEntry.artifact_url == artifact_url)
+            .order_by(distance)
+            .limit(1)
+        )
+        row = result.first()
+        if row is None:
+            return None
+
+        entry, dist = row
+        similarity = 1.0 - float(dist)
+        if similarity < SIMILARITY_THRESHOLD:
+            print(f"🗄️ [Semantic Cache] Miss (best similarity {similarity:.3f})")
+            return None
+
+        await session.execute(
+            update(QuestionCacheEntry)
+            .where(QuestionCacheEntry.id == entry.id)
+            .values(hit_count=QuestionCacheEntry.hit_count + 1)
+        )
+        await session.commit()
+
+    print(f"🗄️ [Semantic Cache] Hit (similarity {similarity:.3f}): {entry.question!r}")
+    await cluster_state.put_answer(artifact_url, question, entry.sql, entry.blocks)
+    return entry
+
+
+async def store(artifact_url: str, question: str, sql: Optional[str], blocks: List[Dict[str, Any]]) -> None:
+    """Caches a successful answer. Failures here never affect the response."""
+    if not artifact_url or not blocks:
+        return
+
+    await cluster_state.put_answer(artifact_url, question, sql, blocks)
+    vector = await asyncio.to_thread(embed_text, _normalize(question))
+    if vector is None:
+        return
+
+    async with AsyncSessionLocal() as session:
+        session.add(QuestionCacheEntry(
+            artifact_url=artifact_url,
+            question=question,
+            sql=sql,
+            blocks=blocks,
+            embedding=vector,
+        ))
+        await session.commit()
+    print(f"🗄️ [Semantic Cache] Stored answer for {question!r}")
+
+
+async def invalidate(artifact_url: str) -> int:
+    """Drops every cached answer computed on the given artifact."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            delete(QuestionCacheEntry).where(QuestionCacheEntry.artifact_url == artifact_url)
+        )
+        await session.commit()
+    await cluster_state.drop_answers(artifact_url)
+    print(f"🗄️ [Semantic Cache] Invalidated {result.rowcount} entries for {artifact_url}")
+    return result.rowcount
@@ -0,0 +1,221 @@
+"""
+Local validation and repair of generated SQL, before it costs an LLM retry.
+
+The query is bound (PREPARE) against an empty `data_table` with the dataset's
+schema in a local DuckDB — about a millisecond, no data read. When binding
+fails, deterministic fixes are tried and the first candidate that binds is run:
+
+    - markdown fences / trailing semicolons stripped
+    - column names with spaces quoted ("Sale Price" written bare)
+    - unknown column names mapped to the closest schema column
+      (case, `sale_price` vs "Sale Price", small typos that keep every number)
+    - another table name replaced by data_table (kept as alias) when it is
+      the only table the query reads
+    - other dialects' functions / syntax translated (TOP, DATE_FORMAT, GETDATE, ...)
+
+Only when none binds does the real DuckDB error go back to the LLM.
+"""
+import difflib
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import duckdb
+import sqlglot
+from sqlglot import exp
+
+from observability.metrics import LLM_CALLS_SAVED, SQL_REPAIRS
+from observability.tracing import span
+
+# Dialects LLMs drift into, tried in order after DuckDB's own.
+REPAIR_DIALECTS = ("duckdb", "postgres", "mysql", "tsql", "sqlite", "bigquery", "snowflake")
+FUZZY_CUTOFF    = 0.8
+
+_FENCE = re.compile(r"^\s*```(?:sql)?\s*|\s*```\s*$", re.IGNORECASE)
+_DIGITS = re.compile(r"\d+")
+# String literals, quoted identifiers and comments: text that is not column references.
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/)""", re.DOTALL)
+
+_db: Optional[duckdb.DuckDBPyConnection] = None
+_db_lock = threading.Lock()
+
+
+def _validation_db() -> duckdb.DuckDBPyConnection:
+    """Empty in-process database; each check gets its own cursor with a temp data_table."""
+    global _db
+    with _db_lock:
+        if _db is None:
+            # Queries only bind here; file or URL reads must not be attempted.
+            _db = duckdb.connect(database=':memory:', config={"enable_external_access": False})
+        return _db
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _norm(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def table_columns(con, state) -> Dict[str, str]:
+    """{column: type} of data_table: from the catalog stats, else DESCRIBE (live sources)."""
+    if state.get("column_types"):
+        return state["column_types"]
+    return dict(con.execute("SELECT column_name, column_type FROM (DESCRIBE data_table)").fetchall())
+
+
+def check(sql: str, columns: Dict[str, str]) -> Optional[str]:
+    """The binder / parser error of `sql` against an empty data_table, or None if it binds."""
+    con = _validation_db().cursor()
+    try:
+        try:
+            con.execute(f"CREATE TEMP TABLE data_table ({', '.join(f'{_q(n)} {t}' for n, t in columns.items())})")
+        except duckdb.Error:
+            return None     # A type this build cannot create: no opinion, the real run decides
+        try:
+            con.execute(f"PREPARE _check AS {sql}")
+            return None
+        except duckdb.Error as e:
+            return str(e)
+    finally:
+        con.close()
+
+
+def _quote_spaced_columns(sql: str, columns: Dict[str, str], fixes: List[str]) -> str:
+    """
+    Quotes bare column names that contain spaces. It works on the text because
+    sqlglot reads `Sale Price` as `Sale AS Price`. Literals, quoted names and
+    comments are left alone: `note = 'order date'` must keep its string.
+    """
+    # Odd indexes are the quoted spans (the split pattern's group).
+    spans = _QUOTED.split(sql)
+    for name in sorted(columns, key=len, reverse=True):
+        if re.fullmatch(r"\w+", name):
+            continue
+        pattern = re.compile(r"(?<![\w\"'`\[])" + r"\s+".join(map(re.escape, name.split())) + r"(?![\w\"'`\]])", re.IGNORECASE)
+        count = 0
+        for i in range(0, len(spans), 2):
+            spans[i], n = pattern.subn(lambda _: _q(name), spans[i])
+            count += n
+        if count:
+            fixes.append(f"quoted {_q(name)}")
+    return "".join(spans)
+
+
+def _fix_tables(tree: exp.Expression, fixes: List[str]) -> None:
+    """
+    Renames the query's table to data_table, but only when it is the sole table
+    the query reads and not a JOIN side: `JOIN customers c` renamed would bind as
+    a self-join and quietly return wrong rows, so it is left to fail.
+    """
+    ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    tables = [t for t in tree.find_all(exp.Table) if t.name and t.name.lower() not in ctes]
+    if len(tables) != 1:
+        return
+    for table in tables:
+        name = table.name
+        if name.lower() == "data_table" or table.find_ancestor(exp.Join):
+            continue
+        if not table.alias:
+            # Keeps `sales.price`-style qualifiers valid.
+            table.set("alias", exp.TableAlias(this=exp.to_identifier(name)))
+        table.set("this", exp.to_identifier("data_table"))
+        table.set("db", None)
+        table.set("catalog", None)
+        fixes.append(f"table {name} → data_table")
+
+
+def _closest(name: str, columns: Dict[str, str]) -> Optional[str]:
+    by_norm = {}
+    for column in columns:
+        by_norm.setdefault(_norm(column), column)
+    if _norm(name) in by_norm:
+        return by_norm[_norm(name)]
+    # Fuzzy matches must keep every number: revenue_2023 → revenue_2022 would answer a different question.
+    digits = _DIGITS.findall(name)
+    candidates = [norm for norm, column in by_norm.items() if _DIGITS.findall(column) == digits]
+    match = difflib.get_close_matches(_norm(name), candidates, n=1, cutoff=FUZZY_CUTOFF)
+    return by_norm[match[0]] if match else None
+
+
+def _fix_columns(tree: exp.Expression, columns: Dict[str, str], fixes: List[str]) -> None:
+    # Names the query defines itself (select aliases, CTE / subquery columns) are not schema columns.
+    defined = {a.alias.lower() for a in tree.find_all(exp.Alias)}
+    defined |= {c.name.lower() for alias in tree.find_all(exp.TableAlias) for c in alias.columns}
+    for column in tree.find_all(exp.Column):
+        name = column.name
+        if not name or name in columns or name.lower() in defined or isinstance(column.this, exp.Star):
+            continue
+        match = _closest(name, columns)
+        if match and match != name:
+            column.set("this", exp.to_identifier(match, quoted=True))
+            fixes.append(f"{name} → {_q(match)}")
+
+
+def repair(sql: str, columns: Dict[str, str]) -> Optional[Tuple[str, List[str]]]:
+    """(fixed SQL, fixes applied) for the first candidate that binds, or None."""
+    fixes: List[str] = []
+    cleaned = _FENCE.sub("", sql).strip().rstrip(";").strip()
+    if cleaned != sql.strip():
+        fixes.append("stripped markdown / semicolon")
+    cleaned = _quote_spaced_columns(cleaned, columns, fixes)
+
+    tried = {sql}
+    if cleaned not in tried:
+        tried.add(cleaned)
+        if check(cleaned, columns) is None:
+            return cleaned, fixes
+
+    duckdb_output = None
+    for dialect in REPAIR_DIALECTS:
+        try:
+            tree = sqlglot.parse_one(cleaned, read=dialect)
+        except sqlglot.errors.SqlglotError:
+            continue
+        if tree is None:
+            continue
+        candidate_fixes = list(fixes)
+        _fix_tables(tree, candidate_fixes)
+        _fix_columns(tree, columns, candidate_fixes)
+        try:
+            candidate = tree.sql(dialect="duckdb")
+        except sqlglot.errors.SqlglotError:
+            continue
+        if dialect == "duckdb":
+            duckdb_output = candidate
+        elif candidate != duckdb_output:
+            candidate_fixes.append(f"translated from {dialect}")
+        if candidate in tried:
+            continue
+        tried.add(candidate)
+        if check(candidate, columns) is None:
+            return candidate, list(dict.fromkeys(candidate_fixes))
+    return None
+
+
+def prepare_query(con, sql: str, state) -> Tuple[str, List[str]]:
+    """
+    The query to run: `sql` itself when it binds (or cannot be checked), else its
+    local repair when one binds. An unrepairable query is returned unchanged so
+    the real run produces the error the LLM sees.
+    """
+    with span("sql.repair", stage="sql_repair"):
+        try:
+            columns = table_columns(con, state)
+        except Exception:
+            return sql, []
+        if not columns or check(sql, columns) is None:
+            SQL_REPAIRS.labels("valid").inc()
+            return sql, []
+
+        repaired = repair(sql, columns)
+        if repaired is None:
+            SQL_REPAIRS.labels("failed").inc()
+            return sql, []
+
+    fixed, fixes = repaired
+    SQL_REPAIRS.labels("repaired").inc()
+    LLM_CALLS_SAVED.labels("sql_repair").inc()
+    print(f"🔧 [SQL Repair] Fixed locally ({'; '.join(fixes)}): {fixed}")
+    return fixed, fixes
@@ -7,13 +7,32 @@ def append_block(left: List[Dict[str, Any]], right: List[Dict[str, Any]]) -> Lis
     if not right: right = []
     return left + right
 
+def add_counts(left: Dict[str, int], right: Dict[str, int]) -> Dict[str, int]:
+    merged = dict(left or {})
+    for key, value in (right or {}).items():
+        merged[key] = merged.get(key, 0) + value
+    return merged
+
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], operator.add]
     intent: str
     dataset_name: str
     artifact_url: str
+    artifact_parts: Optional[List[str]]
+    source_id: Optional[str]
+    source_type: Optional[str]
+    connection_string: Optional[str]   # Live DB sources only
+    table_name: Optional[str]          # Live DB sources only
+    row_count: Optional[int]
+    column_types: Optional[Dict[str, str]]   # From the catalog; lets SQL be checked without reading data
+    sample: Optional[Dict[str, Any]]   # Pre-built sample for approximate answers (see db/sampling.py)
+    approximate: bool                  # Opt-in: answer aggregates from the sample
+    client_id: Optional[str]           # Fairness key of the caller for DuckDB scheduling (see db/scheduler.py)
     current_code: Optional[str]
+    current_sql: Optional[str]         # Data-loading query of the python route
     error_trace: Optional[str]
     attempt_count: int
     ui_blocks: Annotated[List[Dict[str, Any]], append_block]
     df_json: Optional[str]
+    result_profile: Optional[Dict[str, Any]]   # SUMMARIZE of the full SQL result (see agent/result_profile.py)
+    token_usage: Annotated[Dict[str, int], add_counts]
@@ -0,0 +1,22 @@
+import math
+from typing import Any, Dict, List, Union
+
+# ~4 characters per token is close enough for English + SQL identifiers
+# and avoids pulling a tokenizer into the request path.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(prompt: Union[str, List[Any]]) -> int:
+    """Rough token count for a prompt string or a list of LangChain messages."""
+    if isinstance(prompt, str):
+        text = prompt
+    else:
+        text = "".join(str(getattr(m, "content", m)) for m in prompt)
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def prompt_usage(node: str, prompt: Union[str, List[Any]]) -> Dict[str, int]:
+    """Logs the prompt size for a node and returns it in the shape the state reducer expects."""
+    tokens = estimate_tokens(prompt)
+    print(f"🔢 [{node}] Prompt ≈ {tokens:,} tokens")
+    return {node: tokens}
@@ -0,0 +1,202 @@
+import copy
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+VEGA_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+SINGLE_COLOR = "#60a5fa"
+MAX_BAR_CATEGORIES    = 30    # More categories than this: only the top ones are drawn
+MAX_SERIES            = 10    # Colors one chart can tell apart
+MAX_MEASURES          = 5     # Measures folded into one chart
+HORIZONTAL_BAR_LABELS = 12    # Longer (or more) labels read better on a horizontal bar
+
+# Shared by the rule-based charts and the visualizer prompt, so both look the same.
+DARK_THEME_CONFIG = {
+    "background": "#111111",
+    "view": {"stroke": "transparent"},
+    "axis": {"gridColor": "#2a2a2a", "tickColor": "#3a3a3a", "labelColor": "#9ca3af",
+             "titleColor": "#6b7280", "domainColor": "#2a2a2a", "labelFont": "monospace",
+             "titleFont": "monospace", "labelFontSize": 11, "titleFontSize": 11},
+    "legend": {"labelColor": "#9ca3af", "titleColor": "#6b7280",
+               "labelFont": "monospace", "titleFont": "monospace", "labelFontSize": 11},
+    "title": {"color": "#d1d5db", "font": "monospace", "fontSize": 12},
+    "arc": {"stroke": "#111111", "strokeWidth": 1.5},
+    "bar": {"cornerRadiusTopLeft": 3, "cornerRadiusTopRight": 3},
+}
+
+# A question asking for a chart (or naming a chart type) is left to the LLM. Chart-type
+# words only count next to chart / graph / plot: "product line" or "which area" are data.
+_CHART_REQUEST = re.compile(
+    r"\b(charts?|plot(s|ted|ting)?|graphs?|visuali[sz](e|ed|ing|ation)|diagram|"
+    r"histograms?|heat ?maps?|treemaps?|scatter ?plots?|box ?plots?|"
+    r"(line|bar|area|bubble|stacked|column|pie|donut)\s+(charts?|graphs?|plots?))\b",
+    re.IGNORECASE,
+)
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}(-\d{2})?([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$")
+_ID_NAME   = re.compile(r"(^|_)(id|uuid|key)$", re.IGNORECASE)
+_TIME_PART = re.compile(r"(^|_)(year|month|quarter|week|day|hour)s?$", re.IGNORECASE)
+
+
+class ChartDecision(NamedTuple):
+    spec: Optional[Dict[str, Any]]   # None: nothing worth charting
+    reason: str
+
+
+def is_chart_request(question: str) -> bool:
+    return bool(_CHART_REQUEST.search(question or ""))
+
+
+def _kind(series: pd.Series) -> str:
+    """
+    temporal | ordinal (integer time parts such as `year`) | quantitative | nominal.
+    Numeric identifier columns count as categories, never as measures.
+    """
+    values = series.dropna()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "temporal"
+    if pd.api.types.is_bool_dtype(series):
+        return "nominal"
+    if pd.api.types.is_numeric_dtype(series):
+        if _ID_NAME.search(str(series.name)):
+            return "nominal"
+        if pd.api.types.is_integer_dtype(series) and _TIME_PART.search(str(series.name)):
+            return "ordinal"
+        return "quantitative"
+    sample = values.head(20).astype(str)
+    if len(sample) and all(_ISO_DATE.match(v) for v in sample):
+        return "temporal"
+    return "nominal"
+
+
+def _field(name: str) -> str:
+    # Vega-Lite reads dots and brackets in field names as nested access.
+    return re.sub(r"([.\[\]\\])", r"\\\1", str(name))
+
+
+def _spec(mark: Dict[str, Any], encoding: Dict[str, Any], transform: Optional[List[dict]] = None) -> Dict[str, Any]:
+    spec = {
+        "$schema": VEGA_SCHEMA,
+        "data": {"name": "table"},
+        "mark": {"tooltip": True, **mark},
+        "encoding": encoding,
+        "width": "container",
+        "height": 280,
+        "config": copy.deepcopy(DARK_THEME_CONFIG),
+    }
+    if transform:
+        spec["transform"] = transform
+    return spec
+
+
+def _top_n(measure: str) -> List[dict]:
+    return [
+        {"window": [{"op": "rank", "as": "__rank"}], "sort": [{"field": _field(measure), "order": "descending"}]},
+        {"filter": f"datum.__rank <= {MAX_BAR_CATEGORIES}"},
+    ]
+
+
+def _bar(df: pd.DataFrame, category: str, measure: str) -> Dict[str, Any]:
+    labels = df[category].astype(str)
+    transform = _top_n(measure) if labels.nunique() > MAX_BAR_CATEGORIES else None
+    horizontal = labels.nunique() > HORIZONTAL_BAR_LABELS or labels.str.len().max() > HORIZONTAL_BAR_LABELS
+    cat = {"field": _field(category), "type": "nominal", "sort": "-x" if horizontal else "-y", "title": category}
+    val = {"field": _field(measure), "type": "quantitative", "title": measure}
+    encoding = {"y": cat, "x": val} if horizontal else {"x": cat, "y": val}
+    encoding["color"] = {"value": SINGLE_COLOR}
+    return _spec({"type": "bar"}, encoding, transform)
+
+
+def _fold(measures: List[str]) -> List[dict]:
+    return [{"fold": [_field(m) for m in measures], "as": ["measure", "value"]}]
+
+
+def recommend_chart(df: pd.DataFrame) -> Optional[ChartDecision]:
+    """
+    Chart for the common result shapes, from column kinds and cardinalities alone.
+    Returns None for shapes without an obvious chart (the LLM decides those).
+    """
+    df = df.dropna(axis=1, how="all")
+    if df.empty or len(df.columns) == 0:
+        return ChartDecision(None, "empty result")
+    if len(df) == 1:
+        return ChartDecision(None, "single row — the table says it all")
+
+    kinds = {c: _kind(df[c]) for c in df.columns}
+    temporal = [c for c, k in kinds.items() if k in ("temporal", "ordinal")]
+    measures = [c for c, k in kinds.items() if k == "quantitative"]
+    nominal  = [c for c, k in kinds.items() if k == "nominal"]
+    if not measures or len(measures) > MAX_MEASURES:
+        return None
+    cardinality = {c: df[c].nunique() for c in nominal}
+
+    # One time axis: a line per measure (or per category).
+    if len(temporal) == 1:
+        t = temporal[0]
+        x = {"field": _field(t), "type": kinds[t], "title": t}
+        if not nominal and len(measures) == 1:
+            m = measures[0]
+            return ChartDecision(_spec({"type": "line", "point": len(df) <= 60},
+                                       {"x": x, "y": {"field": _field(m), "type": "quantitative", "title": m},
+                                        "color": {"value": SINGLE_COLOR}}), "trend")
+        if not nominal:
+            return ChartDecision(_spec({"type": "line"},
+                                       {"x": x, "y": {"field": "value", "type": "quantitative"},
+                                        "color": {"field": "measure", "type": "nominal", "scale": {"scheme": "category10"}}},
+                                       _fold(measures)), "trends")
+        if len(nominal) == 1 and len(measures) == 1 and cardinality[nominal[0]] <= MAX_SERIES:
+            n, m = nominal[0], measures[0]
+            return ChartDecision(_spec({"type": "line"},
+                                       {"x": x, "y": {"field": _field(m), "type": "quantitative", "title": m},
+                                        "color": {"field": _field(n), "type": "nominal", "scale": {"scheme": "category10"}}}),
+                                 "trend per category")
+        return None
+    if temporal:
+        return None
+
+    if len(nominal) == 1:
+        n = nominal[0]
+        if len(measures) == 1:
+            return ChartDecision(_bar(df, n, measures[0]), "category comparison")
+        if cardinality[n] <= MAX_BAR_CATEGORIES:
+            return ChartDecision(_spec({"type": "bar"}, {
+                "x": {"field": _field(n), "type": "nominal", "title": n},
+                "xOffset": {"field": "measure", "type": "nominal"},
+                "y": {"field": "value", "type": "quantitative"},
+                "color": {"field": "measure", "type": "nominal", "scale": {"scheme": "category10"}},
+            }, _fold(measures)), "measures per category")
+        return None
+
+    if len(nominal) == 2 and len(measures) == 1:
+        (a, b), m = sorted(nominal, key=cardinality.get, reverse=True), measures[0]
+        if cardinality[a] > MAX_BAR_CATEGORIES:
+            return None
+        if cardinality[b] <= MAX_SERIES:
+            return ChartDecision(_spec({"type": "bar"}, {
+                "x": {"field": _field(a), "type": "nominal", "title": a},
+                "y": {"field": _field(m), "type": "quantitative", "title": m, "stack": "zero"},
+                "color": {"field": _field(b), "type": "nominal", "scale": {"scheme": "category10"}, "title": b},
+            }), "stacked comparison")
+        return ChartDecision(_spec({"type": "rect"}, {
+            "x": {"field": _field(a), "type": "nominal", "title": a},
+            "y": {"field": _field(b), "type": "nominal", "title": b},
+            "color": {"field": _field(m), "type": "quantitative", "title": m},
+        }), "heatmap")
+
+    if nominal:
+        return None
+    if len(measures) == 2:
+        x, y = measures
+        return ChartDecision(_spec({"type": "point", "opacity": 0.7}, {
+            "x": {"field": _field(x), "type": "quantitative", "title": x, "scale": {"zero": False}},
+            "y": {"field": _field(y), "type": "quantitative", "title": y, "scale": {"zero": False}},
+            "color": {"value": SINGLE_COLOR},
+        }), "correlation")
+    if len(measures) == 1:
+        m = measures[0]
+        return ChartDecision(_spec({"type": "bar"}, {
+            "x": {"field": _field(m), "type": "quantitative", "bin": {"maxbins": 30}, "title": m},
+            "y": {"aggregate": "count", "type": "quantitative", "title": "rows"},
+            "color": {"value": SINGLE_COLOR},
+        }), "distribution")
+    return None
@@ -0,0 +1,245 @@
+import asyncio
+import difflib
+import re
+from typing import Any, Dict, List, Mapping
+
+from sqlalchemy import delete, func
+from sqlmodel import select
+
+from agent.embeddings import embed_text, embed_texts
+from db.db import AsyncSessionLocal
+from db.data_table import data_key, is_live_source, open_data_table
+from db.models.column_profile import ColumnProfile
+
+SCHEMA_TOP_K       = 25     # Columns included in the prompt for wide tables
+LEXICAL_WEIGHT     = 0.6
+SEMANTIC_WEIGHT    = 0.4
+ALWAYS_ON_KEYWORDS = ("id", "date", "time", "name")   # Cheap tie-breakers for "show me" questions
+OMITTED_NAMES_MAX  = 150    # Omitted columns still listed by name (names only) in the prompt
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+_CAMEL_SPLIT = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def _tokens(text: str) -> set:
+    text = _CAMEL_SPLIT.sub(" ", text)
+    return {t for t in _TOKEN_SPLIT.split(text.lower()) if t}
+
+
+def _fmt(value: Any) -> str:
+    if value is None:
+        return "?"
+    try:
+        return f"{float(value):.4g}"
+    except (TypeError, ValueError):
+        text = str(value)
+        return text if len(text) <= 24 else text[:21] + "..."
+
+
+def _describe(profile: ColumnProfile) -> str:
+    """One compact line per column: name, type, range, cardinality, nulls."""
+    stats = profile.stats or {}
+    parts = [f"- {profile.column_name} ({profile.column_type})"]
+    if stats.get("min") is not None:
+        parts.append(f"{_fmt(stats['min'])}..{_fmt(stats['max'])}")
+    if stats.get("approx_unique") is not None:
+        parts.append(f"~{stats['approx_unique']} distinct")
+    if stats.get("null_percentage"):
+        parts.append(f"{_fmt(stats['null_percentage'])}% null")
+    return " ".join(parts[:1]) + (": " + ", ".join(parts[1:]) if len(parts) > 1 else "")
+
+
+def _summarize(source: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Runs SUMMARIZE over the parquet artifact — one pass for every column's stats.
+    Live DB tables only get DESCRIBE; a full remote scan per profile is not worth it.
+    """
+    con = open_data_table(source)
+    try:
+        if is_live_source(source):
+            described = con.execute("DESCRIBE data_table").fetchall()
+            return [
+                {"position": i, "column_name": row[0], "column_type": row[1], "stats": {}}
+                for i, row in enumerate(described)
+            ]
+
+        df = con.execute("SUMMARIZE data_table").df()
+        rows = []
+        for position, row in enumerate(df.to_dict(orient="records")):
+            rows.append({
+                "position":    position,
+                "column_name": row["column_name"],
+                "column_type": row["column_type"],
+                "stats": {
+                    "min":             None if row["min"] is None else str(row["min"]),
+                    "max":             None if row["max"] is None else str(row["max"]),
+                    "approx_unique":   int(row["approx_unique"]) if row["approx_unique"] is not None else None,
+                    "null_percentage": float(row["null_percentage"]) if row["null_percentage"] is not None else None,
+                },
+            })
+        return rows
+    finally:
+        con.close()
+
+
+async def load_column_profiles(source: Mapping[str, Any]) -> List[ColumnProfile]:
+    """Returns stored profiles for a source, computing + embedding them on first use."""
+    artifact_url = data_key(source)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(ColumnProfile)
+            .where(ColumnProfile.artifact_url == artifact_url)
+            .order_by(ColumnProfile.position)
+        )
+        profiles = result.scalars().all()
+        if profiles:
+            return list(profiles)
+
+    print(f"🧾 [Schema] Profiling {artifact_url} (first use)...")
+    rows = await asyncio.to_thread(_summarize, source)
+    descriptions = [f"{r['column_name']} ({r['column_type']})" for r in rows]
+    vectors = await asyncio.to_thread(embed_texts, descriptions) or [None] * len(rows)
+
+    profiles = [
+        ColumnProfile(artifact_url=artifact_url, embedding=vector, **row)
+        for row, vector in zip(rows, vectors)
+    ]
+    async with AsyncSessionLocal() as session:
+        # Another request may have profiled the same artifact concurrently: the first to
+        # take the artifact's lock stores its profiles, the others return those.
+        await _lock_profiles(session, artifact_url)
+        result = await session.execute(
+            select(ColumnProfile)
+            .where(ColumnProfile.artifact_url == artifact_url)
+            .order_by(ColumnProfile.position)
+        )
+        stored = result.scalars().all()
+        if stored:
+            await session.commit()
+            return list(stored)
+        session.add_all(profiles)
+        await session.commit()
+    return profiles
+
+
+async def _lock_profiles(session, artifact_url: str) -> None:
+    """Transaction-scoped Postgres advisory lock serializing profile writes for one artifact."""
+    await session.execute(select(func.pg_advisory_xact_lock(func.hashtext(artifact_url))))
+
+
+def lexical_scores(question: str, column_names: List[str]) -> Dict[str, float]:
+    """Token overlap plus fuzzy matching so 'bedroom count' still finds 'bedrooms'."""
+    q_tokens = _tokens(question)
+    scores = {}
+    for name in column_names:
+        c_tokens = _tokens(name)
+        if not c_tokens:
+            scores[name] = 0.0
+            continue
+        best = 0.0
+        for ct in c_tokens:
+            for qt in q_tokens:
+                best = max(best, difflib.SequenceMatcher(None, ct, qt).ratio())
+        overlap = len(c_tokens & q_tokens) / len(c_tokens)
+        fuzzy = best if best >= 0.8 else 0.0
+        scores[name] = max(overlap, fuzzy)
+    return scores
+
+
+async def semantic_scores(artifact_url: str, question: str, limit: int) -> Dict[str, float]:
+    """Nearest columns to the question by cosine similarity, ranked inside pgvector."""
+    vector = await asyncio.to_thread(embed_text, question)
+    if vector is None:
+        return {}
+
+    distance = ColumnProfile.embedding.cosine_distance(vector)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(ColumnProfile.column_name, distance.label("distance"))
+            .where(ColumnProfile.artifact_url == artifact_url)
+            .where(ColumnProfile.embedding.is_not(None))
+            .order_by(distance)
+            .limit(limit)
+        )
+        return {name: 1.0 - float(dist) for name, dist in result.all()}
+
+
+async def select_schema_context(source: Mapping[str, Any], question: str, top_k: int = SCHEMA_TOP_K) -> str:
+    """
+    Builds the DATASET SCHEMA section of the SQL prompt.
+
+    Narrow tables are listed in full. Wide tables are ranked by relevance to the
+    question (lexical + pgvector similarity) and only the top_k columns are listed,
+    each with compact stats, followed by a count of what was left out.
+    """
+    artifact_url = data_key(source)
+    profiles = await load_column_profiles(source)
+    if len(profiles) <= top_k:
+        return "\n".join(_describe(p) for p in profiles)
+
+    names = [p.column_name for p in profiles]
+    lexical  = lexical_scores(question, names)
+    semantic = await semantic_scores(artifact_url, question, limit=top_k * 2)
+
+    def score(p: ColumnProfile) -> float:
+        bonus = 0.05 if _tokens(p.column_name) & set(ALWAYS_ON_KEYWORDS) else 0.0
+        return LEXICAL_WEIGHT * lexical[p.column_name] + SEMANTIC_WEIGHT * semantic.get(p.column_name, 0.0) + bonus
+
+    ranked = sorted(profiles, key=score, reverse=True)[:top_k]
+    # Keep the artifact's own column order — easier for the model to read.
+    selected = sorted(ranked, key=lambda p: p.position)
+
+    chosen = {p.column_name for p in selected}
+    omitted = [p.column_name for p in profiles if p.column_name not in chosen]
+    lines = [_describe(p) for p in selected]
+    names = ", ".join(omitted[:OMITTED_NAMES_MAX])
+    more = f", and {len(omitted) - OMITTED_NAMES_MAX} more" if len(omitted) > OMITTED_NAMES_MAX else ""
+    lines.append(f"(Less relevant columns, names only; they can be queried by exact name: {names}{more}.)")
+    print(f"🧾 [Schema] Selected {len(selected)}/{len(profiles)} columns for the prompt.")
+    return "\n".join(lines)
+
+
+async def roll_forward_profiles(old_key: str, new_key: str, stats: Dict[str, Any]) -> int:
+    """
+    After a part is appended, derives the new version's column profiles from the old
+    ones plus the merged catalog stats instead of re-running SUMMARIZE over every part.
+    Only columns that did not exist before are embedded. Returns the number of profiles.
+    """
+    columns = (stats or {}).get("columns") or {}
+    row_count = (stats or {}).get("row_count") or 0
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(ColumnProfile).where(ColumnProfile.artifact_url == old_key))
+        old = {p.column_name: p for p in result.scalars().all()}
+    if not old:
+        return 0   # Never profiled; the next question profiles the new version lazily.
+
+    new_names = [name for name in columns if name not in old]
+    vectors = await asyncio.to_thread(embed_texts, [f"{n} ({columns[n]['type']})" for n in new_names]) or [None] * len(new_names)
+    new_vectors = dict(zip(new_names, vectors))
+
+    profiles = []
+    for position, (name, col) in enumerate(columns.items()):
+        previous = old.get(name)
+        profile_stats = dict(previous.stats or {}) if previous else {}
+        profile_stats.update({
+            "min": None if col.get("min") is None else str(col["min"]),
+            "max": None if col.get("max") is None else str(col["max"]),
+            "null_percentage": round(100.0 * col.get("null_count", 0) / row_count, 2) if row_count else None,
+        })
+        profiles.append(ColumnProfile(
+            artifact_url=new_key,
+            position=position,
+            column_name=name,
+            column_type=previous.column_type if previous else col["type"],
+            stats=profile_stats,
+            embedding=previous.embedding if previous else new_vectors.get(name),
+        ))
+
+    async with AsyncSessionLocal() as session:
+        await _lock_profiles(session, new_key)
+        await session.execute(delete(ColumnProfile).where(ColumnProfile.artifact_url == new_key))
+        session.add_all(profiles)
+        await session.commit()
+    print(f"🧾 [Schema] Rolled {len(profiles)} column profiles forward to {new_key}")
+    return len(profiles)
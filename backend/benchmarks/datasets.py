@@ -0,0 +1,70 @@
+import os
+
+import duckdb
+
+FORMATS = ("csv", "json", "excel", "parquet")
+EXTENSIONS = {"csv": "csv", "json": "json", "excel": "xlsx", "parquet": "parquet"}
+
+# Column kinds cycle so every dataset has numerics, categories and dates.
+_CATEGORIES = ["north", "south", "east", "west", "central"]
+
+
+def _select_list(width: int) -> str:
+    """Builds `width` synthetic columns with a fixed seed-friendly mix of types."""
+    cols = ["i AS id"]
+    for n in range(1, width):
+        kind = n % 4
+        if kind == 0:
+            cols.append(f"(hash(i * {n}) % 100000) / 100.0 AS amount_{n}")
+        elif kind == 1:
+            cols.append(f"(hash(i + {n}) % 1000)::BIGINT AS count_{n}")
+        elif kind == 2:
+            cols.append(f"{_CATEGORIES}[1 + (hash(i * {n + 7}) % {len(_CATEGORIES)})::INT] AS region_{n}")
+        else:
+            cols.append(f"DATE '2020-01-01' + ((hash(i + {n * 13}) % 1500)::INT) AS day_{n}")
+    return ", ".join(cols)
+
+
+def generate_dataset(fmt: str, rows: int, width: int, out_dir: str, sheets: int = 1) -> str:
+    """
+    Writes a deterministic synthetic dataset (same rows/width → same bytes)
+    and returns its path. Values come from hash(), so no RNG state is involved.
+    Excel workbooks can spread the rows over `sheets` sheets.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    suffix = f"_{sheets}sheets" if fmt == "excel" and sheets > 1 else ""
+    path = os.path.join(out_dir, f"synthetic_{rows}x{width}{suffix}.{EXTENSIONS[fmt]}")
+    if os.path.exists(path):
+        return path
+
+    con = duckdb.connect()
+    try:
+        con.execute(f"CREATE TABLE synthetic AS SELECT {_select_list(width)} FROM range({rows}) t(i)")
+        if fmt == "csv":
+            con.execute(f"COPY synthetic TO '{path}' (FORMAT CSV, HEADER)")
+        elif fmt == "json":
+            con.execute(f"COPY synthetic TO '{path}' (FORMAT JSON, ARRAY true)")
+        elif fmt == "parquet":
+            con.execute(f"COPY synthetic TO '{path}' (FORMAT PARQUET, CODEC 'SNAPPY')")
+        else:
+            _write_excel(con, path, sheets)
+    finally:
+        con.close()
+    return path
+
+
+def _write_excel(con, path: str, sheets: int = 1, batch_size: int = 10_000) -> None:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for n in range(sheets):
+        ws = wb.create_sheet("data" if sheets == 1 else f"data_{n + 1}")
+        result = con.execute(f"SELECT * FROM synthetic WHERE id % {sheets} = {n} ORDER BY id")
+        ws.append([d[0] for d in result.description])
+        while batch := result.fetchmany(batch_size):
+            for row in batch:
+                ws.append(list(row))
+    wb.save(path)
@@ -0,0 +1,267 @@
+"""
+Concurrent chat load generator.
+
+    # API with a fake LLM (200 ms per call), Postgres + MinIO from docker-compose:
+    python -m benchmarks.load_test --spawn-server --llm-latency-ms 200 \
+        --dataset Housing.csv --concurrency 1 2 4 8 16 32 --duration 30
+
+    # Against an already running API:
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --source-id <uuid>
+
+Each concurrency step runs closed-loop virtual users for --duration seconds.
+Each user sends its own X-User-Id, which the scheduler only believes from
+TRUSTED_PROXIES (loopback by default): run the load test from the API's host.
+Per-stage latency percentiles come from the /metrics histograms (delta between
+the start and end of the step), so they cover every graph node as well as the
+llm, duckdb and postgres stages.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.run_benchmark import percentile
+
+STAGE_METRIC = "insights_stage_latency_seconds"
+QUEUE_METRIC = "insights_llm_queue_wait_seconds"   # Reported as the "llm_queue" stage
+SATURATION_STAGES = ("duckdb", "postgres", "llm", "llm_queue")
+
+SQL_QUESTIONS = [
+    "What is the average price by furnishing status?",
+    "How many rows are there?",
+    "Show the top 10 rows by area",
+    "What is the maximum price per number of bedrooms?",
+]
+CHAT_QUESTIONS = ["hello", "what can you do?"]
+
+
+# ── /metrics histogram handling ───────────────────────────────────────────────
+def scrape_histograms(text: str) -> Dict[str, Dict[float, float]]:
+    """Returns {stage: {le: cumulative_count}} for the stage latency and LLM queue-wait histograms."""
+    buckets: Dict[str, Dict[float, float]] = defaultdict(dict)
+    for family in text_string_to_metric_families(text):
+        if family.name == STAGE_METRIC:
+            for sample in family.samples:
+                if sample.name.endswith("_bucket"):
+                    buckets[sample.labels["stage"]][float(sample.labels["le"])] = sample.value
+        elif family.name == QUEUE_METRIC:
+            # Summed over nodes: how long calls waited for a slot or rate budget.
+            for sample in family.samples:
+                if sample.name.endswith("_bucket"):
+                    le = float(sample.labels["le"])
+                    buckets["llm_queue"][le] = buckets["llm_queue"].get(le, 0.0) + sample.value
+    return buckets
+
+
+def histogram_quantile(q: float, buckets: Dict[float, float]) -> Optional[float]:
+    """Same linear interpolation Prometheus' histogram_quantile() uses."""
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] <= 0:
+        return None
+    rank = q * buckets[bounds[-1]]
+    prev_bound, prev_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return prev_bound
+            if count == prev_count:
+                return bound
+            return prev_bound + (bound - prev_bound) * (rank - prev_count) / (count - prev_count)
+        prev_bound, prev_count = bound, count
+    return prev_bound
+
+
+def stage_percentiles(before: Dict, after: Dict) -> Dict[str, Dict[str, float]]:
+    result = {}
+    for stage, end in after.items():
+        start = before.get(stage, {})
+        delta = {le: end[le] - start.get(le, 0.0) for le in end}
+        count = delta.get(float("inf"), 0.0)
+        if count <= 0:
+            continue
+        result[stage] = {"count": int(count)}
+        for name, q in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            value = histogram_quantile(q, delta)
+            result[stage][name] = round(value * 1000, 1) if value is not None else None
+    return result
+
+
+# ── Load generation ───────────────────────────────────────────────────────────
+async def virtual_user(client: httpx.AsyncClient, source_id: str, user_id: str, deadline: float, rng: random.Random,
+                       chat_ratio: float, use_cache: bool, latencies: List[float], errors: Dict[str, int]):
+    while time.perf_counter() < deadline:
+        pool = CHAT_QUESTIONS if rng.random() < chat_ratio else SQL_QUESTIONS
+        payload = {"message": rng.choice(pool), "use_cache": use_cache}
+        start = time.perf_counter()
+        try:
+            # Each virtual user is its own client to the worker's DuckDB scheduler.
+            response = await client.post(f"/api/v1/chat/{source_id}", json=payload, headers={"X-User-Id": user_id})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[str(response.status_code)] += 1
+            if response.status_code == 429:
+                await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] += 1
+
+
+async def run_step(base_url: str, source_id: str, concurrency: int, duration: float, seed: int,
+                   chat_ratio: float, use_cache: bool) -> Dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        before = scrape_histograms((await client.get("/metrics")).text)
+
+        latencies: List[float] = []
+        errors: Dict[str, int] = defaultdict(int)
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            virtual_user(client, source_id, f"vu-{i}", deadline, random.Random(seed + i), chat_ratio, use_cache,
+                         latencies, errors)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+        after = scrape_histograms((await client.get("/metrics")).text)
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": dict(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "stages": stage_percentiles(before, after),
+    }
+
+
+def find_saturation(steps: List[Dict], factor: float) -> Dict[str, Optional[int]]:
+    """
+    A stage saturates at the first concurrency where its p95 exceeds `factor` times
+    its p95 at the lowest concurrency. Throughput saturates when adding users
+    stops adding at least 10% more requests per second.
+    """
+    saturation: Dict[str, Optional[int]] = {}
+    for stage in SATURATION_STAGES:
+        baseline = next((s["stages"][stage]["p95_ms"] for s in steps if stage in s["stages"]), None)
+        saturation[stage] = next(
+            (s["concurrency"] for s in steps
+             if baseline and stage in s["stages"] and (s["stages"][stage]["p95_ms"] or 0) > baseline * factor),
+            None,
+        )
+
+    saturation["throughput"] = None
+    for prev, cur in zip(steps, steps[1:]):
+        if cur["throughput_rps"] < prev["throughput_rps"] * 1.1:
+            saturation["throughput"] = prev["concurrency"]
+            break
+    return saturation
+
+
+# ── Setup helpers ─────────────────────────────────────────────────────────────
+def spawn_server(port: int, llm_latency_ms: float, llm_rate_limit_rpm: int = 0) -> subprocess.Popen:
+    env = dict(os.environ, LLM_PROVIDER="fake", FAKE_LLM_LATENCY_MS=str(llm_latency_ms), TRACE_EXPORTER="none")
+    if llm_rate_limit_rpm:
+        # The fake provider rejects calls beyond the limit with 429s; the scheduler gets the same budget.
+        env.update(FAKE_LLM_RATE_LIMIT_RPM=str(llm_rate_limit_rpm), LLM_RPM=str(llm_rate_limit_rpm))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    for _ in range(120):
+        try:
+            # /ready, not /: measurements start once the agent and sandbox are warm.
+            if httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("API did not become ready in 60s")
+
+
+def upload_dataset(base_url: str, path: str) -> str:
+    source_type = os.path.splitext(path)[1].lstrip(".").lower()
+    metadata = {"dataset_name": f"loadtest-{os.path.basename(path)}", "source_type": source_type}
+    with open(path, "rb") as f:
+        response = httpx.post(
+            f"{base_url}/api/v1/upload",
+            data={"metadata_json": json.dumps(metadata)},
+            files={"file": (os.path.basename(path), f, "application/octet-stream")},
+            timeout=600,
+        )
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn-server", action="store_true", help="Start uvicorn with the fake LLM")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-rate-limit-rpm", type=int, default=0, help="Simulated provider rate limit (0 = none)")
+    parser.add_argument("--source-id", help="Existing data source to chat with")
+    parser.add_argument("--dataset", default="Housing.csv", help="Uploaded first when --source-id is not given")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per concurrency step")
+    parser.add_argument("--chat-ratio", type=float, default=0.1, help="Share of greeting (chat-route) questions")
+    parser.add_argument("--use-cache", action="store_true", help="Allow semantic cache hits")
+    parser.add_argument("--saturation-factor", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="load_report.json")
+    args = parser.parse_args()
+
+    proc = None
+    base_url = args.base_url
+    if args.spawn_server:
+        base_url = f"http://127.0.0.1:{args.port}"
+        proc = spawn_server(args.port, args.llm_latency_ms, args.llm_rate_limit_rpm)
+        print(f"🚀 [Load] API started on {base_url} (fake LLM, {args.llm_latency_ms} ms)")
+
+    try:
+        source_id = args.source_id or upload_dataset(base_url, args.dataset)
+        steps = []
+        for concurrency in sorted(args.concurrency):
+            step = asyncio.run(run_step(
+                base_url, source_id, concurrency, args.duration, args.seed, args.chat_ratio, args.use_cache
+            ))
+            steps.append(step)
+            print(
+                f"📈 [Load] c={concurrency}: {step['throughput_rps']} req/s, "
+                f"p50={step['p50_ms']}ms p95={step['p95_ms']}ms p99={step['p99_ms']}ms, errors={step['errors']}"
+            )
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    saturation = find_saturation(steps, args.saturation_factor)
+    for stage, level in saturation.items():
+        print(f"🧯 [Load] {stage}: " + (f"saturates at concurrency {level}" if level else "no saturation observed"))
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out",)},
+        "steps": steps,
+        "saturation": saturation,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 [Load] Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Reproducible ingest + chat benchmark.
+
+    python -m benchmarks.run_benchmark --rows 100000 --width 20 --out bench_report.json
+    python -m benchmarks.run_benchmark --compare bench_report.json   # fails on regressions
+
+Runs fully offline: a deterministic fake LLM (LLM_PROVIDER=fake) and an
+in-process moto S3 server stand in for Groq and MinIO.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from opentelemetry.sdk.trace import SpanProcessor
+
+from benchmarks.datasets import FORMATS, generate_dataset
+from benchmarks.s3_standin import start_local_s3
+
+SOURCE_TYPES = {"csv": "csv", "json": "json", "excel": "excel", "parquet": "parquet"}
+CHAT_QUESTIONS = [
+    "What is the average amount by region?",
+    "Show me the totals per region",
+    "Which region has the highest count?",
+    "Use pandas to describe the numeric columns",   # python route → sandbox pool
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        stage: {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+        }
+        for stage, values in sorted(samples.items())
+    }
+
+
+class SpanCollector(SpanProcessor):
+    """OpenTelemetry span processor that keeps span durations in memory, keyed by stage."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def on_end(self, span):
+        name = span.name
+        if name.startswith("node."):
+            stage = name[len("node."):]
+        elif name == "llm.call":
+            stage = "llm"
+        elif name.startswith("duckdb."):
+            stage = "duckdb"
+        elif name.startswith("sandbox."):
+            stage = "sandbox"
+        else:
+            return
+        self.samples[stage].append((span.end_time - span.start_time) / 1e9)
+
+
+def _rss_bytes(pid: int) -> int:
+    """Resident set size of a process plus all its descendants (Linux /proc)."""
+    page = os.sysconf("SC_PAGE_SIZE")
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/statm") as f:
+                total += int(f.read().split()[1]) * page
+            for tid in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{tid}/children") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue   # exited while we were looking
+    return total
+
+
+class PeakMemory:
+    """
+    Samples RSS (this process + worker processes) in a background thread and keeps
+    the peak. Reports 0 where /proc is unavailable.
+    """
+
+    def __init__(self, interval_s: float = 0.01):
+        self.interval_s = interval_s
+        self.baseline_mb = 0.0
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._enabled = os.path.exists("/proc/self/statm")
+
+    def _sample(self) -> float:
+        return _rss_bytes(os.getpid()) / 1e6
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self._sample())
+            self._stop.wait(self.interval_s)
+
+    def __enter__(self):
+        if self._enabled:
+            self.baseline_mb = self.peak_mb = self._sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._enabled:
+            self._stop.set()
+            self._thread.join()
+            self.peak_mb = max(self.peak_mb, self._sample())
+
+
+# ── Ingest ────────────────────────────────────────────────────────────────────
+def bench_upload(path: str, fmt: str) -> Dict:
+    from fastapi import UploadFile
+    from ingestion.excel import convert_excel_to_parquet
+    from routes.ingest import convert_to_parquet, process_ingestion, save_upload_to_temp
+    from schemas.uploads import DataIngestRequest, SourceType
+
+    source_type = SourceType(SOURCE_TYPES[fmt])
+    metadata = DataIngestRequest(dataset_name=f"bench-{fmt}", source_type=source_type)
+    size_mb = os.path.getsize(path) / 1e6
+    stages = {}
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        raw_path = save_upload_to_temp(UploadFile(file=f, filename=os.path.basename(path)), os.path.basename(path))
+    stages["save_s"] = time.perf_counter() - start
+
+    final_paths = [raw_path]
+    try:
+        t = time.perf_counter()
+        with PeakMemory() as memory:
+            if source_type == SourceType.EXCEL:
+                final_paths = [s["path"] for s in convert_excel_to_parquet(raw_path)]
+            elif source_type != SourceType.PARQUET:
+                final_paths = [convert_to_parquet(raw_path, source_type)]
+        stages["convert_s"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        # Multi-sheet workbooks yield one artifact per sheet; chat runs against the first.
+        artifact_url = [process_ingestion(p, metadata) for p in final_paths][0]
+        stages["hash_upload_s"] = time.perf_counter() - t
+    finally:
+        for p in {raw_path, *final_paths}:
+            if os.path.exists(p):
+                os.remove(p)
+
+    total = time.perf_counter() - start
+    return {
+        "format": fmt,
+        "size_mb": round(size_mb, 3),
+        "total_s": round(total, 4),
+        "throughput_mb_s": round(size_mb / total, 3) if total else None,
+        "stages": {k: round(v, 4) for k, v in stages.items()},
+        "tables": len(final_paths),
+        "convert_peak_rss_mb": round(memory.peak_mb, 1),
+        "convert_rss_growth_mb": round(memory.peak_mb - memory.baseline_mb, 1),
+        "artifact_url": artifact_url,
+    }
+
+
+# ── Chat ──────────────────────────────────────────────────────────────────────
+async def bench_chat(artifact_url: str, iterations: int, collector: SpanCollector) -> Dict:
+    from langchain_core.messages import HumanMessage
+    from agent.graph import data_agent
+    from agent.sandbox_pool import get_sandbox_pool
+
+    get_sandbox_pool()   # The app warms it at startup; keep it out of the measured loop too.
+    totals = []
+    for i in range(iterations):
+        question = CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)]
+        state = {
+            "messages": [HumanMessage(content=question)],
+            "dataset_name": "bench",
+            "artifact_url": artifact_url,
+            "ui_blocks": [],
+        }
+        start = time.perf_counter()
+        await data_agent.ainvoke(state)
+        totals.append(time.perf_counter() - start)
+
+    collector.samples["total"].extend(totals)
+    return summarize(collector.samples)
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Returns human-readable regressions beyond `tolerance` (0.2 = 20% slower)."""
+    regressions = []
+    base_ingest = {r["format"]: r for r in baseline.get("ingest", [])}
+    for r in report.get("ingest", []):
+        old = base_ingest.get(r["format"])
+        if old and old["throughput_mb_s"] and r["throughput_mb_s"] < old["throughput_mb_s"] * (1 - tolerance):
+            regressions.append(f"ingest {r['format']}: {old['throughput_mb_s']} → {r['throughput_mb_s']} MB/s")
+        if old and old.get("convert_peak_rss_mb") and r.get("convert_peak_rss_mb", 0) > old["convert_peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"ingest {r['format']}: peak RSS {old['convert_peak_rss_mb']} → {r['convert_peak_rss_mb']} MB")
+
+    base_chat = baseline.get("chat", {})
+    for stage, stats in report.get("chat", {}).items():
+        old = base_chat.get(stage)
+        if old and old["p95_ms"] and stats["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"chat {stage}: p95 {old['p95_ms']} → {stats['p95_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--width", type=int, default=20)
+    parser.add_argument("--excel-sheets", type=int, default=1, help="Sheets in the generated Excel workbook")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--chat-iterations", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--data-dir", default="bench_data")
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    # Must happen before app modules are imported — they read these at import time.
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ.setdefault("TRACE_EXPORTER", "none")
+    server = start_local_s3()
+
+    from opentelemetry import trace
+    import observability.tracing  # installs the SDK tracer provider
+    collector = SpanCollector()
+    trace.get_tracer_provider().add_span_processor(collector)
+
+    try:
+        ingest_results = []
+        for fmt in args.formats:
+            path = generate_dataset(fmt, args.rows, args.width, args.data_dir, sheets=args.excel_sheets)
+            result = bench_upload(path, fmt)
+            print(f"📦 [Bench] {fmt}: {result['size_mb']} MB in {result['total_s']}s ({result['throughput_mb_s']} MB/s), "
+                  f"convert peak RSS {result['convert_peak_rss_mb']} MB")
+            ingest_results.append(result)
+
+        chat_artifact = ingest_results[-1]["artifact_url"]
+        chat_results = asyncio.run(bench_chat(chat_artifact, args.chat_iterations, collector))
+        for stage, stats in chat_results.items():
+            print(f"⏱️ [Bench] {stage}: p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+    finally:
+        server.stop()
+
+    report = {
+        "config": {
+            "rows": args.rows,
+            "width": args.width,
+            "excel_sheets": args.excel_sheets,
+            "chat_iterations": args.chat_iterations,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "ingest": ingest_results,
+        "chat": chat_results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 [Bench] Report written to {args.out}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"❌ [Bench] Regression: {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ [Bench] No regressions beyond tolerance.")
+
+
+if __name__ == "__main__":
+    main()
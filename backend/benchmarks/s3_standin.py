@@ -0,0 +1,20 @@
+import logging
+import os
+
+
+def start_local_s3(port: int = 5055):
+    """
+    Starts an in-process moto S3 server and points s3/client.py + DuckDB at it.
+    Must run before any app module is imported, since they read the endpoint at import.
+    """
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)   # one access-log line per range request otherwise
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+
+    os.environ["S3_ENDPOINT_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["S3_ACCESS_KEY"] = "benchmark"
+    os.environ["S3_SECRET_KEY"] = "benchmark"
+    print(f"🪣 [Bench] Local S3 stand-in on http://127.0.0.1:{port}")
+    return server
@@ -0,0 +1,46 @@
+"""
+Who a request is from, when it may have come through the gateway.
+
+Any client can send X-Forwarded-For or X-User-Id, so those headers are only
+believed from a peer in TRUSTED_PROXIES (the gateway, or a proxy in front of
+it). The gateway appends its caller to X-Forwarded-For and drops X-User-Id
+from callers it does not trust, so a worker reads them only as vouched for
+by a trusted hop.
+"""
+import os
+from typing import Dict, Optional
+
+TRUSTED_PROXIES = {host.strip() for host in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if host.strip()}
+
+
+def _peer(request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+
+def client_identity(request) -> str:
+    """The caller's X-User-Id, else its address: from the headers only when the peer is trusted."""
+    peer = _peer(request)
+    if peer not in TRUSTED_PROXIES:
+        return peer or "anonymous"
+    user = request.headers.get("x-user-id")
+    if user:
+        return user
+    # Nearest hop first: the last address a trusted proxy did not add is the caller's.
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if hop not in TRUSTED_PROXIES:
+            return hop
+    return peer
+
+
+def forward_headers(request, headers: Dict[str, str]) -> None:
+    """Sets the forwarding headers of a proxied request (in place)."""
+    peer = _peer(request)
+    if peer is None:
+        return
+    if peer in TRUSTED_PROXIES:
+        forwarded = headers.get("x-forwarded-for")
+        headers["x-forwarded-for"] = f"{forwarded}, {peer}" if forwarded else peer
+    else:
+        headers.pop("x-user-id", None)
+        headers["x-forwarded-for"] = peer
@@ -0,0 +1,151 @@
+"""
+Gateway for multi-worker mode: one entry point in front of N API workers.
+
+Requests about one source (`/api/v1/chat/{id}`, `/api/v1/data/{id}/...`,
+`/api/v1/dataset/{id}/...`) are
+routed by consistent hashing on the source's affinity key (its base artifact
+hash, looked up in Redis), so the same worker keeps answering for a dataset
+while its DuckDB caches and DB attachments are warm. Everything else goes
+round-robin. Workers join and leave the ring through their Redis heartbeats
+(or a static CLUSTER_WORKERS list); a worker that refuses connections is
+dropped and the request retried on the next worker of the key's preference list.
+
+    uvicorn cluster.gateway:app --port 8000
+"""
+import asyncio
+import itertools
+import os
+import re
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.background import BackgroundTask
+
+from cluster import state as cluster_state
+from cluster.forwarding import forward_headers
+from cluster.hash_ring import HashRing
+from observability.metrics import GATEWAY_REQUESTS
+
+CLUSTER_WORKERS = os.getenv("CLUSTER_WORKERS")   # "w1=http://127.0.0.1:8001,w2=..." instead of Redis discovery
+RING_REFRESH_S  = 2.0
+PROXY_TIMEOUT_S = 300.0                          # Uploads and cold full scans can take minutes
+MAX_ATTEMPTS    = 2
+
+_AFFINITY_PATH = re.compile(r"^/api/v1/(?:chat|data|dataset)/([0-9a-fA-F-]{36})(?:/|$)")
+_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+_ring = HashRing()
+_workers: Dict[str, str] = {}
+_round_robin = itertools.count()
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _static_workers() -> Dict[str, str]:
+    pairs = (entry.split("=", 1) for entry in CLUSTER_WORKERS.split(",") if entry.strip())
+    return {worker_id.strip(): url.strip() for worker_id, url in pairs}
+
+
+def _set_workers(live: Dict[str, str]) -> None:
+    for worker_id in set(_workers) - set(live):
+        _ring.remove(worker_id)
+        print(f"🛰️ [Gateway] Worker {worker_id} left the ring")
+    for worker_id, url in live.items():
+        if worker_id not in _workers:
+            _ring.add(worker_id)
+            print(f"🛰️ [Gateway] Worker {worker_id} joined the ring at {url}")
+    _workers.clear()
+    _workers.update(live)
+
+
+async def _refresh_loop() -> None:
+    while True:
+        # Static workers are re-added every round, so one dropped after a failed connect comes back.
+        live = _static_workers() if CLUSTER_WORKERS else await cluster_state.live_workers()
+        # An unreachable Redis returns {}; keep the last known ring rather than emptying it.
+        if live:
+            _set_workers(live)
+        await asyncio.sleep(RING_REFRESH_S)
+
+
+@asynccontextmanager
+async def life_span(app: FastAPI):
+    global _client
+    _client = httpx.AsyncClient(timeout=httpx.Timeout(PROXY_TIMEOUT_S, connect=2.0))
+    refresher = asyncio.create_task(_refresh_loop())
+    yield
+    refresher.cancel()
+    await _client.aclose()
+
+
+app = FastAPI(lifespan=life_span)
+
+
+async def _candidates(path: str):
+    """(workers to try in order, routing label) for a request path."""
+    match = _AFFINITY_PATH.match(path)
+    if match:
+        source_id = match.group(1)
+        key = await cluster_state.source_affinity(source_id) or source_id
+        return _ring.preference_list(key, MAX_ATTEMPTS), "affinity"
+    nodes = _ring.nodes
+    if not nodes:
+        return [], "any"
+    start = next(_round_robin) % len(nodes)
+    return (nodes[start:] + nodes[:start])[:MAX_ATTEMPTS], "any"
+
+
+@app.get("/cluster")
+async def cluster_info():
+    return {"workers": _workers, "ring": _ring.nodes}
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+async def proxy(path: str, request: Request):
+    candidates, routing = await _candidates(request.url.path)
+    if not candidates:
+        return Response(content='{"detail": "No workers available"}', status_code=503, media_type="application/json")
+
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in _HOP_HEADERS}
+    # Workers schedule DuckDB work fairly per caller (db/scheduler.py), not per gateway.
+    forward_headers(request, headers)
+    # Buffered (not streamed) so the request can be replayed on the failover worker.
+    body = await request.body()
+    for attempt, worker_id in enumerate(candidates):
+        base_url = _workers.get(worker_id)
+        if base_url is None:
+            continue
+        url = base_url + request.url.path + (f"?{request.url.query}" if request.url.query else "")
+        upstream = _client.build_request(request.method, url, headers=headers, content=body)
+        try:
+            response = await _client.send(upstream, stream=True)
+        except httpx.ConnectError:
+            # Dead worker: drop it now rather than waiting for its heartbeat to expire.
+            print(f"🛰️ [Gateway] Worker {worker_id} unreachable, failing over")
+            _ring.remove(worker_id)
+            _workers.pop(worker_id, None)
+            continue
+
+        GATEWAY_REQUESTS.labels(worker_id, routing if attempt == 0 else "failover").inc()
+        response_headers = {k: v for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS}
+        response_headers["X-Insights-Worker"] = worker_id
+        # Streamed through unbuffered, so NDJSON refinement reaches the client as it is produced.
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers=response_headers,
+            background=BackgroundTask(response.aclose),
+        )
+
+    return Response(content='{"detail": "No workers reachable"}', status_code=503, media_type="application/json")
@@ -0,0 +1,65 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+VIRTUAL_NODES = 160   # Points per worker on the ring; more points = more even split
+
+
+def _point(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hashing over worker ids. A key maps to the first worker point
+    clockwise from the key's hash, so adding or removing a worker only moves
+    the keys of its own arcs (~1/N of them) instead of reshuffling everything.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = VIRTUAL_NODES):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self._nodes: set = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for i in range(self.replicas):
+            point = _point(f"{node}#{i}")
+            if point in self._owners:
+                continue    # 64-bit collision: first owner keeps the point
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        self._points = [p for p in self._points if self._owners[p] != node]
+        self._owners = {p: self._owners[p] for p in self._points}
+
+    def node_for(self, key: str) -> Optional[str]:
+        """The worker owning `key`, or None on an empty ring."""
+        return next(iter(self.preference_list(key, 1)), None)
+
+    def preference_list(self, key: str, count: int) -> List[str]:
+        """Up to `count` distinct workers for `key`, owner first; later ones are failover targets."""
+        if not self._points:
+            return []
+        nodes: List[str] = []
+        start = bisect.bisect(self._points, _point(key))
+        for i in range(len(self._points)):
+            node = self._owners[self._points[(start + i) % len(self._points)]]
+            if node not in nodes:
+                nodes.append(node)
+                if len(nodes) == count:
+                    break
+        return nodes
@@ -0,0 +1,96 @@
+"""
+Local multi-worker topology: N API workers plus the gateway, as separate processes.
+
+    docker compose up -d db redis minio
+    python -m cluster.run_local --workers 3 --port 8000
+
+Workers listen on port+1 .. port+N and register in Redis; clients talk to the
+gateway on `port`. Stop with Ctrl-C (all processes are terminated). Kill a
+worker by hand to watch the gateway fail its datasets over to the next one.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _spawn(module: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env={**os.environ, **env},
+    )
+
+
+def _check_redis(url: str) -> None:
+    import redis
+    try:
+        redis.Redis.from_url(url, socket_timeout=2).ping()
+    except Exception as e:
+        sys.exit(f"Redis not reachable at {url} ({e}); start it with `docker compose up -d redis`.")
+
+
+def _wait_for_ring(gateway_url: str, workers: int, timeout: float) -> dict:
+    deadline = time.monotonic() + timeout
+    info = {}
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{gateway_url}/cluster", timeout=2) as response:
+                info = json.load(response)
+            if len(info.get("workers", {})) >= workers:
+                return info
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return info
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8000, help="Gateway port; workers use the next N ports")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    parser.add_argument("--sandbox-workers", type=int, default=1, help="Sandbox processes per API worker")
+    args = parser.parse_args()
+
+    _check_redis(args.redis_url)
+    shared = {"REDIS_URL": args.redis_url}
+    processes = []
+    for i in range(1, args.workers + 1):
+        port = args.port + i
+        processes.append(_spawn("main:app", port, {
+            **shared,
+            "WORKER_ID": f"w{i}",
+            "WORKER_URL": f"http://127.0.0.1:{port}",
+            "SANDBOX_WORKERS": str(args.sandbox_workers),
+        }))
+    processes.append(_spawn("cluster.gateway:app", args.port, shared))
+
+    gateway_url = f"http://127.0.0.1:{args.port}"
+    info = _wait_for_ring(gateway_url, args.workers, timeout=120)
+    print(f"🛰️ [Cluster] Gateway on {gateway_url}, ring: {info.get('workers')}")
+
+    def stop(*_):
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    while processes[-1].poll() is None:   # Runs until the gateway exits (or Ctrl-C)
+        time.sleep(1)
+    stop()
+
+
+if __name__ == "__main__":
+    main()
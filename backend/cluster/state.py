@@ -0,0 +1,173 @@
+"""
+State shared by the workers of a multi-worker deployment, kept in Redis.
+
+    insights:worker:{id}            advertised URL of a live worker (expires without heartbeats)
+    insights:source:{source_id}     affinity key of a source (its base artifact hash)
+    insights:job:{id}               status of an ingest job, readable from any worker
+    insights:answer:{key}:{q}       exact-question answers, in front of the pgvector cache
+    insights:answers:{key}          index of the answers above, for invalidation
+    insights:result:{id}            query behind a chat table, so any worker can page it
+
+Everything here is optional: without REDIS_URL (single-process mode) every call
+is a cheap no-op, and Redis errors are logged and never fail a request.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+REDIS_URL        = os.getenv("REDIS_URL")
+WORKER_ID        = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+WORKER_URL       = os.getenv("WORKER_URL")     # Set when this process should join the gateway's ring
+HEARTBEAT_S      = 2.0
+WORKER_TTL_S     = 6                           # A worker missing ~3 heartbeats leaves the ring
+JOB_TTL_S        = 24 * 3600
+ANSWER_TTL_S     = 24 * 3600
+SOURCE_KEY_TTL_S = 7 * 24 * 3600
+RESULT_TTL_S     = 24 * 3600
+
+_PREFIX = "insights"
+_client = None
+
+
+def cluster_enabled() -> bool:
+    return bool(REDIS_URL)
+
+
+def get_redis():
+    """The process-wide async Redis client, or None in single-process mode."""
+    global _client
+    if _client is None and REDIS_URL:
+        import redis.asyncio as aioredis
+        _client = aioredis.from_url(REDIS_URL, decode_responses=True, socket_timeout=2)
+    return _client
+
+
+async def _call(fn: Callable[[Any], Awaitable[Any]], default: Any = None) -> Any:
+    client = get_redis()
+    if client is None:
+        return default
+    try:
+        return await fn(client)
+    except Exception as e:
+        print(f"🛰️ [Cluster] Redis call failed (non-fatal): {e}")
+        return default
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode()).hexdigest()[:16]
+
+
+def affinity_key(artifact_url: Optional[str], source_id: str) -> str:
+    """
+    What requests for a source are routed by: the base artifact hash for file
+    data (appended parts keep it, so the worker with the warm parts keeps the
+    dataset), the source itself for live databases (its attachment is the warm state).
+    """
+    return artifact_url or f"db:{source_id}"
+
+
+# ── Workers ───────────────────────────────────────────────────────────────────
+async def heartbeat_loop() -> None:
+    """Keeps this worker registered while the app runs (cancelled on shutdown)."""
+    key = f"{_PREFIX}:worker:{WORKER_ID}"
+    print(f"🛰️ [Cluster] Worker {WORKER_ID} joining at {WORKER_URL}")
+    try:
+        while True:
+            await _call(lambda r: r.set(key, WORKER_URL, ex=WORKER_TTL_S))
+            await asyncio.sleep(HEARTBEAT_S)
+    finally:
+        # Leave right away instead of waiting for the TTL, so the gateway stops routing here.
+        await _call(lambda r: r.delete(key))
+
+
+async def live_workers() -> Dict[str, str]:
+    """{worker_id: url} of every worker with a fresh heartbeat."""
+    async def fetch(r):
+        keys = [k async for k in r.scan_iter(match=f"{_PREFIX}:worker:*", count=100)]
+        urls = await r.mget(keys) if keys else []
+        return {k.rsplit(":", 1)[1]: url for k, url in zip(keys, urls) if url}
+
+    return await _call(fetch, {})
+
+
+# ── Routing ───────────────────────────────────────────────────────────────────
+async def remember_source(source_id: str, key: str) -> None:
+    await _call(lambda r: r.set(f"{_PREFIX}:source:{source_id}", key, ex=SOURCE_KEY_TTL_S))
+
+
+async def source_affinity(source_id: str) -> Optional[str]:
+    return await _call(lambda r: r.get(f"{_PREFIX}:source:{source_id}"))
+
+
+# ── Jobs ──────────────────────────────────────────────────────────────────────
+async def start_job(job_id: str, kind: str, **fields: Any) -> None:
+    key = f"{_PREFIX}:job:{job_id}"
+    mapping = {"kind": kind, "status": "running", "worker": WORKER_ID, "started_at": time.time(), **fields}
+
+    async def write(r):
+        await r.hset(key, mapping={k: str(v) for k, v in mapping.items()})
+        await r.expire(key, JOB_TTL_S)
+
+    await _call(write)
+
+
+async def finish_job(job_id: str, status: str, **fields: Any) -> None:
+    mapping = {"status": status, "finished_at": time.time(), **fields}
+    await _call(lambda r: r.hset(f"{_PREFIX}:job:{job_id}", mapping={k: str(v) for k, v in mapping.items()}))
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, str]]:
+    return await _call(lambda r: r.hgetall(f"{_PREFIX}:job:{job_id}")) or None
+
+
+# ── Browsable results ─────────────────────────────────────────────────────────
+async def put_result(result_id: str, entry: Dict[str, Any]) -> None:
+    await _call(lambda r: r.set(f"{_PREFIX}:result:{result_id}", json.dumps(entry), ex=RESULT_TTL_S))
+
+
+async def get_result(result_id: str) -> Optional[Dict[str, Any]]:
+    raw = await _call(lambda r: r.get(f"{_PREFIX}:result:{result_id}"))
+    return json.loads(raw) if raw else None
+
+
+# ── Exact-question answers ────────────────────────────────────────────────────
+def _answer_key(data_key: str, question: str) -> str:
+    normalized = " ".join(question.lower().split())
+    return f"{_PREFIX}:answer:{_digest(data_key)}:{_digest(normalized)}"
+
+
+async def get_answer(data_key: str, question: str) -> Optional[Dict[str, Any]]:
+    raw = await _call(lambda r: r.get(_answer_key(data_key, question)))
+    return json.loads(raw) if raw else None
+
+
+async def put_answer(data_key: str, question: str, sql: Optional[str], blocks: List[Dict[str, Any]]) -> None:
+    key = _answer_key(data_key, question)
+    index = f"{_PREFIX}:answers:{_digest(data_key)}"
+    payload = json.dumps({"question": question, "sql": sql, "blocks": blocks}, default=str)
+
+    async def write(r):
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.set(key, payload, ex=ANSWER_TTL_S)
+            pipe.sadd(index, key)
+            pipe.expire(index, ANSWER_TTL_S)
+            await pipe.execute()
+
+    await _call(write)
+
+
+async def drop_answers(data_key: str) -> int:
+    index = f"{_PREFIX}:answers:{_digest(data_key)}"
+
+    async def drop(r):
+        keys = await r.smembers(index)
+        if keys:
+            await r.delete(*keys)
+        await r.delete(index)
+        return len(keys)
+
+    return await _call(drop, 0)
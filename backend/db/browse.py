@@ -0,0 +1,265 @@
+"""
+Server-side browsing of a dataset or of a chat result, one page at a time.
+
+Pages are cut by keyset pagination, so page 1,000 costs what page 1 does and
+only the page itself leaves DuckDB:
+
+    - parquet datasets: the key is (part, file_row_number). Parts before the
+      cursor are not read at all, and DuckDB skips row groups before it.
+    - chat results: the query runs once per result_id, into a parquet copy
+      under the export prefix (db.export.materialize_result), which is then
+      paged like a dataset. Its row order is fixed when it is written, so
+      ties and unordered results (GROUP BY, parallel scans) cannot move
+      between pages.
+    - live DB tables: not keyset. The key is the row's ordinal in the table
+      sorted on all its columns, so every page re-scans and sorts the table:
+      the cost grows with the table, not with the page.
+    - with a sort column: (value, key) after the cursor, a top-N in DuckDB
+
+Column projection and filters are compiled into the same query. Cursors are
+opaque to clients: base64 JSON of the last row's key (and sort value).
+"""
+import base64
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import duckdb
+
+from db.data_table import artifact_parts, data_key, is_live_source, open_data_table
+from db.export import materialize_result
+from db.scheduler import duckdb_scheduler
+
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX     = 1000
+MAX_RESULTS       = 512    # Chat results kept browsable in this process, least recently used dropped
+
+# filter=column:op[:value]
+FILTER_OPS = {"eq": "=", "ne": "<>", "lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+TEXT_OPS   = ("contains",)
+NULL_OPS   = {"null": "IS NULL", "notnull": "IS NOT NULL"}
+
+_PART, _ROW = "__browse_part", "__browse_row"
+
+_results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_results_lock = threading.Lock()
+
+
+# ── Chat results ─────────────────────────────────────────────────────────────
+def remember_result(source: Mapping[str, Any], sql: str, total_rows: int) -> str:
+    """Registers an executed query so its table can be paged; returns its result_id."""
+    result_id = uuid.uuid4().hex
+    store_result(result_id, {
+        "source_id": source.get("source_id"), "data_key": data_key(source), "sql": sql, "total_rows": total_rows,
+    })
+    return result_id
+
+
+def result_entry(result_id: str) -> Optional[Dict[str, Any]]:
+    with _results_lock:
+        entry = _results.get(result_id)
+        if entry is not None:
+            _results.move_to_end(result_id)
+        return entry
+
+
+def store_result(result_id: str, entry: Dict[str, Any]) -> None:
+    """Registers a result entry (also used for results another worker produced)."""
+    with _results_lock:
+        _results[result_id] = entry
+        while len(_results) > MAX_RESULTS:
+            _results.popitem(last=False)
+
+
+# ── Query building ───────────────────────────────────────────────────────────
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def encode_cursor(key: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        int(key["p"]), int(key["r"])
+        return key
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_filters(specs: Sequence[str]) -> List[Tuple[str, str, Optional[str]]]:
+    """['price:gt:100', 'city:contains:york', 'email:null'] → [(column, op, value)]."""
+    filters = []
+    for spec in specs:
+        column, _, rest = spec.partition(":")
+        op, _, value = rest.partition(":")
+        if op in NULL_OPS:
+            filters.append((column, op, None))
+        elif op in FILTER_OPS or op in TEXT_OPS:
+            filters.append((column, op, value))
+        else:
+            raise ValueError(f"Invalid filter {spec!r}: use column:op[:value] with op in "
+                             f"{', '.join([*FILTER_OPS, *TEXT_OPS, *NULL_OPS])}")
+    return filters
+
+
+def _where(filters, schema: Dict[str, str], params: List[Any]) -> List[str]:
+    clauses = []
+    for column, op, value in filters:
+        if column not in schema:
+            raise ValueError(f"Unknown filter column {column!r}")
+        if op in NULL_OPS:
+            clauses.append(f"{_q(column)} {NULL_OPS[op]}")
+        elif op in TEXT_OPS:
+            clauses.append(f"CAST({_q(column)} AS VARCHAR) ILIKE '%' || ? || '%'")
+            params.append(value)
+        else:
+            clauses.append(f"{_q(column)} {FILTER_OPS[op]} CAST(? AS {schema[column]})")
+            params.append(value)
+    return clauses
+
+
+def _after_key(key: Dict[str, Any], params: List[Any]) -> str:
+    params.extend([key["p"], key["p"], key["r"]])
+    return f"({_PART} > ? OR ({_PART} = ? AND {_ROW} > ?))"
+
+
+def _after_sorted(key: Dict[str, Any], sort: str, sort_type: str, descending: bool, params: List[Any]) -> str:
+    """Rows after the cursor in `ORDER BY sort [DESC] NULLS LAST, part, row`."""
+    column = _q(sort)
+    if key.get("v") is None:
+        return f"({column} IS NULL AND {_after_key(key, params)})"
+    params.append(key["v"])
+    beyond = f"{column} {'<' if descending else '>'} CAST(? AS {sort_type})"
+    params.append(key["v"])
+    tie = f"{column} = CAST(? AS {sort_type}) AND {_after_key(key, params)}"
+    return f"({beyond} OR {column} IS NULL OR ({tie}))"
+
+
+def _parquet_relation(urls: Sequence[str], key: Optional[Dict[str, Any]], in_file_order: bool,
+                      bounded: bool, limit: int, params: List[Any]) -> str:
+    """
+    Parquet parts with their (part, file_row_number) key. In file order, parts
+    before the cursor are skipped and the cursor's part starts after it; when
+    every row qualifies (`bounded`: no filter), each part is also cut to the
+    rows one page can use, so DuckDB reads a single row group per part.
+    """
+    selects = []
+    for i, url in enumerate(urls):
+        start = -1
+        if key and in_file_order:
+            if i < int(key["p"]):
+                continue
+            if i == int(key["p"]):
+                start = int(key["r"])
+        select = (
+            f"SELECT * EXCLUDE (file_row_number), {i} AS {_PART}, file_row_number AS {_ROW} "
+            f"FROM read_parquet('{url}', file_row_number=true)"
+        )
+        if in_file_order and bounded:
+            select += " WHERE file_row_number > ? AND file_row_number <= ?"
+            params.extend([start, start + limit + 1])
+        elif start >= 0:
+            select += " WHERE file_row_number > ?"
+            params.append(start)
+        selects.append(select)
+    if not selects:
+        raise ValueError("Invalid cursor")
+    return "(" + " UNION ALL BY NAME ".join(selects) + ")"
+
+
+def browse(
+    source: Mapping[str, Any],
+    sql: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    filters: Sequence[Tuple[str, str, Optional[str]]] = (),
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    total_rows: Optional[int] = None,
+    client: str = "anonymous",
+    result_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    One page of the dataset behind `source`, or of the result of `sql` run on it
+    (registered as `result_id`, which names its parquet copy).
+    Returns {"columns", "data", "next_cursor", "total_rows"}; total_rows is None
+    when it would cost a scan (filtered pages). Runs in a scheduler slot for
+    `client` (or raises Saturated).
+    """
+    if sql is not None and not result_id:
+        raise ValueError("Browsing a result needs its result_id")
+    limit = max(1, min(int(limit), PAGE_SIZE_MAX))
+    key = decode_cursor(cursor)
+
+    with duckdb_scheduler.slot(client, source.get("source_id")):
+        con = open_data_table(source)
+        try:
+            by_ordinal = sql is None and is_live_source(source)
+            if sql is not None:
+                urls = [materialize_result(con, sql, result_id)]
+                base_sql = f"SELECT * FROM read_parquet('{urls[0]}')"
+            else:
+                urls = [] if by_ordinal else [f"s3://raw-data/{part}" for part in artifact_parts(source)]
+                base_sql = "SELECT * FROM data_table"
+            described = con.execute(f"SELECT column_name, column_type FROM (DESCRIBE {base_sql})").fetchall()
+            schema = dict(described)
+            projection = list(columns) if columns else list(schema)
+            for name in [*projection, *([sort] if sort else [])]:
+                if name not in schema:
+                    raise ValueError(f"Unknown column {name!r}")
+
+            params: List[Any] = []
+            if by_ordinal:
+                # A live table has no file order: number it in a total order, the same on every page.
+                relation = f"(SELECT *, 0 AS {_PART}, row_number() OVER () AS {_ROW} FROM ({base_sql} ORDER BY ALL))"
+            else:
+                relation = _parquet_relation(urls, key, sort is None, not filters, limit, params)
+
+            where = _where(filters, schema, params)
+            if key and sort:
+                where.append(_after_sorted(key, sort, schema[sort], descending, params))
+            elif key and by_ordinal:
+                where.append(_after_key(key, params))
+
+            order = f"{_PART}, {_ROW}"
+            if sort:
+                order = f"{_q(sort)} {'DESC' if descending else 'ASC'} NULLS LAST, {order}"
+            selected = list(dict.fromkeys([*projection, *([sort] if sort else [])]))
+            query = (
+                f"SELECT {', '.join(map(_q, selected))}, {_PART}, {_ROW} FROM {relation} "
+                f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+                f"ORDER BY {order} LIMIT {limit + 1}"
+            )
+            try:
+                result = con.execute(query, params)
+            except (duckdb.ConversionException, duckdb.InvalidInputException) as e:
+                raise ValueError(f"Invalid filter or cursor value: {e}")
+            names = [d[0] for d in result.description]
+            rows = [dict(zip(names, row)) for row in result.fetchall()]
+
+            if filters:
+                total_rows = None
+            elif sql is None:
+                total_rows = source.get("row_count")
+        finally:
+            con.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_key = {"p": last[_PART], "r": last[_ROW]}
+        if sort:
+            next_key["v"] = last[sort]
+        next_cursor = encode_cursor(next_key)
+
+    data = [{name: row[name] for name in projection} for row in rows]
+    return {"columns": projection, "data": data, "next_cursor": next_cursor, "total_rows": total_rows}
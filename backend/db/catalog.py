@@ -0,0 +1,91 @@
+from typing import Any, Dict, Optional
+
+import duckdb
+
+_INTEGER_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                  "UINTEGER", "UBIGINT")
+_NUMERIC_TYPES = _INTEGER_TYPES + ("FLOAT", "DOUBLE", "DECIMAL", "REAL")
+
+
+def _typed(value: Optional[str], column_type: str) -> Any:
+    """Parquet footer stats come back as strings; numbers must compare as numbers."""
+    if value is None:
+        return None
+    if column_type.startswith(_NUMERIC_TYPES):
+        try:
+            # Keep integers integral so they round-trip as SQL literals (watermarks).
+            return int(value) if column_type in _INTEGER_TYPES else float(value)
+        except ValueError:
+            return None
+    return value
+
+
+def parquet_stats(path: str) -> Dict[str, Any]:
+    """
+    Catalog stats for one parquet file, read from its footer only (no data scan):
+    row count, size, and per-column type / min / max / null count.
+    """
+    safe_path = path.replace("'", "''")
+    con = duckdb.connect(database=':memory:')
+    try:
+        row_count, size_bytes = con.execute(
+            f"SELECT sum(num_rows), sum(file_size_bytes) FROM parquet_file_metadata('{safe_path}')"
+        ).fetchone()
+        types = dict(con.execute(f"SELECT column_name, column_type FROM (DESCRIBE SELECT * FROM read_parquet('{safe_path}'))").fetchall())
+        rows = con.execute(f"""
+            SELECT path_in_schema, stats_min_value, stats_max_value, stats_null_count
+            FROM parquet_metadata('{safe_path}')
+        """).fetchall()
+    finally:
+        con.close()
+
+    columns: Dict[str, Dict[str, Any]] = {
+        name: {"type": ctype, "min": None, "max": None, "null_count": 0} for name, ctype in types.items()
+    }
+    for name, min_value, max_value, null_count in rows:
+        col = columns.get(name)
+        if col is None:          # nested leaf (struct.field) — top-level stats only
+            continue
+        lo, hi = _typed(min_value, col["type"]), _typed(max_value, col["type"])
+        if lo is not None and (col["min"] is None or lo < col["min"]):
+            col["min"] = lo
+        if hi is not None and (col["max"] is None or hi > col["max"]):
+            col["max"] = hi
+        col["null_count"] += int(null_count or 0)
+
+    return {"row_count": int(row_count or 0), "size_bytes": int(size_bytes or 0), "columns": columns}
+
+
+def merge_stats(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Folds the stats of a newly appended part into the dataset's stats. Exact for
+    rows, bytes, min, max and nulls; columns missing from one side count as null
+    there (parts are read with union_by_name).
+    """
+    if not old or "columns" not in old:
+        return {**(old or {}), **new}
+
+    merged_columns: Dict[str, Dict[str, Any]] = {}
+    for name in list(old["columns"]) + [c for c in new["columns"] if c not in old["columns"]]:
+        a = old["columns"].get(name)
+        b = new["columns"].get(name)
+        if a is None:
+            merged_columns[name] = {**b, "null_count": b["null_count"] + old["row_count"]}
+            continue
+        if b is None:
+            merged_columns[name] = {**a, "null_count": a["null_count"] + new["row_count"]}
+            continue
+        mins = [v for v in (a["min"], b["min"]) if v is not None]
+        maxs = [v for v in (a["max"], b["max"]) if v is not None]
+        try:
+            lo, hi = (min(mins) if mins else None), (max(maxs) if maxs else None)
+        except TypeError:        # type changed between parts (e.g. int → string): keep the new part's view
+            lo, hi = b["min"], b["max"]
+        merged_columns[name] = {"type": a["type"], "min": lo, "max": hi, "null_count": a["null_count"] + b["null_count"]}
+
+    return {
+        **old,
+        "row_count":  old["row_count"] + new["row_count"],
+        "size_bytes": old["size_bytes"] + new["size_bytes"],
+        "columns":    merged_columns,
+    }
@@ -0,0 +1,108 @@
+import hashlib
+from typing import Any, Dict, List, Mapping, Optional
+
+from db.duck_db import get_duckdb_connection, note_parquet_files
+from db.federation import get_source_cursor, quote_table
+from db.sampling import APPROX_MIN_ROWS, SAMPLE_TARGET_ROWS, SAMPLE_WEIGHT
+from schemas.uploads import SourceType
+
+LIVE_SOURCE_TYPES = {SourceType.POSTGRES_DB, SourceType.MYSQL_DB}
+
+
+def is_live_source(source: Mapping[str, Any]) -> bool:
+    """DB sources without a parquet mirror are queried in place."""
+    return not source.get("artifact_url") and source.get("source_type") in LIVE_SOURCE_TYPES
+
+
+def artifact_parts(source: Mapping[str, Any]) -> List[str]:
+    return source.get("artifact_parts") or ([source["artifact_url"]] if source.get("artifact_url") else [])
+
+
+def data_key(source: Mapping[str, Any]) -> str:
+    """
+    Stable identifier of the data behind `data_table` (used as a cache / profile key).
+    Single-part datasets keep their artifact hash; appending a part yields a new key,
+    so caches for the previous version simply stop matching.
+    """
+    if is_live_source(source):
+        return f"db:{source.get('source_id')}/{source.get('table_name')}"
+    parts = artifact_parts(source)
+    if len(parts) <= 1:
+        return source.get("artifact_url")
+    digest = hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+    return f"{parts[0]}+{len(parts) - 1}:{digest}"
+
+
+def source_state(source) -> Dict[str, Any]:
+    """The DataSource fields the agent needs, in AgentState shape."""
+    return {
+        "artifact_url": source.artifact_url,
+        "artifact_parts": source.artifact_parts or None,
+        "source_id": str(source.id),
+        "source_type": source.source_type,
+        "connection_string": source.connection_string,
+        "table_name": (source.ingestion_config or {}).get("table_name"),
+        "row_count": (source.stats or {}).get("row_count"),
+        "column_types": {name: col["type"] for name, col in ((source.stats or {}).get("columns") or {}).items()} or None,
+        "sample": (source.stats or {}).get("sample"),
+    }
+
+
+def open_data_table(source: Mapping[str, Any]):
+    """
+    Returns a DuckDB connection on which `data_table` is a temp view over the
+    source: the parquet artifact on S3, or the live table of an attached DB.
+    `source` is the agent state (or any mapping with the same keys).
+    """
+    if is_live_source(source):
+        table_name = source.get("table_name")
+        if not table_name:
+            raise ValueError("No table selected for this database source. Pick one with /connect-db/{id}/tables.")
+        con = get_source_cursor(str(source.get("source_id")), source.get("source_type"), source.get("connection_string"))
+        relation = quote_table(table_name)
+    else:
+        con = get_duckdb_connection()
+        note_parquet_files(artifact_parts(source))
+        paths = [f"'s3://raw-data/{part}'" for part in artifact_parts(source)]
+        if len(paths) == 1:
+            relation = f"read_parquet({paths[0]})"
+        else:
+            # Appended parts may add columns; union_by_name fills the gaps with NULL.
+            relation = f"read_parquet([{', '.join(paths)}], union_by_name=true)"
+
+    try:
+        # TEMP so concurrent cursors on a shared (attached) database never see each other's view.
+        con.execute(f"CREATE OR REPLACE TEMP VIEW data_table AS SELECT * FROM {relation}")
+    except Exception:
+        con.close()
+        raise
+    return con
+
+
+def attach_sample_view(con, source: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Adds a `data_sample` temp view (rows of data_table plus `_sample_weight`) next to
+    `data_table`. Uses the sample built at ingest; large parquet datasets without one
+    fall back to DuckDB block sampling. Returns {"method", "rows", "base_rows"}, or
+    None when approximate answers are not available (small or live sources).
+    """
+    sample = source.get("sample") or {}
+    if sample.get("parts"):
+        note_parquet_files(sample["parts"])
+        paths = ", ".join(f"'s3://raw-data/{part}'" for part in sample["parts"])
+        con.execute(f"CREATE OR REPLACE TEMP VIEW data_sample AS SELECT * FROM read_parquet([{paths}], union_by_name=true)")
+        method = f"stratified (by {sample['strata_column']})" if sample.get("strata_column") else "uniform"
+        return {"method": method, "rows": sample["rows"], "base_rows": source.get("row_count") or sample["base_rows"]}
+
+    row_count = source.get("row_count") or 0
+    if is_live_source(source) or row_count < APPROX_MIN_ROWS:
+        return None
+    percent = 100.0 * SAMPLE_TARGET_ROWS / row_count
+    # System sampling keeps whole vectors, so the kept fraction is only roughly `percent`;
+    # weight by the fraction actually kept.
+    con.execute(f"""
+        CREATE OR REPLACE TEMP VIEW data_sample AS
+        SELECT *, {row_count}::DOUBLE / count(*) OVER () AS {SAMPLE_WEIGHT}
+        FROM (SELECT * FROM data_table USING SAMPLE {percent} PERCENT (system, 42))
+    """)
+    return {"method": "block (TABLESAMPLE)", "rows": SAMPLE_TARGET_ROWS, "base_rows": row_count}
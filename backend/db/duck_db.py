@@ -1,23 +1,105 @@
+"""
+One process-wide DuckDB database for the parquet artifacts on S3/MinIO.
+
+Every query used to open its own in-memory database and re-fetch the parquet
+footers and byte ranges it had just read. Callers now get a cursor on a shared
+database, so they share its caches:
+
+    - parquet_metadata_cache:      decoded footers and row-group stats, per file
+    - enable_http_metadata_cache:  HEAD results (size, etag), per URL
+    - enable_external_file_cache:  fetched byte ranges, kept in the buffer pool
+
+Artifacts are named by their content hash and never rewritten, so cached entries
+are trusted without re-validation (no HEAD request per query). Temp views are
+private to each cursor, so concurrent queries never see each other's data_table.
+"""
+import os
+import threading
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+
 import duckdb
 
-def get_duckdb_connection():
-    """Creates a DuckDB connection configured for local MinIO/S3."""
+from observability.metrics import DUCKDB_FILE_CACHE_BYTES, PARQUET_METADATA_CACHE
+from s3.client import ACCESS_KEY, MINIO_URL, REGION_NAME, SECRET_KEY
+
+_endpoint = urlparse(MINIO_URL)
+
+# Installed into the image at build time (python -m db.install_extensions); at runtime they are only LOADed.
+EXTENSIONS = ("httpfs", "postgres", "mysql")
+
+# One thread pool for every query on the shared database (DuckDB's `threads` is database-wide);
+# db/scheduler.py caps how many queries share it at once.
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", str(os.cpu_count() or 4)))
+
+_db: Optional[duckdb.DuckDBPyConnection] = None
+_db_lock = threading.Lock()
+_opened_files = set()   # Parquet files whose footer this process has already read
+
+
+def load_extension(con: duckdb.DuckDBPyConnection, name: str) -> None:
+    """LOADs an extension, installing it first only when the build step was skipped (e.g. local dev)."""
+    try:
+        con.execute(f"LOAD {name};")
+    except duckdb.Error:
+        print(f"🦆 [DuckDB] {name} not pre-installed, installing at runtime (run python -m db.install_extensions at build time)")
+        con.execute(f"INSTALL {name};")
+        con.execute(f"LOAD {name};")
+
+
+def _connect() -> duckdb.DuckDBPyConnection:
     con = duckdb.connect(database=':memory:')
 
     # Load the HTTP/S3 extension
-    con.execute("INSTALL httpfs;")
-    con.execute("LOAD httpfs;")
+    load_extension(con, "httpfs")
+
+    con.execute(f"SET threads = {DUCKDB_THREADS};")
+    con.execute("SET parquet_metadata_cache = true;")
+    con.execute("SET enable_http_metadata_cache = true;")
+    con.execute("SET enable_external_file_cache = true;")
+    con.execute("SET validate_external_file_cache = 'NO_VALIDATION';")
 
-    # Configure MinIO credentials (matches your s3/client.py)
-    con.execute("""
+    # Configure MinIO credentials (shared with s3/client.py)
+    con.execute(f"""
         CREATE SECRET (
             TYPE S3,
-            KEY_ID 'minioadmin',
-            SECRET 'minioadmin',
-            REGION 'us-east-1',
-            ENDPOINT 'localhost:9000',
+            KEY_ID '{ACCESS_KEY}',
+            SECRET '{SECRET_KEY}',
+            REGION '{REGION_NAME}',
+            ENDPOINT '{_endpoint.netloc}',
             URL_STYLE 'path',
-            USE_SSL false
+            USE_SSL {str(_endpoint.scheme == 'https').lower()}
         );
     """)
-    return con
\ No newline at end of file
+    return con
+
+
+def _cached_bytes() -> float:
+    if _db is None:
+        return 0.0
+    cur = _db.cursor()
+    try:
+        return float(cur.execute("SELECT coalesce(sum(nr_bytes), 0) FROM duckdb_external_file_cache()").fetchone()[0])
+    except duckdb.Error:
+        return 0.0
+    finally:
+        cur.close()
+
+
+def get_duckdb_connection() -> duckdb.DuckDBPyConnection:
+    """A fresh cursor on the shared S3-configured database; close it when done."""
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = _connect()
+            DUCKDB_FILE_CACHE_BYTES.set_function(_cached_bytes)
+        return _db.cursor()
+
+
+def note_parquet_files(paths: Iterable[str]) -> None:
+    """Counts parquet metadata cache hits / misses for files about to be scanned."""
+    for path in paths:
+        with _db_lock:
+            hit = path in _opened_files
+            _opened_files.add(path)
+        PARQUET_METADATA_CACHE.labels("hit" if hit else "miss").inc()
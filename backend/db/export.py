@@ -0,0 +1,136 @@
+"""
+Full-result export of a chat answer, in constant memory whatever its size.
+
+    - Parquet is written by DuckDB straight to S3 (multipart upload as it goes)
+      and handed out as a presigned URL. A result's export is reused while its
+      object exists: results are immutable per result_id. The same copy is
+      what result browsing pages through (materialize_result).
+    - CSV is streamed from that parquet copy: DuckDB hands it over as Arrow
+      record batches and each batch is encoded and sent before the next one
+      is read. The scheduler slot is held only while the copy is written, so
+      a slow or stalled download never keeps queries out.
+"""
+import io
+import threading
+import weakref
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+import pyarrow.csv as pa_csv
+from botocore.exceptions import ClientError
+
+from db.data_table import open_data_table
+from db.duck_db import get_duckdb_connection
+from db.scheduler import duckdb_scheduler
+from observability.tracing import span
+from s3.client import get_s3_client
+
+EXPORT_BUCKET      = "raw-data"
+EXPORT_PREFIX      = "exports/"
+EXPORT_BATCH_ROWS  = 64 * 1024
+EXPORT_URL_TTL_S   = 3600
+
+# Striped by result_id: one writer per export object in this process.
+_write_locks = [threading.Lock() for _ in range(64)]
+
+
+def _batches(con, sql: str):
+    result = con.execute(sql)
+    # to_arrow_reader replaced fetch_record_batch in newer DuckDB releases.
+    if hasattr(result, "to_arrow_reader"):
+        return result.to_arrow_reader(EXPORT_BATCH_ROWS)
+    return result.fetch_record_batch(EXPORT_BATCH_ROWS)
+
+
+def stream_csv(source: Mapping[str, Any], sql: str, result_id: str, client: str) -> Iterator[bytes]:
+    """
+    Writes (or reuses) the result's parquet copy and returns its CSV chunks,
+    one Arrow batch at a time (header first). The query runs here, so errors
+    (Saturated included) surface before any byte is sent.
+    """
+    url = _exported(source, sql, result_id, client)
+    con = get_duckdb_connection()
+    try:
+        with span("export.csv", stage="export"):
+            reader = _batches(con, f"SELECT * FROM read_parquet('{url}')")
+    except Exception:
+        con.close()
+        raise
+    chunks = _csv_chunks(reader, con)
+    # A stream dropped before its first chunk never runs its finally.
+    weakref.finalize(chunks, con.close)
+    return chunks
+
+
+def _csv_chunks(reader, con) -> Iterator[bytes]:
+    # Each chunk may be pulled from a different threadpool thread: no span in here.
+    rows = 0
+    try:
+        header = True
+        for batch in reader:
+            sink = io.BytesIO()
+            pa_csv.write_csv(batch, sink, write_options=pa_csv.WriteOptions(include_header=header))
+            header = False
+            rows += batch.num_rows
+            yield sink.getvalue()
+        if header:
+            # Empty result: still a valid CSV with its header row.
+            sink = io.BytesIO()
+            pa_csv.write_csv(reader.schema.empty_table(), sink)
+            yield sink.getvalue()
+    finally:
+        con.close()
+        print(f"📤 [Export] Streamed {rows:,} rows as CSV")
+
+
+def _key(result_id: str) -> str:
+    return f"{EXPORT_PREFIX}{result_id}.parquet"
+
+
+def _exported_size(s3, key: str) -> Optional[int]:
+    try:
+        return s3.head_object(Bucket=EXPORT_BUCKET, Key=key)["ContentLength"]
+    except ClientError:
+        return None
+
+
+def materialize_result(con, sql: str, result_id: str) -> str:
+    """
+    URL of the result's parquet copy on S3, written with `con` on first use (the
+    caller holds a scheduler slot). Its row order is fixed once written.
+    """
+    key = _key(result_id)
+    s3 = get_s3_client()
+    with _write_locks[hash(result_id) % len(_write_locks)]:
+        if _exported_size(s3, key) is None:
+            with span("export.parquet", stage="export"):
+                con.execute(f"COPY ({sql}) TO 's3://{EXPORT_BUCKET}/{key}' (FORMAT parquet, COMPRESSION zstd)")
+            print(f"📤 [Export] Wrote {_exported_size(s3, key) or 0:,} bytes of parquet to s3://{EXPORT_BUCKET}/{key}")
+    return f"s3://{EXPORT_BUCKET}/{key}"
+
+
+def _exported(source: Mapping[str, Any], sql: str, result_id: str, client: str) -> str:
+    """materialize_result in a scheduler slot for `client`, taken only when the copy is missing."""
+    if _exported_size(get_s3_client(), _key(result_id)) is None:
+        with duckdb_scheduler.slot(client, source.get("source_id")):
+            con = open_data_table(source)
+            try:
+                materialize_result(con, sql, result_id)
+            finally:
+                con.close()
+    return f"s3://{EXPORT_BUCKET}/{_key(result_id)}"
+
+
+def export_parquet(source: Mapping[str, Any], sql: str, result_id: str, client: str) -> Dict[str, Any]:
+    """Writes the full result to S3 as parquet (or reuses an earlier export); returns a presigned download."""
+    key = _key(result_id)
+    s3 = get_s3_client()
+    size = _exported_size(s3, key)
+    reused = size is not None
+    if not reused:
+        _exported(source, sql, result_id, client)
+        size = _exported_size(s3, key)
+
+    url = s3.generate_presigned_url(
+        "get_object", Params={"Bucket": EXPORT_BUCKET, "Key": key}, ExpiresIn=EXPORT_URL_TTL_S,
+    )
+    return {"url": url, "expires_in": EXPORT_URL_TTL_S, "bytes": size, "reused": reused}
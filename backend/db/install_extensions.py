@@ -0,0 +1,21 @@
+"""
+Installs the DuckDB extensions the backend loads, so a new worker never downloads
+them on its first query. Run once while building the image (after pip install):
+
+    python -m db.install_extensions
+"""
+import duckdb
+
+from db.duck_db import EXTENSIONS
+
+
+def main() -> None:
+    con = duckdb.connect(database=':memory:')
+    for name in EXTENSIONS:
+        con.execute(f"INSTALL {name};")
+        print(f"🦆 [DuckDB] Installed {name}")
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
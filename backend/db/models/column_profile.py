@@ -0,0 +1,28 @@
+import uuid
+from typing import Dict, Optional, Any, List
+from pgvector.sqlalchemy import Vector
+from sqlmodel import SQLModel, Field
+from sqlalchemy import JSON, Column
+
+from agent.embeddings import EMBEDDING_DIM
+
+
+class ColumnProfile(SQLModel, table=True):
+    """Per-column stats + embedding for an artifact, used to build compact schema prompts."""
+    __tablename__ = "column_profiles"
+    id: uuid.UUID = Field(
+        primary_key=True,
+        default_factory=uuid.uuid4
+    )
+    artifact_url: str = Field(..., index=True, description="Parquet artifact (or db:<source>/<table> key) the column belongs to")
+    position: int = Field(..., description="Ordinal position of the column in the artifact")
+    column_name: str
+    column_type: str
+    stats: Dict[str, Any] = Field(
+        default_factory=dict,
+        sa_column=Column(JSON)
+    )
+    embedding: Optional[List[float]] = Field(
+        None,
+        sa_column=Column(Vector(EMBEDDING_DIM), nullable=True)
+    )
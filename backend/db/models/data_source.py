@@ -1,5 +1,5 @@
 import uuid
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 from sqlmodel import SQLModel, Field
 from sqlalchemy import JSON, Column
 from schemas.uploads import SourceType
@@ -15,6 +15,16 @@ class DataSource(SQLModel, table=True):
     description: Optional[str] = Field(None, description="Natural language description")
     source_type: SourceType
     artifact_url: Optional[str] = None
+    artifact_parts: List[str] = Field(
+        default_factory=list,
+        sa_column=Column(JSON),
+        description="All parquet parts of the dataset; artifact_url is the first one"
+    )
+    stats: Dict[str, Any] = Field(
+        default_factory=dict,
+        sa_column=Column(JSON),
+        description="Catalog stats (row_count, size_bytes, per-column min/max/nulls, watermark)"
+    )
     ingestion_config: Dict[str, Any] = Field(
         default_factory=dict,
         sa_column=Column(JSON)
@@ -0,0 +1,40 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional, Any, List
+from pgvector.sqlalchemy import Vector
+from sqlmodel import SQLModel, Field
+from sqlalchemy import JSON, Column, Index
+
+from agent.embeddings import EMBEDDING_DIM
+
+
+class QuestionCacheEntry(SQLModel, table=True):
+    """A previously answered (artifact, question) pair and the blocks it produced."""
+    __tablename__ = "question_cache"
+    __table_args__ = (
+        # HNSW keeps nearest-neighbour lookups sub-millisecond as the cache grows.
+        Index(
+            "ix_question_cache_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
+    id: uuid.UUID = Field(
+        primary_key=True,
+        default_factory=uuid.uuid4
+    )
+    artifact_url: str = Field(..., index=True, description="Content-hash artifact the answer was computed on")
+    question: str
+    sql: Optional[str] = None
+    blocks: List[Dict[str, Any]] = Field(
+        default_factory=list,
+        sa_column=Column(JSON)
+    )
+    embedding: List[float] = Field(
+        ...,
+        sa_column=Column(Vector(EMBEDDING_DIM), nullable=False)
+    )
+    hit_count: int = 0
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
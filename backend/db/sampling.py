@@ -0,0 +1,110 @@
+"""
+Pre-built samples for approximate queries.
+
+Large datasets get a stratified Bernoulli sample at ingest: every row is kept with
+a known probability (higher for small groups of the strata column, so rare
+groups still show up) and stored with `_sample_weight = 1 / probability`.
+Weighted aggregates over the sample are unbiased estimates of the full-data
+aggregates, and since each row carries its own weight, samples of appended
+parts can simply be added as further sample parts.
+"""
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+APPROX_MIN_ROWS    = 1_000_000   # Smaller datasets are not sampled; exact scans are already fast
+SAMPLE_TARGET_ROWS = 100_000
+STRATUM_MIN_ROWS   = 500         # Each group keeps at least this many rows (or all of its rows)
+MAX_STRATA         = 200
+SAMPLE_WEIGHT      = "_sample_weight"
+
+_STRATA_TYPES = ("VARCHAR",)
+_RESOLUTION   = 1_000_000        # Granularity of the hash-based keep/drop decision
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _numbered(parquet_path: str) -> str:
+    safe_path = parquet_path.replace("'", "''")
+    return f"read_parquet('{safe_path}', file_row_number=true)"
+
+
+def _choose_strata_column(con, relation: str, stats: Dict[str, Any]) -> Optional[str]:
+    """Lowest-cardinality categorical column with 2..MAX_STRATA values (one columnar pass)."""
+    candidates = [name for name, col in stats["columns"].items() if col["type"] in _STRATA_TYPES]
+    if not candidates:
+        return None
+    counts = con.execute(
+        "SELECT " + ", ".join(f"approx_count_distinct({_q(c)})" for c in candidates) + f" FROM {relation}"
+    ).fetchone()
+    eligible = [(n, c) for c, n in zip(candidates, counts) if 2 <= n <= MAX_STRATA]
+    return min(eligible)[1] if eligible else None
+
+
+def _write_sample(con, relation: str, out_path: str, strata_column: Optional[str],
+                  strata_rates: List[list], base_rate: float) -> int:
+    con.execute("CREATE OR REPLACE TEMP TABLE sample_rates (k VARCHAR, rate DOUBLE)")
+    if strata_rates:
+        con.executemany("INSERT INTO sample_rates VALUES (?, ?)", strata_rates)
+    rate = (
+        f"coalesce((SELECT rate FROM sample_rates r WHERE r.k IS NOT DISTINCT FROM t.{_q(strata_column)}::VARCHAR), {base_rate})"
+        if strata_column else str(base_rate)
+    )
+    # hash(row number) instead of random(): the same file always yields the same sample.
+    safe_out = out_path.replace("'", "''")
+    con.execute(f"""
+        COPY (
+            SELECT * EXCLUDE (file_row_number, _rate), 1.0 / _rate AS {SAMPLE_WEIGHT}
+            FROM (SELECT *, {rate} AS _rate FROM {relation} t)
+            WHERE hash(file_row_number) % {_RESOLUTION} < _rate * {_RESOLUTION}
+        ) TO '{safe_out}' (FORMAT 'PARQUET', CODEC 'SNAPPY')
+    """)
+    return con.execute(f"SELECT count(*) FROM read_parquet('{safe_out}')").fetchone()[0]
+
+
+def build_sample(parquet_path: str, out_path: str, stats: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Writes the sample of a freshly ingested dataset to `out_path`.
+    Returns the sample metadata (without the S3 part, added by the caller),
+    or None when the dataset is too small to be worth sampling.
+    """
+    row_count = stats.get("row_count") or 0
+    if row_count < APPROX_MIN_ROWS:
+        return None
+
+    relation = _numbered(parquet_path)
+    base_rate = SAMPLE_TARGET_ROWS / row_count
+    con = duckdb.connect(database=':memory:')
+    try:
+        strata_column = _choose_strata_column(con, relation, stats)
+        strata_rates = []
+        if strata_column:
+            groups = con.execute(f"SELECT {_q(strata_column)}::VARCHAR, count(*) FROM {relation} GROUP BY 1").fetchall()
+            strata_rates = [[k, min(1.0, max(base_rate, STRATUM_MIN_ROWS / n))] for k, n in groups]
+        rows = _write_sample(con, relation, out_path, strata_column, strata_rates, base_rate)
+    finally:
+        con.close()
+
+    print(f"🎯 [Sample] {rows:,} of {row_count:,} rows sampled"
+          + (f", stratified by {strata_column}" if strata_column else ""))
+    return {
+        "rows":          rows,
+        "base_rows":     row_count,
+        "base_rate":     base_rate,
+        "strata_column": strata_column,
+        "strata_rates":  strata_rates,
+        "parts":         [],
+    }
+
+
+def sample_part(parquet_path: str, out_path: str, sample: Dict[str, Any]) -> int:
+    """Samples an appended part with the dataset's existing rates; returns the rows kept."""
+    relation = _numbered(parquet_path)
+    con = duckdb.connect(database=':memory:')
+    try:
+        return _write_sample(con, relation, out_path, sample.get("strata_column"),
+                             sample.get("strata_rates") or [], sample["base_rate"])
+    finally:
+        con.close()
@@ -0,0 +1,222 @@
+"""
+Admission control for heavy DuckDB work: chat queries (the SQL executor and the
+sandbox's data query) and ingestion conversions.
+
+Every chat used to run its query the moment it arrived, so one user firing
+large scans took every core and everyone else's answers stalled behind them.
+Work now takes a slot first:
+
+    - at most DUCKDB_MAX_QUERIES run at once. They share the database's thread
+      pool (DUCKDB_THREADS; DuckDB cannot cap threads per query), so each gets
+      about DUCKDB_THREADS / running threads and never fewer than
+      DUCKDB_THREADS / DUCKDB_MAX_QUERIES.
+    - conversions hold at most INGEST_MAX_SLOTS of those, so uploads cannot
+      starve chat
+    - a freed slot goes to the waiting client with the fewest running queries,
+      then to the one served least recently, then to the least busy dataset,
+      then to the oldest request
+    - when saturated, callers fail fast with Saturated (a 429 with Retry-After):
+      a full queue, a client with CLIENT_MAX_QUEUED already waiting, or no slot
+      within QUEUE_TIMEOUT_S
+
+Sync callers (LangGraph's worker threads) and async callers (ingest routes) share the queue.
+"""
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Optional
+
+from cluster.forwarding import client_identity
+from db.duck_db import DUCKDB_THREADS
+from observability.metrics import (DUCKDB_ACTIVE, DUCKDB_QUEUE_DEPTH, DUCKDB_QUEUE_WAIT, DUCKDB_REJECTED,
+                                   DUCKDB_THREADS_PER_QUERY)
+
+DUCKDB_MAX_QUERIES  = int(os.getenv("DUCKDB_MAX_QUERIES", str(max(2, DUCKDB_THREADS // 2))))
+INGEST_MAX_SLOTS    = int(os.getenv("INGEST_MAX_SLOTS", str(max(1, DUCKDB_MAX_QUERIES // 2))))
+MAX_QUEUED          = int(os.getenv("DUCKDB_MAX_QUEUED", str(4 * DUCKDB_MAX_QUERIES)))
+CLIENT_MAX_QUEUED   = int(os.getenv("DUCKDB_CLIENT_MAX_QUEUED", "4"))
+QUEUE_TIMEOUT_S     = float(os.getenv("DUCKDB_QUEUE_TIMEOUT_S", "20"))
+MAX_TRACKED_CLIENTS = 10_000   # Service history kept for tie-breaks, reset beyond this
+KINDS               = ("query", "ingest")
+
+
+class Saturated(Exception):
+    """No slot for this work now; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Too much data work in progress ({reason.replace('_', ' ')}). "
+                         f"Retry in {retry_after}s.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_key(request) -> str:
+    """Fairness key of an HTTP request: its X-User-Id header, else the caller's address (see cluster/forwarding.py)."""
+    return client_identity(request)
+
+
+class _Ticket:
+    """A queued piece of work; granted through an Event (sync caller) or a Future on the caller's loop."""
+
+    def __init__(self, client: str, dataset: str, kind: str, seq: int, loop=None):
+        self.client = client
+        self.dataset = dataset
+        self.kind = kind
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+
+class DuckDBScheduler:
+    def __init__(self, max_active: int, ingest_slots: int, max_queued: int, client_max_queued: int,
+                 timeout_s: float):
+        self.max_active = max_active
+        self.ingest_slots = ingest_slots
+        self.max_queued = max_queued
+        self.client_max_queued = client_max_queued
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._waiting: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._by_kind = Counter()
+        self._by_client = Counter()
+        self._by_dataset = Counter()
+        self._last_served = {}   # client → grant number of its latest slot
+        self._grants = itertools.count(1)
+        self._avg_run_s = 1.0    # Moving average of slot hold time, for Retry-After
+
+    # ── Admission ────────────────────────────────────────────────────────────
+    def _running(self) -> int:
+        return sum(self._by_kind.values())
+
+    def _dispatch(self) -> None:
+        """Grants slots to the fairest waiting tickets. Caller holds the lock."""
+        while self._waiting and self._running() < self.max_active:
+            eligible = [t for t in self._waiting if t.kind != "ingest" or self._by_kind["ingest"] < self.ingest_slots]
+            if not eligible:
+                break
+            ticket = min(eligible, key=lambda t: (self._by_client[t.client], self._last_served.get(t.client, 0),
+                                                  self._by_dataset[t.dataset], t.seq))
+            self._waiting.remove(ticket)
+            if len(self._last_served) > MAX_TRACKED_CLIENTS:
+                self._last_served.clear()
+            self._last_served[ticket.client] = next(self._grants)
+            self._by_kind[ticket.kind] += 1
+            self._by_client[ticket.client] += 1
+            self._by_dataset[ticket.dataset] += 1
+            DUCKDB_QUEUE_WAIT.labels(ticket.kind).observe(time.monotonic() - ticket.enqueued)
+            ticket.grant()
+        self._publish()
+
+    def _publish(self) -> None:
+        for kind in KINDS:
+            DUCKDB_QUEUE_DEPTH.labels(kind).set(sum(t.kind == kind for t in self._waiting))
+            DUCKDB_ACTIVE.labels(kind).set(self._by_kind[kind])
+        DUCKDB_THREADS_PER_QUERY.set(DUCKDB_THREADS / max(1, self._running()))
+
+    def _retry_after(self) -> int:
+        return max(1, round(self._avg_run_s * (len(self._waiting) + 1) / self.max_active))
+
+    def _reject_reason(self, client: str) -> Optional[str]:
+        """Why new work from `client` would be turned away right now, if it would. Caller holds the lock."""
+        if self._running() < self.max_active and not self._waiting:
+            return None
+        if len(self._waiting) >= self.max_queued:
+            return "queue_full"
+        if sum(t.client == client for t in self._waiting) >= self.client_max_queued:
+            return "client_queue_full"
+        return None
+
+    def _reject(self, reason: str) -> Saturated:
+        DUCKDB_REJECTED.labels(reason).inc()
+        print(f"🚦 [Scheduler] Rejected DuckDB work: {reason} ({len(self._waiting)} queued, {self._running()} running)")
+        return Saturated(reason, self._retry_after())
+
+    def check(self, client: str) -> None:
+        """Fails fast, before a chat spends LLM calls, when its query would be turned away."""
+        with self._lock:
+            reason = self._reject_reason(client)
+            if reason:
+                raise self._reject(reason)
+
+    def _enqueue(self, client: str, dataset: Optional[str], kind: str, loop=None) -> _Ticket:
+        with self._lock:
+            reason = self._reject_reason(client)
+            if reason:
+                raise self._reject(reason)
+            ticket = _Ticket(client, dataset or "", kind, next(self._seq), loop)
+            self._waiting.append(ticket)
+            self._dispatch()
+        return ticket
+
+    def _abandon(self, ticket: _Ticket) -> bool:
+        """Drops a ticket that stopped waiting; False when it was granted meanwhile (it owns a slot)."""
+        with self._lock:
+            if ticket.granted:
+                return False
+            self._waiting.remove(ticket)
+            self._publish()
+            return True
+
+    def _release(self, ticket: _Ticket, held_s: float) -> None:
+        with self._lock:
+            self._by_kind[ticket.kind] -= 1
+            self._by_client[ticket.client] -= 1
+            self._by_dataset[ticket.dataset] -= 1
+            self._by_client += Counter()    # Drops clients / datasets at zero
+            self._by_dataset += Counter()
+            self._avg_run_s = 0.8 * self._avg_run_s + 0.2 * held_s
+            self._dispatch()
+
+    def _timed_out(self) -> Saturated:
+        with self._lock:
+            return self._reject("timeout")
+
+    # ── Slots ────────────────────────────────────────────────────────────────
+    @contextmanager
+    def slot(self, client: str, dataset: Optional[str], kind: str = "query"):
+        """Holds an execution slot for the block (blocking; from worker threads)."""
+        ticket = self._enqueue(client, dataset, kind)
+        if not ticket.event.wait(self.timeout_s) and self._abandon(ticket):
+            raise self._timed_out()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(ticket, time.monotonic() - start)
+
+    @asynccontextmanager
+    async def aslot(self, client: str, dataset: Optional[str], kind: str = "ingest"):
+        """Holds an execution slot for the block, waiting without blocking the event loop."""
+        ticket = self._enqueue(client, dataset, kind, asyncio.get_running_loop())
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), self.timeout_s)
+        except asyncio.TimeoutError:
+            if self._abandon(ticket):
+                raise self._timed_out()
+        except asyncio.CancelledError:
+            if not self._abandon(ticket):
+                self._release(ticket, 0.0)
+            raise
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(ticket, time.monotonic() - start)
+
+
+duckdb_scheduler = DuckDBScheduler(DUCKDB_MAX_QUERIES, INGEST_MAX_SLOTS, MAX_QUEUED, CLIENT_MAX_QUEUED, QUEUE_TIMEOUT_S)
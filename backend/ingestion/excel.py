@@ -0,0 +1,219 @@
+"""
+Streaming Excel → parquet conversion.
+
+openpyxl's read-only mode parses the sheet XML lazily, so rows are pulled in
+bounded batches and appended to a parquet file as row groups; memory stays
+around one batch regardless of sheet size. Each sheet becomes its own table,
+and sheets of one workbook are converted in parallel worker processes
+(openpyxl is pure Python, so threads would serialize on the GIL).
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXCEL_BATCH_ROWS  = 10_000   # Rows held in memory per sheet before they are flushed as a row group
+MAX_SHEET_WORKERS = 4        # Worker processes shared by all conversions
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _worker_count() -> int:
+    return min(MAX_SHEET_WORKERS, os.cpu_count() or 1)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process has running threads (uvicorn, DuckDB).
+            _pool = ProcessPoolExecutor(
+                max_workers=_worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def list_sheets(path: str) -> List[str]:
+    """Worksheet names from the workbook part alone (chartsheets skipped, no sheet XML read)."""
+    # openpyxl is imported here, not at module level: only Excel uploads need it.
+    from openpyxl.reader.excel import ExcelReader
+
+    reader = ExcelReader(path, read_only=True)
+    try:
+        reader.read_manifest()
+        reader.read_workbook()
+        return [sheet.name for sheet, rel in reader.parser.find_sheets() if "chartsheet" not in rel.Type]
+    finally:
+        reader.archive.close()
+
+
+def _column_names(header: tuple) -> List[str]:
+    """Header cells → unique, non-empty column names."""
+    names, seen = [], {}
+    for i, cell in enumerate(header):
+        name = str(cell).strip() if cell is not None and str(cell).strip() else f"column_{i + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _to_array(values: List[Any], type_: Optional[pa.DataType] = None) -> pa.Array:
+    """Typed column for one batch; a column mixing kinds (numbers and text) becomes text."""
+    try:
+        return pa.array(values, type=type_)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+        if type_ is not None:
+            raise
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+class _SegmentedWriter:
+    """
+    Appends batches to a parquet file. The schema is fixed by the first batch; when
+    a later batch does not fit it (e.g. a column of ints turns into text halfway down
+    the sheet) a new segment file is started, and segments are merged at the end.
+    """
+
+    def __init__(self, out_path: str, names: List[str]):
+        self.out_path = out_path
+        self.names = names
+        self.segments: List[str] = []
+        self.writer: Optional[pq.ParquetWriter] = None
+        self.rows = 0
+
+    def _batch(self, columns: List[List[Any]]) -> pa.Table:
+        if self.writer is not None:
+            try:
+                schema = self.writer.schema
+                return pa.Table.from_arrays(
+                    [_to_array(col, schema.field(i).type) for i, col in enumerate(columns)], schema=schema
+                )
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+                self.writer.close()
+                self.writer = None
+        return pa.Table.from_arrays([_to_array(col) for col in columns], names=self.names)
+
+    def write(self, rows: List[tuple]) -> None:
+        columns = [list(col) for col in zip(*rows)]
+        table = self._batch(columns)
+        if self.writer is None:
+            segment = f"{self.out_path}.seg{len(self.segments)}"
+            self.segments.append(segment)
+            self.writer = pq.ParquetWriter(segment, table.schema, compression="snappy")
+        self.writer.write_table(table)
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        if not self.segments:
+            return
+        if len(self.segments) == 1:
+            os.replace(self.segments[0], self.out_path)
+            return
+        # DuckDB unifies the segment schemas (int + double → double, anything + text → text).
+        files = ", ".join("'" + s.replace("'", "''") + "'" for s in self.segments)
+        safe_out = self.out_path.replace("'", "''")
+        con = duckdb.connect(database=':memory:')
+        try:
+            con.execute(f"COPY (SELECT * FROM read_parquet([{files}], union_by_name=true)) TO '{safe_out}' (FORMAT 'PARQUET', CODEC 'SNAPPY')")
+        finally:
+            con.close()
+            for s in self.segments:
+                os.remove(s)
+
+
+def _convert_worksheet(ws, out_path: str, batch_rows: int) -> Dict[str, Any]:
+    rows = ws.iter_rows(values_only=True)
+
+    header = next((r for r in rows if any(v is not None for v in r)), None)
+    if header is None:
+        return {"sheet": ws.title, "path": None, "rows": 0}
+    names = _column_names(header)
+    width = len(names)
+
+    writer = _SegmentedWriter(out_path, names)
+    batch: List[tuple] = []
+    for row in rows:
+        if not any(v is not None for v in row):
+            continue
+        # Read-only rows are as long as the sheet's used range; normalize to the header.
+        row = tuple(row[:width]) + (None,) * (width - len(row))
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            writer.write(batch)
+            batch = []
+    if batch:
+        writer.write(batch)
+    writer.close()
+    if writer.rows == 0:      # header only
+        return {"sheet": ws.title, "path": None, "rows": 0}
+    return {"sheet": ws.title, "path": out_path, "rows": writer.rows}
+
+
+def convert_sheets(path: str, jobs: List[Tuple[Optional[str], str]], batch_rows: int = EXCEL_BATCH_ROWS) -> List[Dict[str, Any]]:
+    """
+    Streams each (sheet, out_path) job into parquet, opening the workbook once
+    (opening is not free: a sheet saved without a <dimension> tag is scanned to size it).
+    A sheet of None means the first one. The first non-empty row is the header and
+    fully empty rows are skipped. Returns {"sheet", "path", "rows"} per job, with
+    path None for an empty sheet.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return [
+            _convert_worksheet(wb[sheet] if sheet else wb.worksheets[0], out_path, batch_rows)
+            for sheet, out_path in jobs
+        ]
+    finally:
+        wb.close()
+
+
+def convert_sheet(path: str, sheet: Optional[str], out_path: str, batch_rows: int = EXCEL_BATCH_ROWS) -> Dict[str, Any]:
+    """Streams one sheet (the first if `sheet` is None) into `out_path`."""
+    return convert_sheets(path, [(sheet, out_path)], batch_rows)[0]
+
+
+def convert_excel_to_parquet(path: str, sheets: Optional[List[str]] = None,
+                             batch_rows: int = EXCEL_BATCH_ROWS) -> List[Dict[str, Any]]:
+    """
+    Converts every sheet (or the named ones) into its own parquet file, in parallel.
+    Empty sheets are dropped. Returns [{"sheet", "path", "rows"}] in workbook order.
+    """
+    names = sheets or list_sheets(path)
+    outputs = [f"{path}.{i}.parquet" for i in range(len(names))]
+
+    futures = []
+    try:
+        if len(names) == 1 or _worker_count() == 1:
+            # Nothing to overlap: worker processes would only add startup and IPC cost.
+            results = convert_sheets(path, list(zip(names, outputs)), batch_rows)
+        else:
+            pool = _get_pool()
+            futures = [pool.submit(convert_sheet, path, name, out, batch_rows) for name, out in zip(names, outputs)]
+            results = [f.result() for f in futures]
+    except Exception:
+        # Sheets written before the failure must not be left in temp storage.
+        for f in futures:
+            f.cancel()
+        for out in outputs:
+            if os.path.exists(out):
+                os.remove(out)
+        raise
+
+    print(f"📗 [Excel] Converted {sum(1 for r in results if r['path'])}/{len(names)} sheets "
+          f"({sum(r['rows'] for r in results)} rows)")
+    return [r for r in results if r["path"]]
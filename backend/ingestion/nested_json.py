@@ -0,0 +1,156 @@
+"""
+JSON → parquet conversion with streaming, flattening and child tables.
+
+Options come from the dataset's `ingestion_config`:
+
+    json_format          "auto" (default), "newline_delimited" or "array".
+                         NDJSON is read line by line with bounded memory.
+    columns              {"name": "DUCKDB TYPE", ...} schema hints; when given,
+                         type inference (a sampling pass over the file) is skipped.
+    sample_size          Rows sampled for type inference (default DuckDB's; -1 = all).
+    maximum_object_size  Largest single JSON object in bytes (default 16 MB).
+    flatten              Depth to which nested objects become `parent_child`
+                         columns (default 3; 0 keeps STRUCT columns).
+    unnest               List columns (by flattened name) moved into child tables,
+                         one row per element, linked by `id_column` or `_row_id`.
+    id_column            Column identifying a parent row in child tables.
+"""
+import os
+import tempfile
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import duckdb
+
+JSON_FORMATS          = ("auto", "newline_delimited", "array")
+DEFAULT_FLATTEN_DEPTH = 3
+ROW_ID_COLUMN         = "_row_id"
+INGEST_MEMORY_LIMIT   = os.getenv("INGEST_MEMORY_LIMIT", "1GB")   # DuckDB spills to disk beyond this
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _lit(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _connect() -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect(database=':memory:')
+    con.execute(f"SET memory_limit = {_lit(INGEST_MEMORY_LIMIT)}")
+    con.execute(f"SET temp_directory = {_lit(os.path.join(tempfile.gettempdir(), 'duckdb_ingest'))}")
+    # Row order is not meaningful for analytics tables; not preserving it lets COPY stream.
+    con.execute("SET preserve_insertion_order = false")
+    return con
+
+
+def read_json_expr(path: str, config: Mapping[str, Any]) -> str:
+    """The read_json(...) call for a file under the given ingestion options."""
+    fmt = config.get("json_format") or "auto"
+    if fmt not in JSON_FORMATS:
+        raise ValueError(f"Unknown json_format {fmt!r}; expected one of {JSON_FORMATS}")
+
+    options = [_lit(path), f"format={_lit(fmt)}"]
+    if config.get("columns"):
+        hints = ", ".join(f"{_lit(name)}: {_lit(ctype)}" for name, ctype in config["columns"].items())
+        options += [f"columns={{{hints}}}", "auto_detect=false"]
+    elif config.get("sample_size"):
+        options.append(f"sample_size={int(config['sample_size'])}")
+    if config.get("maximum_object_size"):
+        options.append(f"maximum_object_size={int(config['maximum_object_size'])}")
+    return f"read_json({', '.join(options)})"
+
+
+def _flatten(expr: str, path: List[str], type_, depth: int) -> List[Tuple[str, str, Any]]:
+    """(expression, alias, type) leaves of a column, expanding STRUCTs up to `depth` levels."""
+    if type_.id == "struct" and depth > 0 and type_.children:
+        leaves = []
+        for child_name, child_type in type_.children:
+            leaves += _flatten(f"{expr}.{_q(child_name)}", path + [child_name], child_type, depth - 1)
+        return leaves
+    return [(expr, "_".join(path), type_)]
+
+
+def flattened_columns(con, relation_sql: str, depth: int) -> List[Tuple[str, str, Any]]:
+    """Flattened (expression, alias, type) list for every column of a relation; aliases made unique."""
+    relation = con.sql(relation_sql)
+    leaves = []
+    for name, type_ in zip(relation.columns, relation.dtypes):
+        leaves += _flatten(_q(name), [name], type_, depth)
+
+    seen: Dict[str, int] = {}
+    unique = []
+    for expr, alias, type_ in leaves:
+        if alias in seen:
+            seen[alias] += 1
+            alias = f"{alias}_{seen[alias]}"
+        else:
+            seen[alias] = 0
+        unique.append((expr, alias, type_))
+    return unique
+
+
+def _select_list(columns: List[Tuple[str, str, Any]]) -> str:
+    return ", ".join(f"{expr} AS {_q(alias)}" for expr, alias, _ in columns)
+
+
+def _copy(con, select_sql: str, out_path: str) -> None:
+    con.execute(f"COPY ({select_sql}) TO {_lit(out_path)} (FORMAT 'PARQUET', CODEC 'SNAPPY')")
+
+
+def convert_json_to_parquet(path: str, config: Optional[Mapping[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Converts a JSON / NDJSON file into parquet: one main table, plus one child table
+    per `unnest` column. Returns [{"table", "path"}] with table None for the main one.
+    The file is parsed once; with child tables the parse goes to a staging parquet
+    that every table is then cut from.
+    """
+    config = config or {}
+    depth = int(config.get("flatten", DEFAULT_FLATTEN_DEPTH))
+    unnest = list(config.get("unnest") or [])
+    source = read_json_expr(path, config)
+    main_path = path + ".parquet"
+
+    con = _connect()
+    staging = None
+    try:
+        columns = flattened_columns(con, f"SELECT * FROM {source}", depth)
+        if not unnest:
+            _copy(con, f"SELECT {_select_list(columns)} FROM {source}", main_path)
+            return [{"table": None, "path": main_path}]
+
+        aliases = {alias for _, alias, _ in columns}
+        missing = [c for c in unnest if c not in aliases]
+        if missing:
+            raise ValueError(f"unnest columns not found: {missing}; available: {sorted(aliases)}")
+        id_column = config.get("id_column") or ROW_ID_COLUMN
+        if id_column != ROW_ID_COLUMN and id_column not in aliases:
+            raise ValueError(f"id_column {id_column!r} not found")
+
+        staging = path + ".staging.parquet"
+        row_id = f"row_number() OVER () AS {_q(ROW_ID_COLUMN)}, " if id_column == ROW_ID_COLUMN else ""
+        _copy(con, f"SELECT {row_id}{_select_list(columns)} FROM {source}", staging)
+        staged = f"read_parquet({_lit(staging)})"
+
+        excluded = ", ".join(_q(c) for c in unnest)
+        _copy(con, f"SELECT * EXCLUDE ({excluded}) FROM {staged}", main_path)
+        tables = [{"table": None, "path": main_path}]
+
+        for column in unnest:
+            exploded = f"SELECT {_q(id_column)}, UNNEST({_q(column)}) AS {_q(column)} FROM {staged}"
+            child_columns = flattened_columns(con, exploded, depth)
+            child_path = f"{path}.{len(tables)}.parquet"
+            _copy(con, f"SELECT {_select_list(child_columns)} FROM ({exploded})", child_path)
+            tables.append({"table": column, "path": child_path})
+
+        print(f"🧩 [JSON] Split {os.path.basename(path)} into {len(tables)} tables (unnested {unnest})")
+        return tables
+    except Exception:
+        for p in [main_path] + [f"{path}.{i}.parquet" for i in range(1, len(unnest) + 1)]:
+            if os.path.exists(p):
+                os.remove(p)
+        raise
+    finally:
+        con.close()
+        if staging and os.path.exists(staging):
+            os.remove(staging)
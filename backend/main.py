@@ -1,16 +1,93 @@
+import time
+_IMPORT_START = time.perf_counter()
+
+import asyncio
+import re
+import uuid
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from agent.embeddings import embed_text
+from agent.sandbox_pool import get_sandbox_pool, shutdown_sandbox_pool
+from cluster import state as cluster_state
 from db.db import init_db
-from routes.chat_router import chat_router
+from db.duck_db import get_duckdb_connection
+from db.scheduler import Saturated
+from observability.metrics import REQUEST_LATENCY, STARTUP_SECONDS
+from observability.tracing import span
+from routes.browse import browse_router
+from routes.chat_router import chat_router, load_data_agent
 from routes.ingest import router
 from fastapi.middleware.cors import CORSMiddleware
 
+# Only FastAPI, the DB session and the ingest path are imported above; the agent
+# stack is loaded by _warm_up once the server is accepting connections.
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
+# Long-running ingest endpoints whose progress is recorded as a job (multi-worker mode).
+JOB_PATHS = re.compile(r"^/api/v1/(upload|mirror-table|data/[^/]+/(append|refresh))$")
+
+_startup_timings = {}
+_ready = False
+
+
+def _record(phase: str, seconds: float) -> None:
+    _startup_timings[phase] = round(seconds, 3)
+    STARTUP_SECONDS.labels(phase).set(seconds)
+
+
+def _timed(phase: str, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    _record(phase, time.perf_counter() - start)
+
+
+def _warm_duckdb() -> None:
+    get_duckdb_connection().close()
+
+
+async def _warm_up() -> None:
+    """
+    Loads, in parallel, everything the first chat would otherwise pay for. In
+    multi-worker mode the worker joins the gateway's ring only afterwards, so no
+    request is routed to a cold worker.
+    """
+    global _ready
+    phases = {
+        "agent":      load_data_agent,                  # LangGraph, LLM client, pandas, sqlglot; graph compiled
+        "duckdb":     _warm_duckdb,                     # Shared database, httpfs loaded, S3 secret created
+        "embeddings": lambda: embed_text("warm up"),    # Embedding model loaded, first inference run
+        "sandbox":    get_sandbox_pool,                 # Sandbox worker processes spawned
+    }
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_timed, phase, fn) for phase, fn in phases.items()), return_exceptions=True
+    )
+    for phase, result in zip(phases, results):
+        if isinstance(result, Exception):
+            # Not fatal: whatever failed to warm loads (or fails) on first use instead.
+            print(f"🚀 [Startup] Warming {phase} failed: {result}")
+    _record("total", time.perf_counter() - _IMPORT_START)
+    _ready = True
+    print(f"🚀 [Startup] Ready: {_startup_timings}")
+
+    if cluster_state.WORKER_URL:
+        await cluster_state.heartbeat_loop()
+
+
 @asynccontextmanager
 async def life_span(app: FastAPI):
     print("Starting application...")
+    _record("imports", IMPORT_SECONDS)
+    start = time.perf_counter()
     await init_db()
+    _record("init_db", time.perf_counter() - start)
+    warm_up = asyncio.create_task(_warm_up())
     yield
     print("Stopping application...")
+    warm_up.cancel()
+    await asyncio.gather(warm_up, return_exceptions=True)
+    shutdown_sandbox_pool()
 
 app = FastAPI(lifespan=life_span)
 
@@ -22,9 +99,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(Saturated)
+async def saturated(request: Request, exc: Saturated):
+    """DuckDB work turned away by the scheduler: a fast 429 the client can retry."""
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Root span + latency histogram for every request, labelled by route template."""
+    start = time.perf_counter()
+    with span(f"{request.method} {request.url.path}", stage="request") as s:
+        response = await call_next(request)
+        s.set_attribute("http.status_code", response.status_code)
+    route = request.scope.get("route")
+    # Unmatched paths (404 scans) share one label instead of minting a series per URL.
+    REQUEST_LATENCY.labels(getattr(route, "path", "unmatched")).observe(time.perf_counter() - start)
+    return response
+
+
+@app.middleware("http")
+async def track_jobs(request: Request, call_next):
+    """
+    Records ingest requests as jobs in Redis so any worker (or the gateway's
+    clients) can poll /api/v1/jobs/{id}. Clients may pick the id up front via X-Job-Id.
+    """
+    match = JOB_PATHS.match(request.url.path)
+    if request.method != "POST" or not match or not cluster_state.cluster_enabled():
+        return await call_next(request)
+
+    job_id = request.headers.get("x-job-id") or uuid.uuid4().hex
+    kind = match.group(2) or match.group(1)
+    await cluster_state.start_job(job_id, kind, path=request.url.path)
+    try:
+        response = await call_next(request)
+    except Exception as e:
+        await cluster_state.finish_job(job_id, "failed", error=str(e))
+        raise
+    await cluster_state.finish_job(job_id, "done" if response.status_code < 400 else "failed",
+                                   status_code=response.status_code)
+    response.headers["X-Job-Id"] = job_id
+    return response
+
+
 app.include_router(router, prefix="/api/v1")
 app.include_router(chat_router, prefix="/api/v1")
+app.include_router(browse_router, prefix="/api/v1")
 
 @app.get("/")
 async def run_root():
-    return {"message": "hello"}
\ No newline at end of file
+    return {"message": "hello"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the warm-up has finished, then the startup timings."""
+    if not _ready:
+        return Response(content='{"ready": false}', status_code=503, media_type="application/json")
+    return {"ready": True, "startup_seconds": _startup_timings}
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
@@ -0,0 +1,137 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets span cheap in-process work (ms) up to slow LLM / S3 scans (tens of seconds).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# One histogram for every traced span; "stage" is the node / subsystem name
+# (router, sql, sql_executor, llm, duckdb, postgres, serialization, ...).
+STAGE_LATENCY = Histogram(
+    "insights_stage_latency_seconds",
+    "Latency of a pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STARTUP_SECONDS = Gauge(
+    "insights_startup_seconds",
+    "Time spent per cold-start phase of this worker",
+    ["phase"],          # phase: imports, init_db, agent, duckdb, embeddings, sandbox, total
+)
+
+REQUEST_LATENCY = Histogram(
+    "insights_request_latency_seconds",
+    "End-to-end latency of an API request",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_TOKENS = Counter(
+    "insights_llm_tokens_total",
+    "Tokens consumed by LLM calls",
+    ["node", "kind"],   # kind: prompt | completion
+)
+
+DUCKDB_ROWS = Counter(
+    "insights_duckdb_rows_total",
+    "Rows processed by DuckDB queries",
+    ["kind"],           # kind: scanned | returned
+)
+
+DUCKDB_BYTES_READ = Counter(
+    "insights_duckdb_bytes_read_total",
+    "Bytes read by DuckDB (parquet on S3)",
+)
+
+PARQUET_METADATA_CACHE = Counter(
+    "insights_parquet_metadata_cache_total",
+    "Parquet files opened with their footer already cached in this process",
+    ["outcome"],             # outcome: hit | miss
+)
+
+DUCKDB_FILE_CACHE_READS = Counter(
+    "insights_duckdb_file_cache_reads_total",
+    "Parquet queries answered from cached byte ranges (hit) or fetching from S3 (miss)",
+    ["outcome"],             # outcome: hit | miss
+)
+
+DUCKDB_FILE_CACHE_BYTES = Gauge(
+    "insights_duckdb_file_cache_bytes",
+    "Bytes of remote parquet held in the shared DuckDB external file cache",
+)
+
+GATEWAY_REQUESTS = Counter(
+    "insights_gateway_requests_total",
+    "Requests proxied by the cluster gateway",
+    ["worker", "routing"],   # routing: affinity | any | failover
+)
+
+SQL_REPAIRS = Counter(
+    "insights_sql_repairs_total",
+    "Generated queries checked against the schema before running",
+    ["outcome"],             # outcome: valid | repaired | failed
+)
+
+LLM_CALLS_SAVED = Counter(
+    "insights_llm_calls_saved_total",
+    "LLM calls avoided by local shortcuts",
+    ["reason"],              # reason: sql_repair, chart_rules, insight_template
+)
+
+LLM_QUEUE_DEPTH = Gauge(
+    "insights_llm_queue_depth",
+    "LLM calls waiting for a slot or rate budget",
+)
+
+LLM_INFLIGHT = Gauge(
+    "insights_llm_inflight",
+    "LLM calls currently running against the provider",
+)
+
+LLM_QUEUE_WAIT = Histogram(
+    "insights_llm_queue_wait_seconds",
+    "Time an LLM call waited in the scheduler queue",
+    ["node"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_COALESCED = Counter(
+    "insights_llm_coalesced_total",
+    "LLM calls answered by an identical call already in flight",
+    ["node"],
+)
+
+LLM_RETRIES = Counter(
+    "insights_llm_retries_total",
+    "LLM calls retried by the scheduler",
+    ["reason"],              # reason: rate_limit | error
+)
+
+DUCKDB_QUEUE_DEPTH = Gauge(
+    "insights_duckdb_queue_depth",
+    "Heavy DuckDB work waiting for an execution slot",
+    ["kind"],                # kind: query | ingest
+)
+
+DUCKDB_ACTIVE = Gauge(
+    "insights_duckdb_active",
+    "Heavy DuckDB work currently holding an execution slot",
+    ["kind"],
+)
+
+DUCKDB_QUEUE_WAIT = Histogram(
+    "insights_duckdb_queue_wait_seconds",
+    "Time heavy DuckDB work waited for an execution slot",
+    ["kind"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DUCKDB_REJECTED = Counter(
+    "insights_duckdb_rejected_total",
+    "Heavy DuckDB work turned away with a 429",
+    ["reason"],              # reason: queue_full | client_queue_full | timeout
+)
+
+DUCKDB_THREADS_PER_QUERY = Gauge(
+    "insights_duckdb_threads_per_query",
+    "DuckDB threads available to each running query (shared pool / active slots)",
+)
@@ -0,0 +1,197 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Sequence
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.trace import Status, StatusCode
+
+from observability.metrics import (
+    DUCKDB_BYTES_READ,
+    DUCKDB_FILE_CACHE_READS,
+    DUCKDB_ROWS,
+    LLM_TOKENS,
+    STAGE_LATENCY,
+)
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file")          # console | file | none
+TRACE_FILE     = os.getenv("TRACE_FILE", "traces.jsonl")
+
+# Name of the graph node currently executing — lets LLM spans say who called them.
+current_node: ContextVar[Optional[str]] = ContextVar("current_node", default=None)
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends one JSON span per line — easy to grep or load into pandas locally."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        with self._lock, open(self.path, "a") as f:
+            for s in spans:
+                f.write(s.to_json(indent=None) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _build_provider() -> TracerProvider:
+    provider = TracerProvider(resource=Resource.create({"service.name": "insights-backend"}))
+    if TRACE_EXPORTER == "console":
+        provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+    elif TRACE_EXPORTER == "file":
+        provider.add_span_processor(BatchSpanProcessor(JsonLinesSpanExporter(TRACE_FILE)))
+    return provider
+
+
+trace.set_tracer_provider(_build_provider())
+tracer = trace.get_tracer("insights")
+
+
+@contextmanager
+def span(name: str, stage: Optional[str] = None, **attributes: Any):
+    """
+    Opens an OpenTelemetry span and records its duration in the
+    insights_stage_latency_seconds histogram under `stage` (defaults to name).
+    """
+    start = time.perf_counter()
+    with tracer.start_as_current_span(name, attributes=attributes) as s:
+        try:
+            yield s
+        except Exception as e:
+            s.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            STAGE_LATENCY.labels(stage or name).observe(time.perf_counter() - start)
+
+
+def traced_node(stage: str):
+    """Wraps a LangGraph node (sync or async) in a span named node.<stage>."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(state, *args, **kwargs):
+                token = current_node.set(stage)
+                try:
+                    with span(f"node.{stage}", stage=stage):
+                        return await fn(state, *args, **kwargs)
+                finally:
+                    current_node.reset(token)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(state, *args, **kwargs):
+            token = current_node.set(stage)
+            try:
+                with span(f"node.{stage}", stage=stage):
+                    return fn(state, *args, **kwargs)
+            finally:
+                current_node.reset(token)
+        return wrapper
+    return decorator
+
+
+def _reads_parquet(node: Dict[str, Any]) -> bool:
+    if node.get("operator_name") == "READ_PARQUET":
+        return True
+    return any(_reads_parquet(child) for child in node.get("children", []))
+
+
+def record_duckdb_stats(con, s) -> Dict[str, int]:
+    """
+    Reads DuckDB's profile of the last query on `con` (profiling must be enabled)
+    and attaches rows scanned / returned and bytes read to the span and counters.
+    """
+    try:
+        profile = json.loads(con.get_profiling_information(format="json"))
+    except Exception:
+        return {}
+
+    stats = {
+        "rows_scanned":  int(profile.get("cumulative_rows_scanned", 0) or 0),
+        "rows_returned": int(profile.get("rows_returned", 0) or 0),
+        "bytes_read":    int(profile.get("total_bytes_read", 0) or 0),
+    }
+    for key, value in stats.items():
+        s.set_attribute(f"duckdb.{key}", value)
+    DUCKDB_ROWS.labels("scanned").inc(stats["rows_scanned"])
+    DUCKDB_ROWS.labels("returned").inc(stats["rows_returned"])
+    DUCKDB_BYTES_READ.inc(stats["bytes_read"])
+    if _reads_parquet(profile):
+        # bytes_read only counts what was fetched; a query served from the shared file cache reads none.
+        DUCKDB_FILE_CACHE_READS.labels("miss" if stats["bytes_read"] else "hit").inc()
+    return stats
+
+
+class LLMTracingCallback(BaseCallbackHandler):
+    """LangChain callback that turns every chat-model call into an llm.call span."""
+
+    # Run in the caller's context so the span nests under the active node span.
+    run_inline = True
+
+    def __init__(self):
+        self._spans: Dict[UUID, Any] = {}
+        self._starts: Dict[UUID, float] = {}
+
+    def _start(self, run_id: UUID, serialized: Dict[str, Any]):
+        node = current_node.get() or "unknown"
+        model = (serialized or {}).get("kwargs", {}).get("model_name") or (serialized or {}).get("name", "")
+        self._spans[run_id] = tracer.start_span("llm.call", attributes={"llm.node": node, "llm.model": str(model)})
+        self._starts[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._start(run_id, serialized)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._start(run_id, serialized)
+
+    def _finish(self, run_id: UUID, error: Optional[BaseException] = None):
+        s = self._spans.pop(run_id, None)
+        started = self._starts.pop(run_id, None)
+        if started is not None:
+            STAGE_LATENCY.labels("llm").observe(time.perf_counter() - started)
+        if s is None:
+            return
+        if error is not None:
+            s.set_status(Status(StatusCode.ERROR, str(error)))
+        s.end()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        s = self._spans.get(run_id)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage and response.generations and response.generations[0]:
+            message = getattr(response.generations[0][0], "message", None)
+            meta = getattr(message, "usage_metadata", None) or {}
+            usage = {"prompt_tokens": meta.get("input_tokens", 0), "completion_tokens": meta.get("output_tokens", 0)}
+
+        prompt_tokens     = int(usage.get("prompt_tokens", 0) or 0)
+        completion_tokens = int(usage.get("completion_tokens", 0) or 0)
+        node = current_node.get() or "unknown"
+        LLM_TOKENS.labels(node, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(node, "completion").inc(completion_tokens)
+        if s is not None:
+            s.set_attribute("llm.prompt_tokens", prompt_tokens)
+            s.set_attribute("llm.completion_tokens", completion_tokens)
+        self._finish(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._finish(run_id, error)
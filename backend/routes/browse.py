@@ -0,0 +1,133 @@
+import asyncio
+import uuid
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from cluster import state as cluster_state
+from db.browse import PAGE_SIZE_DEFAULT, browse, parse_filters, result_entry, store_result
+from db.data_table import data_key, source_state
+from db.export import export_parquet, stream_csv
+from db.db import AsyncSessionLocal
+from db.models.data_source import DataSource
+from db.scheduler import client_key
+from observability.tracing import span
+
+browse_router = APIRouter()
+
+PREVIEW_ROWS = 50
+
+
+async def _get_source(source_id: str) -> DataSource:
+    try:
+        source_uuid = uuid.UUID(source_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid source_id")
+    async with AsyncSessionLocal() as session:
+        source = await session.get(DataSource, source_uuid)
+    if not source:
+        raise HTTPException(status_code=404, detail="Data source not found.")
+    return source
+
+
+async def _page(state: dict, **kwargs) -> dict:
+    """
+    Runs one page query off the event loop; bad columns / filters / cursors are
+    400s, a saturated scheduler a 429.
+    """
+    try:
+        kwargs["filters"] = parse_filters(kwargs.get("filters") or [])
+        with span("browse.page", stage="browse", **{"browse.result": bool(kwargs.get("sql"))}):
+            return await asyncio.to_thread(browse, state, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@browse_router.get("/dataset/{source_id}/preview")
+async def preview_dataset(source_id: str, request: Request, limit: int = PREVIEW_ROWS):
+    """First rows of a dataset, in the shape the frontend's preview panel reads."""
+    source = await _get_source(source_id)
+    page = await _page(source_state(source), limit=limit, client=client_key(request))
+    return {"display_name": source.dataset_name, **page}
+
+
+@browse_router.get("/dataset/{source_id}/rows")
+async def browse_dataset(
+    source_id: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    columns: List[str] = Query(default=[]),
+    sort: Optional[str] = None,
+    desc: bool = False,
+    filter: List[str] = Query(default=[], description="column:op[:value], op in eq ne lt le gt ge contains null notnull"),
+):
+    """
+    A page of the dataset. Pass the previous page's next_cursor to continue;
+    sort, filters and the column list must stay the same while paging.
+    """
+    source = await _get_source(source_id)
+    return await _page(
+        source_state(source), cursor=cursor, limit=limit, columns=columns or None,
+        sort=sort, descending=desc, filters=filter, client=client_key(request),
+    )
+
+
+async def _get_result(source_id: str, result_id: str) -> Tuple[dict, dict]:
+    """The source state and registry entry behind a chat answer's table (from any worker)."""
+    entry = result_entry(result_id)
+    if entry is None:
+        entry = await cluster_state.get_result(result_id)
+        if entry is not None:
+            store_result(result_id, entry)
+    state = source_state(await _get_source(source_id))
+    if entry is None or entry["source_id"] != state["source_id"]:
+        raise HTTPException(status_code=404, detail="Result not found or expired. Ask the question again.")
+    if data_key(state) != entry["data_key"]:
+        raise HTTPException(status_code=409, detail="The dataset changed since this answer. Ask the question again.")
+    return state, entry
+
+
+@browse_router.get("/dataset/{source_id}/results/{result_id}/rows")
+async def browse_result(
+    source_id: str,
+    result_id: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    columns: List[str] = Query(default=[]),
+    sort: Optional[str] = None,
+    desc: bool = False,
+    filter: List[str] = Query(default=[]),
+):
+    """A page of a chat answer's table (its `result_id`), from a parquet copy written on first use."""
+    state, entry = await _get_result(source_id, result_id)
+    return await _page(
+        state, sql=entry["sql"], result_id=result_id, total_rows=entry["total_rows"], cursor=cursor, limit=limit,
+        columns=columns or None, sort=sort, descending=desc, filters=filter, client=client_key(request),
+    )
+
+
+@browse_router.get("/dataset/{source_id}/results/{result_id}/export")
+async def export_result(source_id: str, result_id: str, request: Request, format: str = "csv"):
+    """
+    The complete result behind a chat answer's table, not just its first rows:
+    csv streams it as the download, parquet returns a presigned S3 URL.
+    """
+    if format not in ("csv", "parquet"):
+        raise HTTPException(status_code=400, detail="format must be csv or parquet")
+    state, entry = await _get_result(source_id, result_id)
+    if format == "parquet":
+        with span("export.result", stage="export", **{"export.format": format}):
+            return await asyncio.to_thread(export_parquet, state, entry["sql"], result_id, client_key(request))
+    try:
+        chunks = await asyncio.to_thread(stream_csv, state, entry["sql"], result_id, client_key(request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # A sync iterator: Starlette drains it in a threadpool, one Arrow batch per chunk.
+    return StreamingResponse(
+        chunks,
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="result-{result_id}.csv"'},
+    )
@@ -1,23 +1,78 @@
+import asyncio
+import json
 import uuid
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from langchain_core.messages import HumanMessage
 from pydantic import BaseModel
 
-from agent.graph import data_agent
+from agent import semantic_cache
+from cluster import state as cluster_state
+from db.browse import remember_result, result_entry
+from db.data_table import data_key, source_state
 from db.db import AsyncSessionLocal
 from db.models.data_source import DataSource
+from db.scheduler import Saturated, client_key, duckdb_scheduler
+from observability.tracing import span
 
 chat_router = APIRouter()
 
 class ChatRequest(BaseModel):
     message: str
+    use_cache: bool = True   # Load tests turn this off to exercise the full graph
+    approximate: bool = False   # Answer aggregates from the dataset's sample (large datasets only)
+    refine: bool = False        # With approximate: stream the exact table afterwards (NDJSON)
+
+
+def load_data_agent():
+    """
+    The compiled agent graph. Importing it loads LangGraph, LangChain, the LLM
+    client, pandas and sqlglot (seconds), so it is deferred: main warms it right
+    after startup, and a chat arriving before that waits off the event loop.
+    """
+    from agent.graph import data_agent
+    return data_agent
+
+
+async def _share_results(blocks: list) -> None:
+    """Publishes the queries behind exact tables, so any worker can page or export them."""
+    for block in blocks:
+        entry = result_entry(block["result_id"]) if block.get("result_id") else None
+        if entry:
+            await cluster_state.put_result(block["result_id"], entry)
+
+
+def _refinement_stream(first: dict, final_state: dict):
+    """NDJSON: the approximate answer now, then the exact table once the full scan finishes."""
+    async def stream():
+        yield json.dumps(jsonable_encoder(first)) + "\n"
+        from agent.nodes.sql_executor_node import execute_sql_node
+
+        try:
+            with span("agent.refine", stage="refine"):
+                exact = await asyncio.to_thread(execute_sql_node, {**final_state, "approximate": False})
+        except Saturated as e:
+            # Headers are already sent: report it in-stream, the approximate answer stands.
+            yield json.dumps({"refined": False, "error": str(e), "retry_after": e.retry_after}) + "\n"
+            return
+        if exact.get("error_trace"):
+            yield json.dumps({"refined": False, "error": exact["error_trace"]}) + "\n"
+            return
+        tables = [b for b in exact["ui_blocks"] if b.get("type") == "table"]
+        for block in tables:
+            block["warning"] = " ".join(w for w in ("Exact result (refined).", block.get("warning")) if w)
+        await _share_results(tables)
+        yield json.dumps(jsonable_encoder({"refined": True, "blocks": tables})) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 @chat_router.post("/chat")
 async def hello():
     return {"message": "Chat"}
 
 @chat_router.post("/chat/{source_id}")
-async def chat(source_id: str, request: ChatRequest):
+async def chat(source_id: str, request: ChatRequest, http_request: Request):
     print("source id ", source_id)
     async with AsyncSessionLocal() as session:
         try:
@@ -25,23 +80,72 @@ async def chat(source_id: str, request: ChatRequest):
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid source_id")
 
-        source = await session.get(DataSource, source_uuid)
+        with span("postgres.get_source", stage="postgres"):
+            source = await session.get(DataSource, source_uuid)
 
         if not source:
             raise HTTPException(status_code=404, detail="Data source not found.")
 
+    # Lets the gateway route this source's next requests to the worker that now has it warm.
+    await cluster_state.remember_source(source_id, cluster_state.affinity_key(source.artifact_url, source_id))
+
     initial_state = {
         "messages": [HumanMessage(content=request.message)],
         "dataset_name": source.dataset_name,
-        "artifact_url": source.artifact_url,
-        "source_type": source.source_type,
+        **source_state(source),
+        "approximate": request.approximate,
+        "client_id": client_key(http_request),
         "ui_blocks": []
     }
+    # Live DB sources change underneath us, so only parquet-backed data is cached.
+    cache_key = data_key(initial_state) if source.artifact_url else None
+
+    # ── Semantic cache: answer repeat questions without touching the graph ──
+    cached = None
+    if request.use_cache:
+        try:
+            with span("semantic_cache.lookup", stage="semantic_cache"):
+                cached = await semantic_cache.lookup(cache_key, request.message)
+        except Exception as e:
+            print(f"🗄️ [Semantic Cache] Lookup failed (non-fatal): {e}")
 
+    if cached:
+        # Result ids are per process and evicted: register the cached query afresh so its table pages.
+        blocks = [dict(b) for b in cached.blocks]
+        for block in blocks:
+            if block.get("result_id") and cached.sql:
+                block["result_id"] = remember_result(initial_state, cached.sql, block["total_rows"])
+        await _share_results(blocks)
+        return {"blocks": blocks, "cached": True}
+
+    # Turn the chat away now, before it spends LLM calls, if its query would be.
+    duckdb_scheduler.check(initial_state["client_id"])
     print(f"🚀 [API] Triggering agent for dataset: {source.dataset_name}")
 
-    final_state = await data_agent.ainvoke(initial_state)
+    data_agent = await asyncio.to_thread(load_data_agent)
+    with span("agent.invoke", stage="agent", **{"dataset.name": source.dataset_name}):
+        final_state = await data_agent.ainvoke(initial_state)
+    blocks = final_state.get("ui_blocks", [])
+    approximate = any(b.get("approximate") for b in blocks)
+    await _share_results(blocks)
+
+    # Only cache answers that actually ran SQL successfully — and exactly.
+    succeeded = (
+        final_state.get("current_code")
+        and not final_state.get("error_trace")
+        and final_state.get("attempt_count", 0) < 3
+    )
+    if succeeded and request.use_cache and not approximate:
+        try:
+            await semantic_cache.store(cache_key, request.message, final_state.get("current_code"), blocks)
+        except Exception as e:
+            print(f"🗄️ [Semantic Cache] Store failed (non-fatal): {e}")
+
+    if approximate and request.refine:
+        return _refinement_stream({"blocks": blocks, "cached": False, "approximate": True}, final_state)
 
     return {
-        "blocks": final_state.get("ui_blocks", [])
+        "blocks": blocks,
+        "cached": False,
+        "approximate": approximate,
     }
\ No newline at end of file
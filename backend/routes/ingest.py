@@ -1,17 +1,27 @@
+import asyncio
 import hashlib
 import os
 import shutil
 import uuid
 
 import duckdb
-import pandas as pd
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
 from botocore.exceptions import ClientError
 from sqlalchemy import select
 
+from agent import semantic_cache
+from agent.tools.schema_tool import roll_forward_profiles
+from cluster import state as cluster_state
+from db.catalog import merge_stats, parquet_stats
+from db.data_table import data_key, source_state
 from db.db import AsyncSessionLocal
+from db.federation import list_tables, mirror_table_to_parquet
 from db.models.data_source import DataSource
-from s3.client import s3_client
+from db.sampling import build_sample, sample_part
+from db.scheduler import Saturated, client_key, duckdb_scheduler
+from ingestion.excel import EXCEL_BATCH_ROWS, convert_excel_to_parquet, convert_sheet
+from ingestion.nested_json import ROW_ID_COLUMN, convert_json_to_parquet
+from s3.client import get_s3_client
 from schemas.uploads import DataIngestRequest, SourceType
 
 router = APIRouter()
@@ -26,17 +36,22 @@ def convert_csv_to_parquet(path: str, out: str):
         "read_csv('{p}', delim='|', header=true, strict_mode=false, ignore_errors=true)",
     ]
 
-    for expr in attempts:
-        try:
-            duckdb_con.execute(f"""
-                COPY (
-                  SELECT * FROM {expr.format(p=path)}
-                )
-                TO '{out}' (FORMAT 'PARQUET', CODEC 'SNAPPY')
-            """)
-            return
-        except Exception:
-            pass
+    # A cursor per conversion: uploads run in worker threads, and one connection must not be shared across them.
+    con = duckdb_con.cursor()
+    try:
+        for expr in attempts:
+            try:
+                con.execute(f"""
+                    COPY (
+                      SELECT * FROM {expr.format(p=path)}
+                    )
+                    TO '{out}' (FORMAT 'PARQUET', CODEC 'SNAPPY')
+                """)
+                return
+            except Exception:
+                pass
+    finally:
+        con.close()
 
     raise Exception("CSV parsing failed for all known dialects")
 
@@ -52,8 +67,10 @@ def save_upload_to_temp(file: UploadFile, filename: str) -> str:
     return temp_path
 
 
-def convert_to_parquet(source_path: str, source_type: SourceType) -> str:
+def convert_to_parquet(source_path: str, source_type: SourceType, config: dict = None) -> str:
+    """Converts a file into a single parquet table (for multi-table sources, the one `config` names)."""
     parquet_path = source_path + ".parquet"
+    config = config or {}
 
     if not os.path.exists(source_path):
         raise HTTPException(status_code=400, detail="File upload failed internally.")
@@ -67,14 +84,18 @@ def convert_to_parquet(source_path: str, source_type: SourceType) -> str:
             convert_csv_to_parquet(safe_path, safe_out)
 
         elif source_type == SourceType.JSON:
-            safe_path = source_path.replace("'", "''")
-            safe_out = parquet_path.replace("'", "''")
-            query = f"COPY (SELECT * FROM read_json_auto('{safe_path}')) TO '{safe_out}' (FORMAT 'PARQUET', CODEC 'SNAPPY')"
-            duckdb_con.execute(query)
+            # Main table, or the child table this dataset was unnested into.
+            tables = convert_json_to_parquet(source_path, config)
+            wanted = next(t for t in tables if t["table"] == config.get("child_table"))
+            for t in tables:
+                if t is not wanted:
+                    os.remove(t["path"])
+            os.replace(wanted["path"], parquet_path)
 
         elif source_type == SourceType.EXCEL:
-            df = pd.read_excel(source_path)
-            df.to_parquet(parquet_path, index=False)
+            # One sheet only (the dataset's own, for appends); uploads convert every sheet.
+            if not convert_sheet(source_path, config.get("sheet"), parquet_path)["path"]:
+                raise ValueError("Sheet has no data rows")
 
         return parquet_path
 
@@ -99,6 +120,7 @@ def process_ingestion(file_path: str, metadata: DataIngestRequest) -> str:
     remote_file_name = f"{sha256_hash.hexdigest()}.parquet"
     bucket_name = 'raw-data'
 
+    s3_client = get_s3_client()
     try:
         s3_client.head_bucket(Bucket=bucket_name)
     except ClientError:
@@ -115,6 +137,46 @@ def process_ingestion(file_path: str, metadata: DataIngestRequest) -> str:
     return remote_file_name
 
 
+def with_sample(parquet_path: str, stats: dict, metadata: DataIngestRequest) -> dict:
+    """Builds + uploads the approximate-query sample of a large dataset; returns stats including it."""
+    sample_path = parquet_path + ".sample.parquet"
+    try:
+        sample = build_sample(parquet_path, sample_path, stats)
+        if sample is None:
+            return stats
+        sample["parts"] = [process_ingestion(sample_path, metadata)]
+        return {**stats, "sample": sample}
+    except Exception as e:
+        # Approximate mode is optional; the dataset itself is fine without a sample.
+        print(f"🎯 [Sample] Sample build failed (non-fatal): {e}")
+        return stats
+    finally:
+        if os.path.exists(sample_path):
+            os.remove(sample_path)
+
+
+def duplicate_keys(parquet_path: str, column: str) -> int:
+    """Rows of a refresh delta whose watermark value another row of the delta also has."""
+    safe_path = parquet_path.replace("'", "''")
+    quoted = '"' + column.replace('"', '""') + '"'
+    with duckdb.connect() as con:
+        return con.execute(f"SELECT count({quoted}) - count(DISTINCT {quoted}) FROM read_parquet('{safe_path}')").fetchone()[0]
+
+
+def sample_appended_part(parquet_path: str, sample: dict, metadata: DataIngestRequest):
+    """Samples an appended part with the dataset's rates; returns (s3 part or None, rows), or None on failure."""
+    sample_path = parquet_path + ".sample.parquet"
+    try:
+        rows = sample_part(parquet_path, sample_path, sample)
+        return (process_ingestion(sample_path, metadata), rows) if rows else (None, 0)
+    except Exception as e:
+        print(f"🎯 [Sample] Part sample failed (non-fatal): {e}")
+        return None
+    finally:
+        if os.path.exists(sample_path):
+            os.remove(sample_path)
+
+
 @router.get("/data")
 async def get_all_sources():
     try:
@@ -135,8 +197,8 @@ async def get_all_sources():
                     "uploaded": source.created_at.strftime("%b %d, %Y") if hasattr(source,
                                                                                    'created_at') and source.created_at else "Recently",
                     "status": "Ready",
-                    "rows": "Unknown",  # We'll calculate these dynamically in the Python sandbox later
-                    "size": "--"
+                    "rows": (source.stats or {}).get("row_count", "Unknown"),
+                    "size": f"{source.stats['size_bytes'] / 1e6:.1f} MB" if (source.stats or {}).get("size_bytes") else "--"
                 }
                 for source in sources
             ]
@@ -163,12 +225,14 @@ async def get_all_sources(source_id: str):
 
 @router.post("/upload")
 async def upload(
+        request: Request,
         file: UploadFile = File(None),
         metadata_json: str = Form(..., description="JSON string of DataIngestRequest model")
 ):
     try:
         req_data = DataIngestRequest.model_validate_json(metadata_json)
-        artifact_url = ""
+        # One entry per table to register: (name, ingestion_config, artifact_url, stats).
+        tables = [(req_data.dataset_name, req_data.ingestion_config, "", {})]
 
         if req_data.source_type in [SourceType.POSTGRES_DB, SourceType.MYSQL_DB]:
             if not req_data.connection_string:
@@ -182,43 +246,362 @@ async def upload(
                                     detail=f"File upload required for source type {req_data.source_type}")
 
             raw_file_path = save_upload_to_temp(file, file.filename)
-            final_path = raw_file_path
+            # (label, parquet path, config additions) per table; label names sheets / child tables.
+            converted = [(None, raw_file_path, {})]
+            config = req_data.ingestion_config
 
             try:
-                if req_data.source_type != SourceType.PARQUET:
-                    final_path = convert_to_parquet(raw_file_path, req_data.source_type)
-
-                artifact_url = process_ingestion(final_path, req_data)
+                # Conversions take a DuckDB execution slot, fairly shared with chat queries.
+                async with duckdb_scheduler.aslot(client_key(request), req_data.dataset_name):
+                    if req_data.source_type == SourceType.EXCEL:
+                        # Every sheet becomes its own table, converted in parallel.
+                        sheets = await asyncio.to_thread(
+                            convert_excel_to_parquet, raw_file_path, config.get("sheets"),
+                            config.get("batch_rows") or EXCEL_BATCH_ROWS,
+                        )
+                        if not sheets:
+                            raise HTTPException(status_code=400, detail="Workbook has no sheets with data.")
+                        converted = [(s["sheet"], s["path"], {"sheet": s["sheet"]}) for s in sheets]
+                    elif req_data.source_type == SourceType.JSON:
+                        # Main table plus one child table per `unnest` column.
+                        try:
+                            json_tables = await asyncio.to_thread(convert_json_to_parquet, raw_file_path, config)
+                        except (ValueError, duckdb.Error) as e:
+                            raise HTTPException(status_code=400, detail=f"JSON conversion failed: {e}")
+                        converted = [(t["table"], t["path"], {"child_table": t["table"]} if t["table"] else {})
+                                     for t in json_tables]
+                    elif req_data.source_type != SourceType.PARQUET:
+                        converted = [(None, await asyncio.to_thread(convert_to_parquet, raw_file_path, req_data.source_type), {})]
+
+                tables = []
+                for label, final_path, extra in converted:
+                    name = f"{req_data.dataset_name} / {label}" if label and len(converted) > 1 else req_data.dataset_name
+                    stats = await asyncio.to_thread(parquet_stats, final_path)
+                    stats = await asyncio.to_thread(with_sample, final_path, stats, req_data)
+                    artifact_url = await asyncio.to_thread(process_ingestion, final_path, req_data)
+                    tables.append((name, {**config, **extra}, artifact_url, stats))
 
             finally:
-                if os.path.exists(raw_file_path):
-                    os.remove(raw_file_path)
-                if final_path != raw_file_path and os.path.exists(final_path):
-                    os.remove(final_path)
+                for path in {raw_file_path, *(p for _, p, _ in converted)}:
+                    if os.path.exists(path):
+                        os.remove(path)
 
         async with AsyncSessionLocal() as session:
-            new_source = DataSource(
-                dataset_name=req_data.dataset_name,
-                description=req_data.description,
-                source_type=req_data.source_type,
-                artifact_url=artifact_url,
-                ingestion_config=req_data.ingestion_config,
-                connection_string=req_data.connection_string
-            )
-            session.add(new_source)
+            new_sources = [
+                DataSource(
+                    dataset_name=name,
+                    description=req_data.description,
+                    source_type=req_data.source_type,
+                    artifact_url=artifact_url,
+                    artifact_parts=[artifact_url] if artifact_url else [],
+                    stats=stats,
+                    ingestion_config=config,
+                    connection_string=req_data.connection_string
+                )
+                for name, config, artifact_url, stats in tables
+            ]
+            session.add_all(new_sources)
             await session.commit()
-            await session.refresh(new_source)
+            for new_source in new_sources:
+                await session.refresh(new_source)
+
+        for new_source in new_sources:
+            source_id = str(new_source.id)
+            await cluster_state.remember_source(source_id, cluster_state.affinity_key(new_source.artifact_url, source_id))
 
         return {
             "status": "success",
-            "id": str(new_source.id),
+            "id": str(new_sources[0].id),
             "type": req_data.source_type,
+            "tables": [
+                {
+                    "id": str(s.id),
+                    "name": s.dataset_name,
+                    "sheet": (s.ingestion_config or {}).get("sheet"),
+                    "child_table": (s.ingestion_config or {}).get("child_table"),
+                }
+                for s in new_sources
+            ],
             "message": "Source registered successfully."
         }
 
-    except HTTPException as he:
-        raise he
+    except (HTTPException, Saturated):
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _get_db_source(session, source_id: str) -> DataSource:
+    try:
+        source_uuid = uuid.UUID(source_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid source_id")
+
+    source = await session.get(DataSource, source_uuid)
+    if not source:
+        raise HTTPException(status_code=404, detail="Data source not found.")
+    if source.source_type not in [SourceType.POSTGRES_DB, SourceType.MYSQL_DB]:
+        raise HTTPException(status_code=400, detail="Not a database source.")
+    return source
+
+
+@router.get("/connect-db/{source_id}/tables")
+async def get_db_tables(source_id: str):
+    async with AsyncSessionLocal() as session:
+        source = await _get_db_source(session, source_id)
+
+    try:
+        tables = await asyncio.to_thread(
+            list_tables, str(source.id), source.source_type, source.connection_string
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Could not reach database: {e}")
+
+    return {"tables": tables, "selected": (source.ingestion_config or {}).get("table_name")}
+
+
+@router.post("/connect-db/{source_id}/select-table")
+async def select_db_table(source_id: str, table_name: str):
+    """Points chat at a live table; queries are pushed down to the source database."""
+    async with AsyncSessionLocal() as session:
+        source = await _get_db_source(session, source_id)
+        source.ingestion_config = {**(source.ingestion_config or {}), "table_name": table_name}
+        session.add(source)
+        await session.commit()
+
+    return {"status": "success", "id": source_id, "table_name": table_name}
+
+
+@router.post("/mirror-table")
+async def mirror_table(source_id: str, table_name: str, request: Request):
+    """
+    Copies a heavy table to parquet on S3 once; chat then reads the mirror
+    instead of hitting the source database on every question.
+    """
+    async with AsyncSessionLocal() as session:
+        source = await _get_db_source(session, source_id)
+
+    temp_dir = "temp_storage"
+    os.makedirs(temp_dir, exist_ok=True)
+    parquet_path = os.path.join(temp_dir, f"{source.id}_{uuid.uuid4().hex}.parquet")
+
+    try:
+        async with duckdb_scheduler.aslot(client_key(request), source_id):
+            await asyncio.to_thread(
+                mirror_table_to_parquet,
+                str(source.id), source.source_type, source.connection_string, table_name, parquet_path,
+            )
+        metadata = DataIngestRequest(dataset_name=source.dataset_name, source_type=source.source_type)
+        stats = await asyncio.to_thread(parquet_stats, parquet_path)
+        stats = await asyncio.to_thread(with_sample, parquet_path, stats, metadata)
+        artifact_url = await asyncio.to_thread(process_ingestion, parquet_path, metadata)
+    except (HTTPException, Saturated):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Mirror failed: {e}")
+    finally:
+        if os.path.exists(parquet_path):
+            os.remove(parquet_path)
+
+    async with AsyncSessionLocal() as session:
+        source = await session.get(DataSource, source.id)
+        source.artifact_url = artifact_url
+        source.artifact_parts = [artifact_url]
+        source.stats = stats
+        source.ingestion_config = {**(source.ingestion_config or {}), "table_name": table_name, "mirrored": True}
+        session.add(source)
+        await session.commit()
+
+    # Chat now reads the mirror: route the source by its artifact from here on.
+    await cluster_state.remember_source(source_id, cluster_state.affinity_key(artifact_url, source_id))
+    print(f"✅ Mirrored {table_name} of {source.dataset_name} to {artifact_url}")
+    return {"status": "success", "id": source_id, "artifact_url": artifact_url}
+
+
+async def _retire_cache_key(session, key: str, base_artifact: str) -> None:
+    """Drops cached answers for a dataset version once no source resolves to it anymore."""
+    result = await session.execute(select(DataSource).where(DataSource.artifact_url == base_artifact))
+    if any(data_key(source_state(s)) == key for s in result.scalars().all()):
+        return
+    try:
+        await semantic_cache.invalidate(key)
+    except Exception as e:
+        print(f"🗄️ [Semantic Cache] Invalidation failed (non-fatal): {e}")
+
+
+async def _append_part(source_id: uuid.UUID, parquet_path: str, watermark=None) -> dict:
+    """
+    Uploads one new parquet part, folds its footer stats into the catalog and rolls
+    the column profiles forward. Work is proportional to the part, not the dataset.
+    """
+    part_stats = await asyncio.to_thread(parquet_stats, parquet_path)
+    if part_stats["row_count"] == 0:
+        return {"status": "unchanged", "id": str(source_id), "rows_added": 0}
+
+    async with AsyncSessionLocal() as session:
+        source = await session.get(DataSource, source_id)
+        metadata = DataIngestRequest(dataset_name=source.dataset_name, source_type=source.source_type)
+    part_url = await asyncio.to_thread(process_ingestion, parquet_path, metadata)
+    # Sampling rates never change after ingest, so the part's sample can be built outside the lock.
+    sampled = None
+    if (source.stats or {}).get("sample"):
+        sampled = await asyncio.to_thread(sample_appended_part, parquet_path, source.stats["sample"], metadata)
+
+    async with AsyncSessionLocal() as session:
+        # Row lock: concurrent appends to the same dataset must not lose each other's parts.
+        source = await session.get(DataSource, source_id, with_for_update=True)
+        old_state = source_state(source)
+        parts = list(source.artifact_parts or [source.artifact_url])
+        if part_url in parts:
+            return {"status": "unchanged", "id": str(source_id), "rows_added": 0, "message": "Part already ingested."}
+
+        stats = merge_stats(source.stats, part_stats)
+        if watermark is not None:
+            stats["watermark"] = watermark
+        if stats.get("sample") and sampled:
+            sample_url, sample_rows = sampled
+            stats["sample"] = {
+                **stats["sample"],
+                "parts": stats["sample"]["parts"] + ([sample_url] if sample_url else []),
+                "rows": stats["sample"]["rows"] + sample_rows,
+                "base_rows": stats["row_count"],
+            }
+        elif stats.get("sample"):
+            stats.pop("sample")   # An unsampled part would bias every estimate; fall back to block sampling.
+        source.artifact_parts = parts + [part_url]
+        source.stats = stats
+        session.add(source)
+        await session.commit()
+
+        old_key, new_key = data_key(old_state), data_key(source_state(source))
+        await _retire_cache_key(session, old_key, source.artifact_url)
+
+    try:
+        await roll_forward_profiles(old_key, new_key, stats)
+    except Exception as e:
+        print(f"🧾 [Schema] Profile roll-forward failed (non-fatal, will re-profile lazily): {e}")
+
+    print(f"✅ Appended {part_stats['row_count']} rows to {source.dataset_name} ({len(parts) + 1} parts)")
+    return {
+        "status": "success",
+        "id": str(source_id),
+        "rows_added": part_stats["row_count"],
+        "row_count": stats["row_count"],
+        "parts": len(parts) + 1,
+    }
+
+
+@router.post("/data/{source_id}/append")
+async def append_data(source_id: str, request: Request, file: UploadFile = File(...)):
+    """Adds the rows of a new file (same format as the dataset) as an extra parquet part."""
+    async with AsyncSessionLocal() as session:
+        try:
+            source_uuid = uuid.UUID(source_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid source_id")
+        source = await session.get(DataSource, source_uuid)
+        if not source:
+            raise HTTPException(status_code=404, detail="Data source not found.")
+        if not source.artifact_url:
+            raise HTTPException(status_code=400, detail="Live database sources have nothing to append to; use /refresh on a mirror.")
+        config = source.ingestion_config or {}
+        if config.get("unnest") and (config.get("id_column") or ROW_ID_COLUMN) == ROW_ID_COLUMN:
+            # Generated row ids restart in every file, so appended children would attach to the wrong parents.
+            raise HTTPException(status_code=400, detail="Appending to unnested JSON needs an id_column in ingestion_config.")
+
+    raw_file_path = save_upload_to_temp(file, f"{uuid.uuid4().hex}_{file.filename}")
+    final_path = raw_file_path
+    try:
+        if source.source_type != SourceType.PARQUET:
+            async with duckdb_scheduler.aslot(client_key(request), source_id):
+                final_path = await asyncio.to_thread(convert_to_parquet, raw_file_path, source.source_type, config)
+        return await _append_part(source.id, final_path)
+    finally:
+        if os.path.exists(raw_file_path):
+            os.remove(raw_file_path)
+        if final_path != raw_file_path and os.path.exists(final_path):
+            os.remove(final_path)
+
+
+@router.post("/data/{source_id}/refresh")
+async def refresh_mirror(source_id: str, request: Request, watermark_column: str = None):
+    """
+    Appends the rows inserted into a mirrored DB table since the last refresh:
+    those past the watermark of a strictly increasing, unique insert key (an
+    identity or serial id). Parts are append-only, so updated or deleted rows
+    are not picked up (a column like updated_at would append every updated row
+    again); re-mirror with /mirror-table for those. The first refresh seeds the
+    watermark from the catalog's max for the column.
+    """
+    async with AsyncSessionLocal() as session:
+        source = await _get_db_source(session, source_id)
+
+    config = source.ingestion_config or {}
+    table_name = config.get("table_name")
+    column = watermark_column or config.get("watermark_column")
+    if not source.artifact_url or not table_name:
+        raise HTTPException(status_code=400, detail="Mirror the table first with /mirror-table.")
+    if not column:
+        raise HTTPException(status_code=400, detail=(
+            "watermark_column is required: a strictly increasing, unique insert key such as an identity id. "
+            "Refresh only appends new rows, so update timestamps would duplicate updated rows."
+        ))
+
+    stats = source.stats or {}
+    last = stats.get("watermark")
+    if last is None:
+        last = (stats.get("columns", {}).get(column) or {}).get("max")
+    if last is None:
+        raise HTTPException(status_code=400, detail=f"No watermark known for column '{column}'.")
+
+    quoted_column = '"' + column.replace('"', '""') + '"'
+    column_type = (stats.get("columns", {}).get(column) or {}).get("type") or "VARCHAR"
+    temp_dir = "temp_storage"
+    os.makedirs(temp_dir, exist_ok=True)
+    parquet_path = os.path.join(temp_dir, f"{source.id}_delta_{uuid.uuid4().hex}.parquet")
+
+    try:
+        async with duckdb_scheduler.aslot(client_key(request), source_id):
+            await asyncio.to_thread(
+                mirror_table_to_parquet,
+                str(source.id), source.source_type, source.connection_string, table_name, parquet_path,
+                f"{quoted_column} > CAST(? AS {column_type})", [last],
+            )
+        if await asyncio.to_thread(duplicate_keys, parquet_path, column):
+            raise HTTPException(status_code=400, detail=(
+                f"'{column}' repeats values, so it cannot mark which rows are new: "
+                f"use a strictly increasing, unique insert key."
+            ))
+        delta_stats = await asyncio.to_thread(parquet_stats, parquet_path)
+        new_watermark = (delta_stats["columns"].get(column) or {}).get("max")
+        watermark = new_watermark if new_watermark is not None else last
+        result = await _append_part(source.id, parquet_path, watermark=watermark)
+    except (HTTPException, Saturated):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Refresh failed: {e}")
+    finally:
+        if os.path.exists(parquet_path):
+            os.remove(parquet_path)
+
+    if config.get("watermark_column") != column:
+        async with AsyncSessionLocal() as session:
+            source = await session.get(DataSource, source.id)
+            source.ingestion_config = {**(source.ingestion_config or {}), "watermark_column": column}
+            session.add(source)
+            await session.commit()
+
+    return {**result, "watermark": watermark}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of an ingest job (upload, append, refresh, mirror), whichever worker runs it."""
+    if not cluster_state.cluster_enabled():
+        raise HTTPException(status_code=404, detail="Job tracking needs multi-worker mode (REDIS_URL).")
+    job = await cluster_state.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {"id": job_id, **job}
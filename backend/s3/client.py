@@ -1,16 +1,32 @@
-import boto3
-from botocore.config import Config
+import os
+import threading
 
-MINIO_URL = 'http://localhost:9000' # Replace with your MinIO server address and port
-ACCESS_KEY = 'minioadmin'       # Replace with your MinIO access key
-SECRET_KEY = 'minioadmin'       # Replace with your MinIO secret key
+MINIO_URL = os.getenv('S3_ENDPOINT_URL', 'http://localhost:9000') # MinIO (or any S3-compatible) server address and port
+ACCESS_KEY = os.getenv('S3_ACCESS_KEY', 'minioadmin')       # MinIO access key
+SECRET_KEY = os.getenv('S3_SECRET_KEY', 'minioadmin')       # MinIO secret key
 REGION_NAME = 'us-east-1'
 
-s3_client = boto3.client(
-    's3',
-    endpoint_url=MINIO_URL,
-    aws_access_key_id=ACCESS_KEY,
-    aws_secret_access_key=SECRET_KEY,
-    config=Config(signature_version='s3v4'),
-    region_name=REGION_NAME
-)
\ No newline at end of file
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    The boto3 S3 client, created on first use: importing boto3 and building a
+    client takes a few hundred ms that only the upload paths need.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import boto3
+            from botocore.config import Config
+
+            _client = boto3.client(
+                's3',
+                endpoint_url=MINIO_URL,
+                aws_access_key_id=ACCESS_KEY,
+                aws_secret_access_key=SECRET_KEY,
+                config=Config(signature_version='s3v4'),
+                region_name=REGION_NAME
+            )
+        return _client
@@ -0,0 +1,84 @@
+import uuid
+
+import duckdb
+import pytest
+
+import db.browse
+from db.browse import browse
+
+ROWS, GROUPS = 200_000, 20_000
+
+
+@pytest.fixture(scope="module")
+def database():
+    con = duckdb.connect(config={"threads": 8})
+    con.execute(f"""
+        CREATE TABLE data_table AS
+        SELECT i AS id, (i * 7919) % {GROUPS} AS g, i % 7 AS k, (i % 101)::DOUBLE AS v
+        FROM range({ROWS}) t(i)
+    """)
+    yield con
+    con.close()
+
+
+@pytest.fixture(autouse=True)
+def written(database, monkeypatch, tmp_path):
+    """Results materialized by the tests, in a local directory instead of S3."""
+    copies = []
+
+    def materialize_result(con, sql, result_id):
+        path = tmp_path / f"{result_id}.parquet"
+        if not path.exists():
+            con.execute(f"COPY ({sql}) TO '{path}' (FORMAT parquet)")
+            copies.append(result_id)
+        return str(path)
+
+    monkeypatch.setattr(db.browse, "open_data_table", lambda source: database.cursor())
+    monkeypatch.setattr(db.browse, "materialize_result", materialize_result)
+    return copies
+
+
+def walk(sql, **options):
+    """Every page of `sql`'s result, following next_cursor to the end."""
+    rows, cursor, result_id = [], None, uuid.uuid4().hex
+    while True:
+        page = browse({"source_id": "test"}, sql, cursor=cursor, limit=997, result_id=result_id, **options)
+        rows.extend(page["data"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return rows
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT g, sum(v) AS total FROM data_table GROUP BY g",                              # No order at all
+    "SELECT k, g, count(*) AS n FROM data_table GROUP BY k, g ORDER BY k",               # Ties within each k
+    "SELECT g, max(v) AS top FROM data_table GROUP BY g ORDER BY top DESC LIMIT 10000",  # Ties at the cut
+])
+def test_pages_of_a_result_cover_each_row_once(database, sql):
+    rows = walk(sql)
+    expected = database.execute(f"SELECT count(*), count(DISTINCT g) FROM ({sql})").fetchone()
+    keys = [(row.get("k"), row["g"]) for row in rows]
+    assert len(rows) == expected[0]
+    assert len(set(keys)) == len(keys), "a row came back on two pages"
+    assert len({row["g"] for row in rows}) == expected[1], "a row was never paged"
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_sorted_pages_cover_each_row_once(database, descending):
+    sql = "SELECT g, min(k) AS k FROM data_table GROUP BY g"
+    rows = walk(sql, sort="k", descending=descending)
+    assert sorted(row["g"] for row in rows) == list(range(GROUPS))
+    ks = [row["k"] for row in rows]
+    assert ks == sorted(ks, reverse=descending)
+
+
+def test_result_query_runs_once_for_all_pages(written):
+    rows = walk("SELECT g, sum(v) AS total FROM data_table GROUP BY g")
+    assert len(rows) == GROUPS
+    assert len(written) == 1
+
+
+def test_ordered_result_keeps_its_order(database):
+    rows = walk("SELECT g, sum(v) AS total FROM data_table GROUP BY g ORDER BY total DESC")
+    totals = [row["total"] for row in rows]
+    assert totals == sorted(totals, reverse=True)
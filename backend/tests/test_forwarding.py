@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+from cluster.forwarding import client_identity, forward_headers
+
+GATEWAY = "127.0.0.1"
+SPOOFED = {"x-user-id": "victim", "x-forwarded-for": "198.51.100.1"}
+
+
+def request(peer, headers):
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+
+def through_gateway(peer, headers):
+    """The request a worker gets when `peer` sends `headers` to the gateway."""
+    forwarded = dict(headers)
+    forward_headers(request(peer, headers), forwarded)
+    return request(GATEWAY, forwarded)
+
+
+def test_direct_caller_cannot_pick_its_key():
+    assert client_identity(request("203.0.113.9", SPOOFED)) == "203.0.113.9"
+
+
+def test_gateway_replaces_spoofed_headers():
+    assert client_identity(through_gateway("203.0.113.9", SPOOFED)) == "203.0.113.9"
+
+
+def test_trusted_hops_are_believed():
+    assert client_identity(through_gateway(GATEWAY, {"x-user-id": "alice"})) == "alice"
+    assert client_identity(through_gateway(GATEWAY, {"x-forwarded-for": "198.51.100.1"})) == "198.51.100.1"
@@ -0,0 +1,113 @@
+import socket
+import threading
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pytest
+
+import agent.sandbox_pool as sandbox_pool
+from agent.nodes import router
+from agent.sandbox_pool import SandboxPool, SandboxUnavailable
+
+ESCAPES = {
+    "duckdb.sql reads a local file":      "duckdb.sql(\"SELECT * FROM read_text('/etc/passwd')\").fetchall()",
+    "duckdb.execute fetches over HTTP":   "duckdb.execute(\"SELECT * FROM read_csv('http://127.0.0.1:{port}/x.csv')\").fetchall()",
+    "duckdb.query re-enables access":     "duckdb.query('SET enable_external_access = true')",
+    "duckdb.connect reads a local file":  "duckdb.connect().sql(\"SELECT * FROM read_text('/etc/passwd')\").fetchall()",
+    "default connection setting":         "assert duckdb.default_connection().sql(\"SELECT current_setting('enable_external_access')\").fetchone()[0]",
+    "socket.socket connects":             "import socket; socket.socket().connect(('127.0.0.1', {port}))",
+    "raw _socket connects":               "import _socket; _socket.socket(_socket.AF_INET, _socket.SOCK_STREAM).connect(('127.0.0.1', {port}))",
+    "urllib fetches":                     "import urllib.request; urllib.request.urlopen('http://127.0.0.1:{port}/', timeout=2)",
+    "open reads a host file":             "open('/etc/hostname').read()",
+    "os.listdir sees the host":           "import os; assert 'etc' in os.listdir('/')",
+    "pyarrow reads a host file":          "import pyarrow.csv; pyarrow.csv.read_csv('/etc/passwd')",
+    "site-packages is writable":          "import os, pandas; assert os.access(os.path.dirname(pandas.__file__), os.W_OK)",
+    "subprocess runs a program":          "import subprocess; subprocess.run(['true'], check=True)",
+    "os.fork":                            "import os; pid = os.fork(); os._exit(0) if pid == 0 else None",
+    "ctypes calls fork":                  "import ctypes, os; pid = ctypes.CDLL(None).fork(); os._exit(0) if pid == 0 else None; assert pid > 0",
+    "signals another process":            "import os; os.kill(os.getppid(), 0)",
+    "chroot is undone":                   "import os; os.mkdir('up'); os.chroot('up')",
+}
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(size=1, timeout_s=10)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture(scope="module")
+def listener():
+    """A local TCP server that records whether anything reached it."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    server.settimeout(0.2)
+    hits, stop = [], threading.Event()
+
+    def accept():
+        while not stop.is_set():
+            try:
+                conn, _ = server.accept()
+                hits.append(conn)
+                conn.close()
+            except socket.timeout:
+                pass
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    yield server.getsockname()[1], hits
+    stop.set()
+    thread.join()
+    server.close()
+
+
+@pytest.mark.parametrize("name", list(ESCAPES))
+def test_worker_cannot_reach_network_or_files(pool, listener, name):
+    port, hits = listener
+    outcome = pool.run(ESCAPES[name].format(port=port), pa.table({"x": [1]}))
+    assert not outcome["ok"], f"{name} succeeded: {outcome}"
+    assert not hits, f"{name} reached the host"
+
+
+def test_worker_still_runs_local_analysis(pool):
+    code = "result = duckdb.sql('SELECT sum(x) AS s FROM df').df()"
+    outcome = pool.run(code, pa.table({"x": [1, 2, 3]}))
+    assert outcome["ok"], outcome
+    assert outcome["frame"]["records"] == [{"s": 6}]
+
+
+def test_worker_keeps_a_private_scratch_dir(pool):
+    code = "open('notes.txt', 'w').write('kept'); result = open('notes.txt').read()"
+    outcome = pool.run(code, pa.table({"x": [1]}))
+    assert outcome["ok"] and outcome["value"] == "'kept'", outcome
+
+
+def test_unisolated_workers_turn_python_analysis_off(monkeypatch):
+    monkeypatch.setattr(sandbox_pool, "_pool", None)
+    monkeypatch.setattr(sandbox_pool, "_unavailable", None)
+    monkeypatch.setattr(sandbox_pool._Worker, "wait_ready", lambda self, timeout: ("unisolated", "unshare: EPERM"))
+    with pytest.raises(SandboxUnavailable):
+        sandbox_pool.get_sandbox_pool()
+    assert not sandbox_pool.sandbox_available()
+
+    chose_python = SimpleNamespace(with_structured_output=lambda schema: SimpleNamespace(
+        invoke=lambda prompt: schema(intent="python")))
+    monkeypatch.setattr(router, "llm", chose_python)
+    state = {"messages": [SimpleNamespace(content="plot sales by month")]}
+    assert router.router_node(state)["intent"] == "sql"
+
+
+def test_exhausted_pool_returns_an_error_instead_of_hanging():
+    pool = SandboxPool(size=1, timeout_s=1)
+    pool.start()
+    try:
+        pool._replace = lambda worker: worker.kill()   # Replacement never becomes ready
+        first = pool.run("while True: pass", pa.table({"x": [1]}))
+        assert not first["ok"] and "TimeoutError" in first["error"]
+        second = pool.run("result = 1", pa.table({"x": [1]}))
+        assert not second["ok"] and "No sandbox worker" in second["error"]
+    finally:
+        pool.shutdown()
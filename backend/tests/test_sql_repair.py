@@ -0,0 +1,17 @@
+from agent.sql_repair import check, repair
+
+COLUMNS = {"order date": "DATE", "note": "VARCHAR", "Sale Price": "DOUBLE"}
+
+
+def test_spaced_columns_are_quoted():
+    fixed, fixes = repair("SELECT order date, sum(Sale Price) FROM data_table GROUP BY order date", COLUMNS)
+    assert fixed == 'SELECT "order date", sum("Sale Price") FROM data_table GROUP BY "order date"'
+    assert sorted(fixes) == ['quoted "Sale Price"', 'quoted "order date"']
+
+
+def test_literals_and_comments_are_left_alone():
+    sql = "SELECT order date FROM data_table -- by order date\nWHERE note = 'order date' OR note = 'it''s Sale Price'"
+    fixed, _ = repair(sql, COLUMNS)
+    assert fixed == ("SELECT \"order date\" FROM data_table -- by order date\n"
+                     "WHERE note = 'order date' OR note = 'it''s Sale Price'")
+    assert check(fixed, COLUMNS) is None